@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+签到流程基准：本地假上游（benchmarks/fake_upstream.py）上按 10 / 100 / 1000 个站点计时
+
+每个规模在独立子进程 + 临时目录中运行（multi_site_checkin 在导入时读取 sites.json 等文件），依次测量:
+  resolve_sites      全部站点冷启动获取 client_id
+  external           process_external_sites：WAF 挑战 + AnyRouter 式签到（站点数的 1/10）
+  accounts (oauth)   process_account：无缓存 session，已保存的 linux.do 登录态走 httpx OAuth + 签到
+  phase1 (cached)    run_cached_checkins：次日缓存 session 直接签到
+浏览器不会启动：需要浏览器的站点记为 fallback
+
+用法: python benchmarks/bench_pipeline.py [--sites 10,100,1000] [--accounts 2] [--latency 20 --jitter 10]
+      [--error-rate 0.01] [--expired-rate 0.05] [--consent-rate 0.02] [--dead-rate 0.01] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.fake_upstream import FakeUpstream, Faults, make_client, user_id
+from utils.circuit import DomainGuard
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description='签到流程基准（本地假上游）')
+	parser.add_argument('--sites', default='10,100,1000', help='站点规模，逗号分隔（默认 10,100,1000）')
+	parser.add_argument('--accounts', type=int, default=2, help='LinuxDO 账号数（默认 2）')
+	parser.add_argument('--latency', type=float, default=20, help='每个请求的固定延迟，毫秒（默认 20）')
+	parser.add_argument('--jitter', type=float, default=10, help='额外随机延迟上限，毫秒（默认 10）')
+	parser.add_argument('--error-rate', type=float, default=0, help='站点请求返回 502 的概率')
+	parser.add_argument('--expired-rate', type=float, default=0, help='签到请求返回 401 的概率')
+	parser.add_argument('--consent-rate', type=float, default=0, help='授权停在确认页的比例')
+	parser.add_argument('--dead-rate', type=float, default=0, help='不可达站点比例')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--json', help='结果另存为 JSON')
+	parser.add_argument('-v', '--verbose', action='store_true', help='输出签到日志')
+	parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+	return parser.parse_args(argv)
+
+
+def write_fixtures(upstream, n_sites, labels):
+	"""在当前目录生成 sites.json、update_sessions.json 和 browser_state/<label>.json"""
+	sites = {f'site{i:04d}': {'domain': f'https://site{i:04d}.test', 'name': f'Bench {i:04d}'} for i in range(n_sites)}
+	ext_sessions = []
+	for i in range(max(1, n_sites // 10)):
+		key, host = f'waf{i:04d}', f'waf{i:04d}.test'
+		sites[key] = {'domain': f'https://{host}', 'name': f'WAF {i:04d}', 'provider': f'bench{i:04d}', 'needs_waf': True}
+		for label in labels:
+			ext_sessions.append({
+				'name': f'linuxdo_{user_id(label)}_{label}_{label}@bench.test_{key}',
+				'provider': f'bench{i:04d}', 'api_user': str(user_id(label)),
+				'cookies': {'session': upstream.session_for(host, label)},
+			})
+	with open('sites.json', 'w', encoding='utf-8') as f:
+		json.dump(sites, f, indent=2)
+	with open('update_sessions.json', 'w', encoding='utf-8') as f:
+		json.dump(ext_sessions, f, indent=2)
+	os.makedirs('browser_state', exist_ok=True)
+	for label in labels:
+		state = {'cookies': [{'name': '_t', 'value': label, 'domain': '.linux.do', 'path': '/', 'expires': -1}],
+				 'origins': []}
+		with open(os.path.join('browser_state', f'{label}.json'), 'w', encoding='utf-8') as f:
+			json.dump(state, f)
+
+
+async def run_stages(m, upstream, labels, fallbacks):
+	info = m.sync_site_info(m.SITES)
+	client = make_client(upstream, guard=DomainGuard())
+	stages = []
+
+	async def stage(name, coro, tasks):
+		requests, start = upstream.total_requests(), time.perf_counter()
+		m.results.clear()
+		browser_before = fallbacks[0]
+		await coro
+		stages.append({
+			'stage': name, 'seconds': round(time.perf_counter() - start, 3), 'tasks': tasks,
+			'requests': upstream.total_requests() - requests,
+			'ok': sum(1 for r in m.results if r.get('checkin_ok') or r.get('refreshed')),
+			'browser_fallback': fallbacks[0] - browser_before,
+		})
+
+	try:
+		n_sites = sum(1 for v in m.SITES.values() if not v.get('provider'))
+		n_ext = len(m.SITES) - n_sites
+
+		async def resolve():
+			await m.resolve_sites(info, client=client)
+			m.results.extend({'checkin_ok': True} for k, v in info.items() if k != '_meta' and v.get('client_id'))
+
+		await stage('resolve_sites', resolve(), n_sites)
+		await stage('external', m.process_external_sites(info, m.load_external_accounts(), client=client),
+					n_ext * len(labels))
+
+		async def accounts():
+			await asyncio.gather(*[m.process_account(a, info, client=client) for a in m.LINUXDO_ACCOUNTS])
+
+		await stage('accounts (oauth)', accounts(), n_sites * len(labels))
+
+		# 次日：签到状态重置，session 缓存保留
+		upstream.reset_checkins()
+		for key, site in info.items():
+			if key != '_meta' and not site.get('provider'):
+				for acc in site.get('accounts', {}).values():
+					acc['checkin_status'] = 'pending'
+					acc.pop('checkin_date', None)
+		await stage('phase1 (cached)', m.run_cached_checkins(info, m.LINUXDO_ACCOUNTS, client=client),
+					n_sites * len(labels))
+	finally:
+		await client.aclose()
+		m.site_store.flush(force=True)
+		m.waf_solver.close()
+	return stages
+
+
+def worker(args):
+	"""子进程：在临时目录生成数据、导入 multi_site_checkin 并依次计时，结果以 JSON 输出到 stdout 最后一行"""
+	labels = [f'bench{i}' for i in range(args.accounts)]
+	faults = Faults(latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate,
+					expired_rate=args.expired_rate, consent_rate=args.consent_rate, dead_rate=args.dead_rate,
+					seed=args.seed)
+	with FakeUpstream(faults) as upstream:
+		write_fixtures(upstream, args.worker, labels)
+		import multi_site_checkin as m
+
+		m.log = logging.getLogger('bench')
+		m.log.setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+		m.log.addHandler(logging.StreamHandler(sys.stderr))
+		m.LINUXDO_ACCOUNTS[:] = [{'login': f'{label}@bench.test', 'password': '', 'label': label} for label in labels]
+		fallbacks = [0]
+
+		@asynccontextmanager
+		async def no_browser(*args, **kwargs):
+			fallbacks[0] += 1
+			yield None
+
+		m.browser_context = no_browser
+		stages = asyncio.run(run_stages(m, upstream, labels, fallbacks))
+	print(json.dumps({'sites': args.worker, 'stages': stages}))
+
+
+def report(results):
+	print(f'  {"站点":>6}  {"阶段":<18} {"耗时":>9} {"任务":>6} {"请求":>7} {"成功":>6} {"回退浏览器":>6}')
+	for result in results:
+		for s in result['stages']:
+			print(f'  {result["sites"]:>6}  {s["stage"]:<18} {s["seconds"]:>8.2f}s {s["tasks"]:>6} '
+				  f'{s["requests"]:>7} {s["ok"]:>6} {s["browser_fallback"]:>6}')
+
+
+def main():
+	args = parse_args()
+	if args.worker is not None:
+		worker(args)
+		return
+
+	scales = [int(s) for s in args.sites.split(',') if s.strip()]
+	passthrough = [a for a in sys.argv[1:] if a not in ('--json', args.json)]
+	print(f'[BENCH] 签到流程  账号 {args.accounts} | 延迟 {args.latency:g}+{args.jitter:g}ms | '
+		  f'502 {args.error_rate:.0%} | 过期 {args.expired_rate:.0%} | 确认页 {args.consent_rate:.0%} | '
+		  f'不可达 {args.dead_rate:.0%}')
+	results = []
+	for n in scales:
+		with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as workdir:
+			env = {**os.environ, 'PYTHONPATH': project_root}
+			proc = subprocess.run([sys.executable, os.path.abspath(__file__), *passthrough, '--worker', str(n)],
+								  cwd=workdir, env=env, text=True, stdout=subprocess.PIPE,
+								  stderr=None if args.verbose else subprocess.PIPE)
+			if proc.returncode != 0:
+				print(f'  [FAIL] {n} 个站点: 退出码 {proc.returncode}\n{proc.stderr or ""}')
+				continue
+			results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+	report(results)
+	if args.json:
+		with open(args.json, 'w', encoding='utf-8') as f:
+			json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+WAF acw_sc__v2 求解基准：纯 Python 快速路径 vs 常驻 Node worker vs 每次 spawn node
+
+用法: python benchmarks/bench_waf_solver.py [-n 200]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils.waf_solver import WafSolverPool, solve_native
+
+SOLVE_WAF_JS = os.path.join(project_root, 'solve_waf.js')
+
+STANDARD_CHALLENGE = """
+var arg1='%s';
+var posList=[0xf,0x23,0x1d,0x18,0x21,0x10,0x1,0x26,0xa,0x9,0x13,0x1f,0x28,0x1b,0x16,0x17,0x19,0xd,0x6,0xb,
+	0x27,0x12,0x14,0x8,0xe,0x15,0x20,0x1a,0x2,0x1e,0x7,0x4,0x11,0x5,0x3,0x1c,0x22,0x25,0xc,0x24];
+var mask='3000176000856006061501533003690027800375';
+var out=[];
+for (var i=0;i<arg1.length;i++) { for (var j=0;j<posList.length;j++) { if (posList[j]==i+1) { out[j]=arg1[i]; } } }
+var s=out.join(''), r='';
+for (var k=0;k<s.length&&k<mask.length;k+=2) {
+	var x=(parseInt(s.slice(k,k+2),16)^parseInt(mask.slice(k,k+2),16)).toString(16);
+	if (x.length==1) { x='0'+x; }
+	r+=x;
+}
+document.cookie='acw_sc__v2='+r+'; expires=Thu, 01 Jan 2099 00:00:00 GMT; path=/';
+document.location.reload();
+"""
+
+
+def report(name, n, elapsed):
+	print(f'  {name:<20} {n:>5} 次  总计 {elapsed * 1000:>9.1f}ms  平均 {elapsed / n * 1e6:>10.1f}us')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='WAF 求解基准')
+	parser.add_argument('-n', '--iterations', type=int, default=200)
+	parser.add_argument('--spawn', type=int, default=10, help='每次 spawn node 的次数（较慢）')
+	args = parser.parse_args()
+
+	rng = random.Random(0)
+	scripts = [STANDARD_CHALLENGE % ''.join(rng.choice('0123456789ABCDEF') for _ in range(40))
+			   for _ in range(args.iterations)]
+
+	print('[BENCH] acw_sc__v2 求解')
+	start = time.perf_counter()
+	native = [solve_native(s) for s in scripts]
+	report('python', len(scripts), time.perf_counter() - start)
+
+	if not shutil.which('node'):
+		print('  [SKIP] 未安装 Node.js，跳过 Node 对比')
+		return
+
+	pool = WafSolverPool(SOLVE_WAF_JS, size=1)
+	try:
+		pool.solve(scripts[0], use_native=False)  # 预热 worker
+		start = time.perf_counter()
+		node = [pool.solve(s, use_native=False) for s in scripts]
+		report('node worker', len(scripts), time.perf_counter() - start)
+	finally:
+		pool.close()
+
+	spawn_n = min(args.spawn, len(scripts))
+	with tempfile.TemporaryDirectory() as tmp:
+		paths = []
+		for i, s in enumerate(scripts[:spawn_n]):
+			paths.append(os.path.join(tmp, f'waf_{i}.js'))
+			with open(paths[-1], 'w', encoding='utf-8') as f:
+				f.write(s)
+		start = time.perf_counter()
+		for path in paths:
+			subprocess.run(['node', SOLVE_WAF_JS, path], capture_output=True, text=True, timeout=15)
+		report('node spawn', spawn_n, time.perf_counter() - start)
+
+	mismatches = sum(1 for a, b in zip(native, node) if a != b)
+	print(f'  结果一致: {len(scripts) - mismatches}/{len(scripts)}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+本地假上游：new-api 站点 + connect.linux.do 授权 + 阿里云 WAF 挑战，用于离线测量签到流程
+
+- ThreadingHTTPServer 监听 127.0.0.1，按 Host 头区分域名：connect.linux.do / linux.do 为授权服务，
+  其余 host 都当作 new-api 站点；host 以 waf 开头的站点先下发 acw_sc__v2 挑战
+- LoopbackTransport 把 https://<任意域名>/... 改写到本地端口并保留 Host 头，
+  业务代码中的域名、cookie 作用域、重定向落点与线上一致，无需改动
+- Faults 配置延迟与故障注入：固定延迟 + 抖动、52x、session 过期、授权确认页、站点不可达
+- session 为按 (host, 用户) 签名的无状态值，重启服务后依然有效；签到状态按天记录，reset_checkins() 清空
+
+单独运行（用 Host 头选择域名）:
+  python benchmarks/fake_upstream.py --port 8780 --latency 20
+  curl -H 'Host: site0001.test' http://127.0.0.1:8780/api/status
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import httpx
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+	sys.path.insert(0, project_root)
+
+from utils.http_pool import HostLimitedTransport, build_client
+from utils.waf_solver import solve_acw_sc_v2
+
+LINUXDO_HOSTS = ('connect.linux.do', 'linux.do')
+WAF_HOST_PREFIX = 'waf'
+QUOTA = 500000
+
+WAF_PAGE = """<html><head><meta charset="utf-8"></head><body><script>
+var arg1='%s';
+var posList=[0xf,0x23,0x1d,0x18,0x21,0x10,0x1,0x26,0xa,0x9,0x13,0x1f,0x28,0x1b,0x16,0x17,0x19,0xd,0x6,0xb,
+	0x27,0x12,0x14,0x8,0xe,0x15,0x20,0x1a,0x2,0x1e,0x7,0x4,0x11,0x5,0x3,0x1c,0x22,0x25,0xc,0x24];
+var mask='3000176000856006061501533003690027800375';
+var out=[];
+for (var i=0;i<arg1.length;i++) { for (var j=0;j<posList.length;j++) { if (posList[j]==i+1) { out[j]=arg1[i]; } } }
+var s=out.join(''), r='';
+for (var k=0;k<s.length&&k<mask.length;k+=2) {
+	var x=(parseInt(s.slice(k,k+2),16)^parseInt(mask.slice(k,k+2),16)).toString(16);
+	if (x.length==1) { x='0'+x; }
+	r+=x;
+}
+document.cookie='acw_sc__v2='+r+'; expires=Thu, 01 Jan 2099 00:00:00 GMT; path=/';
+document.location.reload();
+</script></body></html>"""
+
+CONSENT_PAGE = """<html><head><title>授权应用</title></head><body>
+<form method="post"><p>应用请求访问你的 LinuxDO 账号</p><button name="allow">允许</button></form>
+</body></html>"""
+
+
+@dataclass
+class Faults:
+	"""延迟与故障注入。*_rate 为概率：error 按请求、expired 按签到请求随机；
+	consent 按 (client_id, 用户)、dead 按 host 固定（同一配置下结果稳定）"""
+
+	latency_ms: float = 0.0
+	jitter_ms: float = 0.0
+	error_rate: float = 0.0  # 站点请求返回 502
+	expired_rate: float = 0.0  # 签到请求返回 401（session 过期）
+	consent_rate: float = 0.0  # 授权停在确认页（httpx OAuth 需回退浏览器）
+	dead_rate: float = 0.0  # 站点不可达（LoopbackTransport 抛 ConnectError）
+	seed: int = 0
+
+
+def _unit(*parts) -> float:
+	"""稳定的 [0, 1) 哈希值，用于按 host / 用户固定的故障"""
+	digest = hashlib.sha256('|'.join(str(p) for p in parts).encode()).digest()
+	return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+def user_id(user: str) -> int:
+	return 1000 + int(hashlib.sha256(user.encode()).hexdigest()[:6], 16) % 900000
+
+
+class FakeUpstream:
+	"""假上游服务（后台线程运行）"""
+
+	def __init__(self, faults: Faults | None = None, host: str = '127.0.0.1', port: int = 0):
+		self.faults = faults or Faults()
+		self.requests: Counter = Counter()  # (host 类别, path) → 次数
+		self._rng = random.Random(self.faults.seed)
+		self._lock = threading.Lock()
+		self._secret = secrets.token_hex(8)
+		self._states: dict[str, str] = {}  # state session → state
+		self._codes: dict[str, str] = {}  # 授权码 → 用户
+		self._checked: set[tuple] = set()  # (host, 用户, 日期)
+		self._server = _Server((host, port), _Handler)
+		self._server.upstream = self
+		self._thread: threading.Thread | None = None
+
+	@property
+	def host(self) -> str:
+		return self._server.server_address[0]
+
+	@property
+	def port(self) -> int:
+		return self._server.server_address[1]
+
+	def start(self) -> 'FakeUpstream':
+		self._thread = threading.Thread(target=self._server.serve_forever, name='fake-upstream', daemon=True)
+		self._thread.start()
+		return self
+
+	def close(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.close()
+
+	# ---------- 供基准脚本构造数据 ----------
+
+	def client_id(self, host: str) -> str:
+		return 'bench-' + hashlib.sha256(host.encode()).hexdigest()[:16]
+
+	def session_for(self, host: str, user: str) -> str:
+		"""站点 session（签名值，可直接写入 update_sessions.json 作为已有登录态）"""
+		sig = hashlib.sha256(f'{self._secret}|{host}|{user}'.encode()).hexdigest()[:24]
+		return f's.{user}.{sig}'
+
+	def is_dead(self, host: str) -> bool:
+		return host not in LINUXDO_HOSTS and _unit('dead', self.faults.seed, host) < self.faults.dead_rate
+
+	def reset_checkins(self):
+		with self._lock:
+			self._checked.clear()
+
+	def total_requests(self) -> int:
+		with self._lock:
+			return sum(self.requests.values())
+
+	# ---------- 请求处理 ----------
+
+	def _chance(self, rate: float) -> bool:
+		if rate <= 0:
+			return False
+		with self._lock:
+			return self._rng.random() < rate
+
+	def _delay(self):
+		latency = self.faults.latency_ms
+		if self.faults.jitter_ms:
+			with self._lock:
+				latency += self._rng.uniform(0, self.faults.jitter_ms)
+		if latency > 0:
+			time.sleep(latency / 1000)
+
+	def _session_user(self, host: str, cookies: dict) -> str | None:
+		session = cookies.get('session', '')
+		parts = session.split('.')
+		if len(parts) == 3 and parts[0] == 's' and session == self.session_for(host, parts[1]):
+			return parts[1]
+		return None
+
+	def handle(self, method: str, host: str, target: str, headers, body: bytes) -> tuple:
+		"""返回 (状态码, [(header, value)], body bytes)"""
+		url = urlsplit(target)
+		query = {k: v[0] for k, v in parse_qs(url.query).items()}
+		cookies = {k: m.value for k, m in SimpleCookie(headers.get('Cookie', '')).items()}
+		kind = 'linuxdo' if host in LINUXDO_HOSTS else 'waf' if host.startswith(WAF_HOST_PREFIX) else 'site'
+		with self._lock:
+			self.requests[(kind, url.path)] += 1
+		self._delay()
+		if kind == 'linuxdo':
+			return self._linuxdo(host, url.path, query, cookies)
+		if self._chance(self.faults.error_rate):
+			return _html(502, '<html><body>502 Bad Gateway</body></html>')
+		if kind == 'waf':
+			challenge = self._waf_check(host, cookies)
+			if challenge:
+				return challenge
+		return self._site(method, host, url.path, query, headers, cookies)
+
+	def _linuxdo(self, host, path, query, cookies):
+		if host != 'connect.linux.do' or path != '/oauth2/authorize':
+			return _html(404, '<html><body>Not Found</body></html>')
+		user = cookies.get('_t')
+		if not user:
+			return 302, [('Location', 'https://linux.do/login')], b''
+		if _unit('consent', self.faults.seed, query.get('client_id'), user) < self.faults.consent_rate:
+			return _html(200, CONSENT_PAGE)
+		code = secrets.token_hex(8)
+		with self._lock:
+			self._codes[code] = user
+		location = f'{query.get("redirect_uri", "")}?{urlencode({"code": code, "state": query.get("state", "")})}'
+		return 302, [('Location', location)], b''
+
+	def _waf_check(self, host, cookies):
+		arg1 = hashlib.sha256(f'arg1|{host}|{date.today()}'.encode()).hexdigest()[:40].upper()
+		if cookies.get('acw_sc__v2') == solve_acw_sc_v2(arg1):
+			return None
+		status, headers, body = _html(200, WAF_PAGE % arg1)
+		return status, headers + [('Set-Cookie', f'acw_tc={secrets.token_hex(16)}; Path=/; Max-Age=1800')], body
+
+	def _site(self, method, host, path, query, headers, cookies):
+		if path == '/api/status':
+			return _json({'success': True, 'data': {
+				'linuxdo_client_id': self.client_id(host), 'linuxdo_oauth': True, 'system_name': host,
+				'version': 'v0.0.0-bench', 'checkin_enabled': True, 'min_trust_level': 0,
+			}})
+		if path == '/api/oauth/state':
+			state, state_session = secrets.token_hex(6), 'st.' + secrets.token_hex(12)
+			with self._lock:
+				self._states[state_session] = state
+			return _json({'success': True, 'data': state}, [('Set-Cookie', f'session={state_session}; Path=/; HttpOnly')])
+		if path == '/api/oauth/linuxdo':
+			with self._lock:
+				expected = self._states.pop(cookies.get('session', ''), None)
+				user = self._codes.pop(query.get('code', ''), None)
+			if not expected or expected != query.get('state'):
+				return _json({'success': False, 'message': 'state 不匹配'})
+			if not user:
+				return _json({'success': False, 'message': '授权码无效'})
+			session = self.session_for(host, user)
+			return _json({'success': True, 'data': {'id': user_id(user), 'username': user}},
+						 [('Set-Cookie', f'session={session}; Path=/; HttpOnly; Max-Age=2592000')])
+
+		user = self._session_user(host, cookies)
+		api_user = headers.get('New-Api-User')
+		if user is None or (api_user and api_user != str(user_id(user))):
+			return _json({'success': False, 'message': '未登录'}, status=401)
+		if path == '/api/user/self':
+			return _json({'success': True, 'data': {'id': user_id(user), 'username': user, 'quota': QUOTA}})
+		if path in ('/api/user/checkin', '/api/user/sign_in') and method == 'POST':
+			if self._chance(self.faults.expired_rate):
+				return _json({'success': False, 'message': '未登录'}, status=401)
+			key = (host, user, date.today())
+			with self._lock:
+				already = key in self._checked
+				self._checked.add(key)
+			if already:
+				return _json({'success': False, 'message': '今日已签到'})
+			return _json({'success': True, 'message': '签到成功', 'data': {'quota': QUOTA}})
+		return _json({'success': False, 'message': 'Not Found'}, status=404)
+
+
+def _json(payload: dict, headers: list | None = None, status: int = 200) -> tuple:
+	return status, [('Content-Type', 'application/json'), *(headers or [])], json.dumps(payload).encode()
+
+
+def _html(status: int, text: str) -> tuple:
+	return status, [('Content-Type', 'text/html; charset=utf-8')], text.encode()
+
+
+class _Server(ThreadingHTTPServer):
+	daemon_threads = True
+	request_queue_size = 1024  # 默认 5，上千并发连接时会被拒绝
+	upstream: FakeUpstream
+
+
+class _Handler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def _serve(self):
+		length = int(self.headers.get('Content-Length') or 0)
+		body = self.rfile.read(length) if length else b''
+		host = (self.headers.get('Host') or '').split(':')[0]
+		status, headers, payload = self.server.upstream.handle(self.command, host, self.path, self.headers, body)
+		self.send_response(status)
+		for name, value in headers:
+			self.send_header(name, value)
+		self.send_header('Content-Length', str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	do_GET = _serve
+	do_POST = _serve
+
+	def log_message(self, format, *args):
+		pass
+
+
+class LoopbackTransport(httpx.AsyncBaseTransport):
+	"""把任意域名的请求改写到假上游（保留 Host 头）；不可达站点直接抛 ConnectError"""
+
+	def __init__(self, upstream: FakeUpstream, max_connections: int = 200):
+		self.upstream = upstream
+		limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+		self._transport = httpx.AsyncHTTPTransport(limits=limits)
+
+	async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+		if self.upstream.is_dead(request.url.host):
+			raise httpx.ConnectError('connection refused (fake upstream)', request=request)
+		url = request.url.copy_with(scheme='http', host=self.upstream.host, port=self.upstream.port)
+		# 新建请求对象：httpx 把原请求挂到 response.request 上，cookie 作用域和重定向按原域名计算
+		local = httpx.Request(request.method, url, headers=request.headers, stream=request.stream,
+							  extensions=request.extensions)
+		return await self._transport.handle_async_request(local)
+
+	async def aclose(self):
+		await self._transport.aclose()
+
+
+def make_client(upstream: FakeUpstream, per_host: int = 6, guard=None) -> httpx.AsyncClient:
+	"""http_pool.build_client 创建的客户端（每 host 并发上限、可选熔断、不保存 cookie），请求发往假上游"""
+	return build_client(HostLimitedTransport(LoopbackTransport(upstream), per_host, guard))
+
+
+def main():
+	parser = argparse.ArgumentParser(description='本地假上游（new-api + connect.linux.do + WAF）')
+	parser.add_argument('--port', type=int, default=8780)
+	parser.add_argument('--latency', type=float, default=0, help='每个请求的固定延迟，毫秒')
+	parser.add_argument('--jitter', type=float, default=0, help='额外随机延迟上限，毫秒')
+	parser.add_argument('--error-rate', type=float, default=0, help='站点请求返回 502 的概率')
+	parser.add_argument('--expired-rate', type=float, default=0, help='签到请求返回 401 的概率')
+	parser.add_argument('--consent-rate', type=float, default=0, help='授权停在确认页的比例')
+	args = parser.parse_args()
+
+	faults = Faults(latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate,
+					expired_rate=args.expired_rate, consent_rate=args.consent_rate)
+	upstream = FakeUpstream(faults, port=args.port)
+	print(f'[FAKE] http://{upstream.host}:{upstream.port} (Ctrl+C 退出)')
+	try:
+		upstream._server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		upstream._server.server_close()
+
+
+if __name__ == '__main__':
+	main()
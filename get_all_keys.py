@@ -1,17 +1,54 @@
 #!/usr/bin/env python3
-"""获取所有站点的 API Key、额度、模型、使用量，输出 Markdown 报告"""
-import json, os, httpx
-from datetime import datetime
+"""获取所有站点的 API Key、额度、模型、使用量，输出 Markdown 报告
+
+- asyncio 并发查询：全局 + 按域名并发上限，每个请求有连接/读取超时和总时限，慢站点不阻塞其他站点
+- 每个站点完成即输出进度；报告按 sites.json 顺序组装，与串行查询的输出一致
+- 令牌列表完整翻页；库存（inventory.db）保存每个账号的快照，用量和令牌首页都没变时直接复用
+- 使用量日志流式翻页（页大小自适应），边翻边按 日期 × 模型 聚合，不保留原始日志；
+  库存记录每个账号已统计的最大日志 id，之后只取新日志，报告附带按模型 / 站点 / 日期的累计统计
+- python get_all_keys.py diff: 只读本地库存，列出最近一次查询的令牌变化（新增 / 过期 / 耗尽 / 删除）
+- python get_all_keys.py models <模型名>: 只读本地库存，列出可用该模型的 站点 / 分组 / Key / 剩余额度
+  （模型名规范化 + 别名匹配；模型目录 MODELS_TTL 内不重新请求 /api/models）
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
 from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+
+from utils.concurrency import KeyedSemaphore, domain_key
+from utils.http_pool import HttpClientPool, send_following
+from utils.inventory import INVENTORY_DB, Inventory, content_hash, normalize_model, usage_fingerprint
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SITES_FILE = os.path.join(SCRIPT_DIR, 'sites.json')
 SITE_INFO_FILE = os.path.join(SCRIPT_DIR, 'site_info.json')
 OUTPUT_JSON = os.path.join(SCRIPT_DIR, 'api_keys.json')
 OUTPUT_MD = os.path.join(SCRIPT_DIR, 'api_keys.md')
+INVENTORY_FILE = os.path.join(SCRIPT_DIR, INVENTORY_DB)
 
 HIGHLIGHT_MODELS = ['claude', 'gpt-4o', 'gpt-4.5', 'o1', 'o3', 'o4', 'gemini', 'deepseek', 'codex']
 
+GLOBAL_CONCURRENCY = 24  # 全局并发请求上限
+PER_DOMAIN_CONCURRENCY = 4  # 同一站点并发请求上限
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 6
+REQUEST_DEADLINE = 10  # 单个请求的总时限（含重定向和读取响应体），防止慢速响应拖住整站
+TOKEN_PAGE_SIZE = 100
+MAX_PAGES = 50  # 翻页上限，防止接口忽略分页参数时无限翻页
+LOG_PAGE_MIN = 25  # 日志首页大小（增量查询通常只有几条新日志）
+LOG_PAGE_MAX = 100  # new-api 的 page_size 上限
+LOG_MAX_PAGES = 500  # 单个账号一次最多遍历的日志页数
+LOG_TYPE_CONSUME = 2  # 消费日志
+RECENT_LOGS = 5
+MODELS_TTL = 6 * 3600  # 模型目录缓存时间（秒），期间不重新请求 /api/models
+PROXY_URL = os.environ.get('https_proxy') or os.environ.get('http_proxy') or os.environ.get('HTTPS_PROXY') or os.environ.get('HTTP_PROXY')
+
 
 def fmt_quota(raw, unit=500_000):
 	if raw is None:
@@ -30,16 +67,112 @@ def fmt_expire(ts):
 	return datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
 
 
-def api_get(client, domain, path, session, user_id):
+class Limiter:
+	"""全局 + 按域名的并发上限（先排域名队，再占全局名额）"""
+
+	def __init__(self, total=GLOBAL_CONCURRENCY, per_domain=PER_DOMAIN_CONCURRENCY):
+		self.total = asyncio.Semaphore(total)
+		self.domains = KeyedSemaphore(per_domain)
+
+	@asynccontextmanager
+	async def slot(self, domain):
+		async with self.domains.hold(domain_key(domain)), self.total:
+			yield
+
+
+async def api_get(client, limiter, domain, path, session, user_id):
 	try:
-		r = client.get(f'{domain}{path}',
-			cookies={'session': session},
-			headers={'User-Agent': 'Mozilla/5.0', 'New-Api-User': str(user_id)})
-		return r.json()
+		async with limiter.slot(domain):
+			# 共享客户端不保存 cookie，跟随重定向时由 send_following 把 session 带到每一跳
+			r = await asyncio.wait_for(send_following(
+				client, 'GET', f'{domain}{path}', cookies={'session': session},
+				headers={'User-Agent': 'Mozilla/5.0', 'New-Api-User': str(user_id)},
+				timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+			), REQUEST_DEADLINE)
+		data = r.json()
+		return data if isinstance(data, dict) else {}
 	except Exception:
 		return {}
 
 
+def page_items(resp):
+	"""列表接口响应 → (items, total)，兼容 data.items 与 data 直接为列表两种格式"""
+	data = (resp or {}).get('data')
+	if isinstance(data, list):
+		return data, None
+	if isinstance(data, dict):
+		return data.get('items') or [], data.get('total')
+	return [], None
+
+
+async def fetch_all_pages(client, limiter, domain, path, session, user_id, page_size, first=None):
+	"""翻页获取列表接口的全部条目，first 为已获取的第 0 页响应。
+	部分 new-api 版本页码从 1 开始（p=0 和 p=1 都是第一页），按 id 去重，第 1 页重复时继续翻"""
+	items, seen = [], set()
+	resp = first
+	for p in range(MAX_PAGES):
+		if resp is None:
+			resp = await api_get(client, limiter, domain, f'{path}?p={p}&page_size={page_size}', session, user_id)
+		page, total = page_items(resp)
+		resp = None
+		fresh = [it for it in page if it.get('id', it.get('key')) not in seen]
+		if not fresh and not (p == 1 and page):
+			break
+		for it in fresh:
+			seen.add(it.get('id', it.get('key')))
+			items.append(it)
+		if len(page) < page_size or (total is not None and len(items) >= total):
+			break
+	return items
+
+
+async def stream_logs(client, limiter, domain, session, user_id, high_water=None):
+	"""从新到旧流式遍历消费日志，遇到 id <= high_water 即停止，边翻页边聚合，只保留最近 RECENT_LOGS 条。
+	页大小从 LOG_PAGE_MIN 开始，整页时翻倍（偏移量对齐时）直到 LOG_PAGE_MAX。
+	只用最小 id 去重（日志按 id 降序）：遍历中有新日志插入导致的整页偏移不会重复计数。
+	返回 {'recent', 'usage': {(day, model): [requests, prompt, completion, quota]}, 'high_water'}；
+	中途请求失败返回 None（丢弃本次聚合，下次从原高水位重试）"""
+	usage = defaultdict(lambda: [0, 0, 0, 0])
+	recent, top, low = [], None, None
+	size, offset, base = LOG_PAGE_MIN, 0, 0
+	for n in range(LOG_MAX_PAGES):
+		resp = await api_get(client, limiter, domain,
+							 f'/api/log/self/?p={offset // size + base}&page_size={size}&type={LOG_TYPE_CONSUME}',
+							 session, user_id)
+		if 'data' not in resp:
+			return None
+		page, total = page_items(resp)
+		fresh = [it for it in page if low is None or it.get('id') is None or it['id'] < low]
+		if n == 1 and page and not fresh:
+			base = 1  # 页码从 1 开始：p=1 仍是第一页
+			continue
+		reached = False
+		for it in fresh:
+			log_id = it.get('id')
+			if log_id is not None:
+				if high_water is not None and log_id <= high_water:
+					reached = True
+					break
+				top = log_id if top is None else max(top, log_id)
+				low = log_id if low is None else min(low, log_id)
+			if it.get('type', LOG_TYPE_CONSUME) != LOG_TYPE_CONSUME:
+				continue
+			if len(recent) < RECENT_LOGS:
+				recent.append(it)
+			day = datetime.fromtimestamp(it['created_at']).strftime('%Y-%m-%d') if it.get('created_at') else '-'
+			row = usage[(day, it.get('model_name') or '-')]
+			row[0] += 1
+			row[1] += it.get('prompt_tokens') or 0
+			row[2] += it.get('completion_tokens') or 0
+			row[3] += it.get('quota') or 0
+		offset += len(page)
+		if reached or len(page) < size or (total is not None and offset >= total):
+			break
+		if n and size * 2 <= LOG_PAGE_MAX and offset % (size * 2) == 0:
+			size *= 2
+	return {'recent': recent, 'usage': dict(usage), 'high_water': top}
+
+
 def classify_models(models_data):
 	all_models = set()
 	if isinstance(models_data, dict):
@@ -53,13 +186,157 @@ def classify_models(models_data):
 	return highlighted, len(all_models)
 
 
-def main():
-	with open(SITES_FILE, 'r', encoding='utf-8') as f:
-		sites = json.load(f)
-	with open(SITE_INFO_FILE, 'r', encoding='utf-8') as f:
-		info = json.load(f)
+def report_sites(sites, info):
+	"""需要查询的站点: [(site_key, site_cfg, accounts)]，顺序同 sites.json"""
+	targets = []
+	for site_key, site_cfg in sites.items():
+		if site_cfg.get('skip') or site_cfg.get('provider'):
+			continue
+		accounts = info.get(site_key, {}).get('accounts', {})
+		if accounts:
+			targets.append((site_key, site_cfg, accounts))
+	return targets
 
-	now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+async def fetch_account(client, limiter, domain, session, user_id, prev=None):
+	"""单个账号的额度、令牌（完整翻页）、使用量日志（高水位之后的新日志）。
+	prev: 库存中的上次快照。用量指纹不变时不查日志；令牌首页哈希也不变时不翻页，tokens 为 None 表示复用快照。
+	usage 为 stream_logs 的结果（没查日志或失败时为 None）"""
+	user, head = await asyncio.gather(
+		api_get(client, limiter, domain, '/api/user/self', session, user_id),
+		api_get(client, limiter, domain, f'/api/token/?p=0&page_size={TOKEN_PAGE_SIZE}', session, user_id),
+	)
+	tokens_hash = content_hash(head['data']) if head.get('data') is not None else None
+	fingerprint = usage_fingerprint(user.get('data') or {})
+	usage_same = prev is not None and fingerprint is not None and fingerprint == prev['fingerprint']
+	result = {'self': user, 'tokens': None, 'logs': None, 'tokens_hash': tokens_hash, 'usage': None}
+	if usage_same and tokens_hash is not None and tokens_hash == prev['tokens_hash']:
+		return result
+
+	async def tokens():
+		if tokens_hash is None:
+			return head  # 令牌接口失败（apply_inventory 改用快照，不当作令牌被删除）
+		items = await fetch_all_pages(client, limiter, domain, '/api/token/', session, user_id, TOKEN_PAGE_SIZE, first=head)
+		return {'data': {'items': items}}
+
+	async def logs():
+		if usage_same:
+			return None
+		high_water = prev['log_high_water'] if prev else None
+		usage = await stream_logs(client, limiter, domain, session, user_id, high_water)
+		if usage is None:
+			return None
+		recent = usage['recent'] + (prev['logs'] if high_water is not None else [])
+		return usage, {'data': {'items': recent[:RECENT_LOGS]}}
+
+	result['tokens'], logs = await asyncio.gather(tokens(), logs())
+	if logs is not None:
+		result['usage'], result['logs'] = logs
+	return result
+
+
+async def fetch_site(client, limiter, domain, accounts, snapshots=None, models=None):
+	"""站点下所有账号并发查询；模型列表每站只查一次（用第一个有 session 的账号）。
+	snapshots: {label: 库存快照}；models: 库存中未过期的模型目录，传入时不请求 /api/models。
+	返回 {'models': 响应或 None, 'accounts': {label: fetch_account 结果}}"""
+	snapshots = snapshots or {}
+	valid = [(label, acc['session'], acc['user_id']) for label, acc in accounts.items()
+			 if acc.get('session') and acc.get('user_id')]
+	if not valid:
+		return {'models': None, 'accounts': {}}
+	_, session, user_id = valid[0]
+
+	async def site_models():
+		if models is not None:
+			return {'data': models}
+		return await api_get(client, limiter, domain, '/api/models', session, user_id)
+
+	models_resp, *results = await asyncio.gather(
+		site_models(),
+		*[fetch_account(client, limiter, domain, s, u, snapshots.get(label)) for label, s, u in valid],
+	)
+	return {'models': models_resp, 'accounts': {label: r for (label, _, _), r in zip(valid, results)}}
+
+
+def apply_inventory(inventory, run_id, site_key, site_name, fetched_site, snapshots):
+	"""用快照补全未重新查询的部分，并保存本次快照。返回 (令牌事件, 复用快照的账号数)"""
+	events, reused = [], 0
+	for label, data in fetched_site['accounts'].items():
+		prev = snapshots.get(label)
+		user = data['self'].get('data') or {}
+		tokens_hash = data['tokens_hash']
+		if prev is not None:
+			if data['tokens'] is None and data['logs'] is None:
+				reused += 1
+			if data['tokens'] is None or tokens_hash is None:
+				data['tokens'] = {'data': {'items': inventory.tokens(site_key, label)}}
+				tokens_hash = tokens_hash or prev['tokens_hash']
+			if data['logs'] is None:
+				data['logs'] = {'data': {'items': prev['logs']}}
+		if not user:
+			continue  # 站点不可达 / session 失效：不覆盖快照
+		items, _ = page_items(data['tokens'])
+		logs, _ = page_items(data['logs'])
+		events += inventory.save(run_id, site_key, label, user, items, tokens_hash, logs, site_name=site_name)
+		usage = data['usage']
+		if usage is not None:
+			inventory.add_usage(site_key, label, usage['usage'], usage['high_water'],
+								replace=prev is None or prev['log_high_water'] is None)
+	return events, reused
+
+
+async def collect(sites, info, client=None, limiter=None, inventory=None, full=False, stats=None):
+	"""并发查询所有站点，站点完成即打印进度。返回 {site_key: fetch_site 结果}。
+	inventory: 库存，查询前取快照和模型目录、完成后保存（full=True 时不复用）
+	stats: 传入字典时写入 accounts / reused / events 统计"""
+	targets = report_sites(sites, info)
+	limiter = limiter or Limiter()
+	pool = None
+	if client is None:
+		pool = HttpClientPool(proxy=PROXY_URL, per_host=PER_DOMAIN_CONCURRENCY)
+		client = pool.get()
+	run_id = inventory.begin_run() if inventory is not None else None
+	stats = stats if stats is not None else {}
+	stats.update(accounts=0, reused=0, events=[])
+
+	async def one(site_key, site_cfg, accounts):
+		start = time.monotonic()
+		snapshots, models = {}, None
+		if inventory is not None and not full:
+			snapshots = {label: inventory.snapshot(site_key, label) for label in accounts}
+			snapshots = {k: v for k, v in snapshots.items() if v is not None}
+			models = inventory.catalog(site_key, max_age=MODELS_TTL)
+		data = await fetch_site(client, limiter, site_cfg['domain'], accounts, snapshots, models)
+		return site_key, site_cfg.get('name', site_key), data, snapshots, models is not None, time.monotonic() - start
+
+	fetched = {}
+	try:
+		pending = [one(*t) for t in targets]
+		for i, done in enumerate(asyncio.as_completed(pending), 1):
+			site_key, site_name, data, snapshots, models_cached, elapsed = await done
+			fetched[site_key] = data
+			reused = 0
+			if inventory is not None:
+				events, reused = apply_inventory(inventory, run_id, site_key, site_name, data, snapshots)
+				models = (data['models'] or {}).get('data')
+				if not models_cached and isinstance(models, (dict, list)):
+					inventory.save_catalog(site_key, models, site_name=site_name)
+				stats['events'] += events
+				stats['reused'] += reused
+			stats['accounts'] += len(data['accounts'])
+			extra = f', 复用 {reused}' if reused else ''
+			print(f'  [{i}/{len(pending)}] {site_name} OK ({len(data["accounts"])} 个账号{extra}, {elapsed:.1f}s)', flush=True)
+	finally:
+		if pool is not None:
+			await pool.aclose()
+		if inventory is not None:
+			inventory.finish_run(run_id, stats['accounts'], stats['reused'])
+	return fetched
+
+
+def build_report(sites, info, fetched, now, usage=None):
+	"""按 sites.json 顺序组装 Markdown 和 JSON，返回 (md_content, all_json)。
+	usage: Inventory.usage_summary() 的累计统计，传入时追加第 5 节"""
 	all_json = []
 	quota_rows = []
 	quota_total = defaultdict(float)
@@ -67,75 +344,62 @@ def main():
 	model_rows = []
 	log_rows = defaultdict(list)  # label → [(site_name, model, pt, ct, cost, ts)]
 
-	# 一次遍历，收集所有数据
-	with httpx.Client(timeout=6, verify=False, follow_redirects=True) as c:
-		for site_key, site_cfg in sites.items():
-			if site_cfg.get('skip') or site_cfg.get('provider'):
-				continue
-			domain = site_cfg['domain']
-			site_name = site_cfg.get('name', site_key)
-			accounts = info.get(site_key, {}).get('accounts', {})
-			if not accounts:
+	for site_key, site_cfg, accounts in report_sites(sites, info):
+		site = fetched.get(site_key)
+		if not site:
+			continue
+		domain = site_cfg['domain']
+		site_name = site_cfg.get('name', site_key)
+		models_fetched = False
+
+		for label in accounts:
+			data = site['accounts'].get(label)
+			if data is None:
 				continue
 
-			print(f'  {site_name}...', end=' ', flush=True)
-			models_fetched = False
+			# 1) 额度
+			u = data['self'].get('data') or {}
+			if u:
+				quota = u.get('quota', 0)
+				used = u.get('used_quota', 0)
+				req = u.get('request_count', 0)
+				group = u.get('group', 'default')
+				quota_rows.append((site_name, label, fmt_quota(quota), fmt_quota(used), req, group))
+				quota_total[label] += quota / 500_000
 
-			for label, acc_data in accounts.items():
-				session = acc_data.get('session', '')
-				user_id = acc_data.get('user_id', '')
-				if not session or not user_id:
+			# 2) Keys
+			keys_data = []
+			for it in page_items(data['tokens'])[0]:
+				if it.get('status') != 1:
 					continue
+				key = f'sk-{it["key"]}'
+				name = it.get('name', '')
+				grp = it.get('group', 'default')
+				kquota = '无限' if it.get('unlimited_quota') else fmt_quota(it.get('remain_quota', 0))
+				expire = fmt_expire(it.get('expired_time', -1))
+				keys_by_site.setdefault(site_key, []).append((label, name, grp, key, kquota, expire))
+				keys_data.append({'name': name, 'group': grp, 'key': key, 'quota': kquota, 'status': 1, 'expire': expire})
+			if keys_data:
+				all_json.append({'site': site_name, 'domain': domain, 'account': label, 'keys': keys_data})
+
+			# 3) 模型（每站只查一次）
+			if not models_fetched:
+				highlighted, total = classify_models((site['models'] or {}).get('data', {}))
+				if highlighted:
+					models_str = ', '.join(highlighted[:15])
+					if len(highlighted) > 15:
+						models_str += f' +{len(highlighted)-15}'
+					model_rows.append((site_name, total, models_str))
+				models_fetched = True
 
-				# 1) 额度
-				d = api_get(c, domain, '/api/user/self', session, user_id)
-				u = d.get('data', {})
-				if u:
-					quota = u.get('quota', 0)
-					used = u.get('used_quota', 0)
-					req = u.get('request_count', 0)
-					group = u.get('group', 'default')
-					quota_rows.append((site_name, label, fmt_quota(quota), fmt_quota(used), req, group))
-					quota_total[label] += quota / 500_000
-
-				# 2) Keys
-				td = api_get(c, domain, '/api/token/?p=0&page_size=100', session, user_id)
-				keys_data = []
-				for it in td.get('data', {}).get('items', []):
-					if it.get('status') != 1:
-						continue
-					key = f'sk-{it["key"]}'
-					name = it.get('name', '')
-					grp = it.get('group', 'default')
-					kquota = '无限' if it.get('unlimited_quota') else fmt_quota(it.get('remain_quota', 0))
-					expire = fmt_expire(it.get('expired_time', -1))
-					keys_by_site.setdefault(site_key, []).append((label, name, grp, key, kquota, expire))
-					keys_data.append({'name': name, 'group': grp, 'key': key, 'quota': kquota, 'status': 1, 'expire': expire})
-				if keys_data:
-					all_json.append({'site': site_name, 'domain': domain, 'account': label, 'keys': keys_data})
-
-				# 3) 模型（每站只查一次）
-				if not models_fetched:
-					md_data = api_get(c, domain, '/api/models', session, user_id)
-					highlighted, total = classify_models(md_data.get('data', {}))
-					if highlighted:
-						models_str = ', '.join(highlighted[:15])
-						if len(highlighted) > 15:
-							models_str += f' +{len(highlighted)-15}'
-						model_rows.append((site_name, total, models_str))
-					models_fetched = True
-
-				# 4) 使用量
-				ld = api_get(c, domain, '/api/log/self/?p=0&page_size=5', session, user_id)
-				for it in ld.get('data', {}).get('items', [])[:3]:
-					model = it.get('model_name', '')
-					pt = it.get('prompt_tokens', 0)
-					ct = it.get('completion_tokens', 0)
-					cost = fmt_quota(it.get('quota', 0))
-					ts = datetime.fromtimestamp(it.get('created_at', 0)).strftime('%m-%d %H:%M') if it.get('created_at') else '-'
-					log_rows[label].append((site_name, model, pt, ct, cost, ts))
-
-			print('OK', flush=True)
+			# 4) 使用量
+			for it in page_items(data['logs'])[0][:3]:
+				model = it.get('model_name', '')
+				pt = it.get('prompt_tokens', 0)
+				ct = it.get('completion_tokens', 0)
+				cost = fmt_quota(it.get('quota', 0))
+				ts = datetime.fromtimestamp(it.get('created_at', 0)).strftime('%m-%d %H:%M') if it.get('created_at') else '-'
+				log_rows[label].append((site_name, model, pt, ct, cost, ts))
 
 	# 生成 Markdown
 	md = [f'# 站点信息汇总报告\n', f'> 更新时间: {now}\n']
@@ -190,8 +454,114 @@ def main():
 		for sn, model, pt, ct, cost, ts in log_rows[label]:
 			md.append(f'| {sn} | {model} | {pt}/{ct} | {cost} | {ts} |')
 
+	# 5. 累计使用量
+	if usage and usage['models']:
+		md.append('\n## 5. 累计使用量\n')
+		for title, key in (('按模型', 'models'), ('按站点', 'sites'), ('按日期（最近 7 天）', 'days')):
+			md.append(f'\n### {title}\n')
+			md.append('| 名称 | 请求数 | Tokens(入/出) | 花费 |')
+			md.append('|------|--------|---------------|------|')
+			for name, req, pt, ct, cost in usage[key]:
+				md.append(f'| {name} | {req} | {pt}/{ct} | {fmt_quota(cost)} |')
+
 	md.append(f'\n---\n生成时间: {now}\n')
-	md_content = '\n'.join(md)
+	return '\n'.join(md), all_json
+
+
+EVENT_NAMES = {'new': '新增', 'expired': '过期', 'exhausted': '耗尽', 'removed': '删除'}
+
+
+def mask_key(key):
+	return f'sk-{key[:6]}...{key[-4:]}' if len(key) > 12 else f'sk-{key}'
+
+
+def format_events(events):
+	"""令牌事件 → 按类型分组的文本行"""
+	if not events:
+		return ['  令牌无变化']
+	lines = []
+	for event, title in EVENT_NAMES.items():
+		group = [e for e in events if e['event'] == event]
+		if not group:
+			continue
+		lines.append(f'  {title} ({len(group)}):')
+		for e in group:
+			lines.append(f'    {e.get("site_name") or e["site"]} / {e["account"]}  {e["name"] or "-"}  {mask_key(e["key"])}')
+	return lines
+
+
+def show_diff(path=INVENTORY_FILE):
+	"""只读本地库存，输出最近一次查询的令牌变化"""
+	if not os.path.exists(path):
+		print(f'[DIFF] 库存不存在: {path}（先运行一次 python get_all_keys.py）')
+		return
+	start = time.perf_counter()
+	with Inventory(path) as inventory:
+		run = inventory.last_run()
+		events = inventory.events(run['id']) if run else []
+	if run is None:
+		print('[DIFF] 库存中还没有完成的查询')
+		return
+	finished = datetime.fromtimestamp(run['finished_at']).strftime('%Y-%m-%d %H:%M:%S')
+	print(f'[DIFF] {finished} 查询 #{run["id"]}: {run["accounts"]} 个账号, 复用快照 {run["reused"]}')
+	print('\n'.join(format_events(events)))
+	print(f'  ({(time.perf_counter() - start) * 1000:.1f}ms)')
+
+
+def show_models(name, reveal=False, path=INVENTORY_FILE):
+	"""只读本地库存：哪些站点 / 分组 / Key 可用该模型（无限额度优先，剩余额度降序）"""
+	if not os.path.exists(path):
+		print(f'[MODELS] 库存不存在: {path}（先运行一次 python get_all_keys.py）')
+		return
+	start = time.perf_counter()
+	with Inventory(path) as inventory:
+		rows = inventory.find_model(name)
+	elapsed = (time.perf_counter() - start) * 1000
+	if not rows:
+		print(f'[MODELS] 没有可用 {name} 的 Key（规范化: {normalize_model(name)}, {elapsed:.1f}ms）')
+		return
+	sites = {r['site'] for r in rows}
+	print(f'[MODELS] {name}: {len(rows)} 个 Key / {len(sites)} 个站点 ({elapsed:.1f}ms)')
+	for r in rows:
+		quota = '无限' if r['unlimited'] else fmt_quota(r['remain_quota'] or 0)
+		key = f'sk-{r["key"]}' if reveal else mask_key(r['key'])
+		print(f'  {r["site_name"] or r["site"]} / {r["account"]}  {r["model"]}  {r["grp"]}  {key}  {quota}')
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description='获取所有站点的 API Key、额度、模型、使用量')
+	parser.add_argument('--full', action='store_true', help='不复用库存快照，全部重新查询（使用量统计重新累计）')
+	sub = parser.add_subparsers(dest='command')
+	sub.add_parser('diff', help='列出最近一次查询的令牌变化（只读本地库存）')
+	models = sub.add_parser('models', help='查询可用某个模型的站点和 Key（只读本地库存）')
+	models.add_argument('name', help='模型名，如 claude-3.5-sonnet（规范化后匹配，无精确匹配时按子串）')
+	models.add_argument('--reveal', action='store_true', help='显示完整 Key')
+	return parser.parse_args(argv)
+
+
+def main():
+	args = parse_args()
+	if args.command == 'diff':
+		show_diff()
+		return
+	if args.command == 'models':
+		show_models(args.name, args.reveal)
+		return
+
+	with open(SITES_FILE, 'r', encoding='utf-8') as f:
+		sites = json.load(f)
+	with open(SITE_INFO_FILE, 'r', encoding='utf-8') as f:
+		info = json.load(f)
+
+	now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+	start = time.monotonic()
+	stats = {}
+	with Inventory(INVENTORY_FILE) as inventory:
+		fetched = asyncio.run(collect(sites, info, inventory=inventory, full=args.full, stats=stats))
+		usage = inventory.usage_summary()
+	print(f'  查询完成: {len(fetched)} 个站点, 耗时 {time.monotonic() - start:.1f}s, '
+		  f'复用快照 {stats["reused"]}/{stats["accounts"]} 个账号', flush=True)
+	md_content, all_json = build_report(sites, info, fetched, now, usage)
 
 	with open(OUTPUT_MD, 'w', encoding='utf-8') as f:
 		f.write(md_content)
@@ -199,7 +569,9 @@ def main():
 		json.dump(all_json, f, indent=2, ensure_ascii=False)
 
 	print(md_content)
-	print(f'\n已保存: {OUTPUT_MD} / {OUTPUT_JSON}')
+	print('\n[DIFF] 令牌变化（python get_all_keys.py diff 可随时查看）:')
+	print('\n'.join(format_events(stats['events'])))
+	print(f'\n已保存: {OUTPUT_MD} / {OUTPUT_JSON} / {INVENTORY_FILE}')
 
 
 if __name__ == '__main__':
@@ -9,24 +9,56 @@
 
 import argparse
 import asyncio
+import itertools
 import json
 import logging
 import os
 import platform
-import re
+import secrets
 import shutil
+import signal
 import subprocess
 import sys
 import tempfile
 import time
 from collections import defaultdict
-from contextlib import contextmanager
-from datetime import datetime
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
 from urllib.parse import quote
 
 import httpx
 
+from utils.atomic import atomic_write
+from utils.browser_state import load_state, restore_state, save_state, session_valid, state_path
+from utils.browser_waits import (
+	CF_TITLE_KEYWORDS,
+	SessionCookieWatcher,
+	polled_cost,
+	record_saved,
+	saved_time,
+	wait_challenge_cleared,
+	wait_for_condition,
+	wait_for_oauth_callback,
+	wait_for_oauth_page,
+	wait_page_settled,
+)
+from utils.circuit import CircuitOpenError, DomainGuard
+from utils.concurrency import ExclusiveKeyQueue, KeyedSemaphore, domain_key, root_domain
+from utils.http_pool import HttpClientPool, chain_cookies, cookie_header, send_following
+from utils.journal import ResultJournal
+from utils.mem_budget import MemoryBudget
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils.metrics import Registry
+from utils.oauth_http import OAUTH_AUTHORIZE_URL, oauth_login_http
+from utils.scheduler import DailySchedule, parse_times
+from utils.session_life import REFRESH_MARGIN_DAYS, add_sample, session_age, sessions_due
+from utils.site_store import SiteInfoStore
+from utils.status_server import StatusServer
+from utils.tracing import traced, tracer
+from utils.waf_cache import WafCookieCache, cookie_expiries
+from utils.waf_solver import WafSolverPool, extract_challenge
+
 IS_LINUX = platform.system() == 'Linux'
 PROXY_URL = os.environ.get('https_proxy') or os.environ.get('http_proxy') or os.environ.get('HTTPS_PROXY') or os.environ.get('HTTP_PROXY')
 
@@ -44,12 +76,19 @@ def detect_chrome():
 
 CHROME_EXE = detect_chrome()
 DEBUG_PORT = 9222
-OAUTH_AUTHORIZE_URL = 'https://connect.linux.do/oauth2/authorize'
+CHROME_STOP_TIMEOUT = 5  # terminate 后等待 Chrome 退出的秒数，超时 kill
 RESULTS_FILE = 'checkin_results.json'
+RESULTS_JOURNAL_FILE = 'checkin_results.jsonl'
+REFRESH_JOURNAL_FILE = 'refresh_results.jsonl'  # 续期模式的结果日志，不覆盖当天签到结果
 LOG_DIR = Path('logs')
 
 log: logging.Logger = logging.getLogger('checkin')
 
+# 按域名的令牌桶 + 熔断器：所有 httpx 请求经连接池自动经过，浏览器阶段据此跳过已确认连不上的站点
+domain_guard = DomainGuard()
+# 进程级 httpx 连接池：Phase 0/1、resolve_sites、CDP 探测共用，main() 结束时关闭
+http_pool = HttpClientPool(proxy=PROXY_URL, guard=domain_guard)
+
 
 # ===================== 日志配置 =====================
 def setup_logging() -> logging.Logger:
@@ -76,26 +115,33 @@ def setup_logging() -> logging.Logger:
 
 @contextmanager
 def timer(label: str):
-	"""计时上下文管理器，自动记录耗时到日志"""
+	"""计时上下文管理器，自动记录耗时到日志（含浏览器事件等待相对固定 sleep 节省的时间），同时记一个追踪 span"""
 	start = time.monotonic()
-	yield
+	with saved_time() as saved, tracer.span(label, cat='timer'):
+		yield
 	elapsed = time.monotonic() - start
-	log.debug(f'  [TIMER] {label}: {elapsed:.1f}s')
+	extra = f' (事件等待节省 {saved[0]:.1f}s)' if saved[0] >= 0.1 else ''
+	log.debug(f'  [TIMER] {label}: {elapsed:.1f}s{extra}')
 
 # ===================== 站点配置 =====================
 SITES_FILE = 'sites.json'
 SITE_INFO_FILE = 'site_info.json'
 
 
+def read_sites(path=SITES_FILE):
+	"""读取站点配置并补全默认字段，文件缺失/格式错误时抛出异常"""
+	with open(path, 'r', encoding='utf-8') as f:
+		sites = json.load(f)
+	for key, cfg in sites.items():
+		cfg.setdefault('name', key)
+		cfg.setdefault('checkin_path', '/api/user/checkin')
+	return sites
+
+
 def load_sites():
 	"""从 sites.json 加载站点配置"""
 	try:
-		with open(SITES_FILE, 'r', encoding='utf-8') as f:
-			sites = json.load(f)
-		for key, cfg in sites.items():
-			cfg.setdefault('name', key)
-			cfg.setdefault('checkin_path', '/api/user/checkin')
-		return sites
+		return read_sites()
 	except FileNotFoundError:
 		print(f'[ERROR] 站点配置文件不存在: {SITES_FILE}')
 		sys.exit(1)
@@ -129,20 +175,12 @@ def extract_label(name):
 	return parts[2] if len(parts) >= 3 else name
 
 
-def solve_waf_challenge(script_content):
-	"""用 Node.js 执行 WAF 挑战脚本，解出 acw_sc__v2 cookie"""
-	try:
-		with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False, encoding='utf-8') as f:
-			f.write(script_content)
-			waf_script_path = f.name
-		result = subprocess.run(['node', SOLVE_WAF_JS, waf_script_path],
-								capture_output=True, text=True, timeout=10)
-		os.unlink(waf_script_path)
-		if result.returncode == 0 and result.stdout.strip():
-			return json.loads(result.stdout.strip())
-		return None
-	except Exception:
-		return None
+# 常驻 Node.js WAF 求解进程池（替代每次挑战 spawn 一个 node 进程），main() 结束时关闭
+waf_solver = WafSolverPool(SOLVE_WAF_JS, size=2, job_timeout=8.0)
+
+# WAF cookie 缓存（与 site_info.json 同目录），按域名跨账号/跨运行复用，出现新挑战时才失效
+WAF_COOKIES_FILE = 'waf_cookies.json'
+waf_cache = WafCookieCache(WAF_COOKIES_FILE)
 
 
 def match_linuxdo_account(ext_account_name):
@@ -169,23 +207,53 @@ def save_external_session(account_name, new_session):
 		log.warning(f'    [WARN] 回写 session 失败: {e}')
 
 
-def get_waf_cookies(domain):
-	"""获取阿里云 WAF cookies (acw_tc + cdn_sec_tc + acw_sc__v2)"""
+@traced('waf_solve', cat='waf', outcome=lambda r: 'solved' if r[1] else 'challenged' if r[0] else 'none')
+async def solve_waf_response(domain, resp, use_native=True):
+	"""响应是 WAF 挑战页时求解并写入缓存。返回 (是否挑战, 新 WAF cookies 或 None)。
+	use_native=False: Python 快速路径的结果被拒绝，强制用 Node 重新求解"""
+	challenge = extract_challenge(resp.text)
+	if not challenge:
+		return False, None
+	script, arg1 = challenge
+	host = domain_key(domain)
+	# 新挑战：旧 cookie 已失效；同一 arg1 的 acw_sc__v2 结果确定，可直接复用
+	waf_cache.invalidate(host)
+	solved = waf_cache.solution(host, arg1) if use_native else None
+	if solved:
+		log.debug(f'    [WAF] {host} 复用 arg1={arg1[:8]}... 的求解结果')
+	else:
+		native_hits, start = waf_solver.native_hits, time.monotonic()
+		solved = await waf_solver.solve_async(script, host=host, use_native=use_native)
+		metric_waf_solve_seconds.observe(time.monotonic() - start,
+										 solver='native' if waf_solver.native_hits > native_hits else 'node',
+										 outcome='ok' if solved else 'fail')
+		if not solved:
+			return True, None
+	waf_cookies = {**chain_cookies(resp), **solved}
+	waf_cache.put(host, waf_cookies, expires=cookie_expiries(resp), arg1=arg1, solved=solved)
+	return True, waf_cookies
+
+
+@traced('waf_cookies', cat='waf', outcome=lambda r: 'ok' if r else 'none')
+async def get_waf_cookies(domain, client=None):
+	"""获取阿里云 WAF cookies (acw_tc + cdn_sec_tc + acw_sc__v2)，优先使用缓存"""
+	host = domain_key(domain)
+	cached = waf_cache.get(host)
+	if cached:
+		log.debug(f'    [WAF] {host} 使用缓存 cookies')
+		return cached
+	client = client or http_pool.get()
 	try:
-		with httpx.Client(timeout=15.0, verify=False, follow_redirects=True) as client:
-			resp = client.get(f'{domain}/api/user/self',
-							  headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-									   'Accept': 'text/html,application/xhtml+xml'})
-			waf_cookies = dict(resp.cookies)
-			if resp.status_code == 200 and '<script>' in resp.text:
-				scripts = re.findall(r'<script[^>]*>([\s\S]*?)</script>', resp.text, re.IGNORECASE)
-				if scripts:
-					solved = solve_waf_challenge(scripts[0])
-					if solved:
-						waf_cookies.update(solved)
-					else:
-						return None
+		resp = await send_following(client, 'GET', f'{domain}/api/user/self', timeout=15.0,
+									headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+											 'Accept': 'text/html,application/xhtml+xml'})
+		challenged, waf_cookies = await solve_waf_response(domain, resp)
+		if challenged:
 			return waf_cookies
+		waf_cookies = chain_cookies(resp)
+		if waf_cookies:
+			waf_cache.put(host, waf_cookies, expires=cookie_expiries(resp))
+		return waf_cookies
 	except Exception:
 		return None
 
@@ -200,6 +268,23 @@ LINUXDO_ACCOUNTS = [
 
 # ===================== 结果记录 =====================
 results = []  # [{account, site, login_ok, checkin_ok, checkin_msg, session, error}]
+# 追加式日志：record() 只追加一行，阶段结束 fsync，main() 结束时压缩为 RESULTS_FILE
+journal = ResultJournal(RESULTS_JOURNAL_FILE)
+
+# ===================== 指标 =====================
+# Prometheus 指标：一次性运行写 --metrics-file（textfile collector），常驻模式由 GET /metrics 提供
+metrics = Registry(prefix='checkin_')
+metric_results = metrics.counter('results_total', '签到结果数', ('method', 'outcome'))
+metric_oauth_seconds = metrics.histogram('oauth_login_seconds', '站点 OAuth 登录耗时', ('method', 'outcome'))
+metric_chrome_launch_seconds = metrics.histogram('chrome_launch_seconds', 'Chrome 启动到 CDP 就绪耗时', ('outcome',),
+												 buckets=(0.5, 1, 2, 3, 5, 10, 20))
+metric_session_cache = metrics.counter('session_cache_total', 'Phase 1 缓存 session 签到', ('result',))
+metric_waf_solve_seconds = metrics.histogram('waf_solve_seconds', 'WAF 挑战求解耗时', ('solver', 'outcome'),
+											 buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+metric_cache_hit_ratio = metrics.gauge('session_cache_hit_ratio', '最近一轮 Phase 1 缓存命中率')
+metric_tasks = metrics.gauge('tasks', '今日 (站点, 账号) 任务状态，来自汇总', ('status',))
+metric_last_run_timestamp = metrics.gauge('last_run_timestamp_seconds', '最近一轮结束时间 (unix)')
+metric_last_run_seconds = metrics.gauge('last_run_duration_seconds', '最近一轮耗时')
 
 
 def kill_chrome():
@@ -210,6 +295,156 @@ def kill_chrome():
 					   capture_output=True, encoding='gbk', errors='ignore')
 
 
+async def wait_cdp_ready(port, attempts=10):
+	"""轮询 Chrome CDP /json/version，就绪返回 True"""
+	client = http_pool.get('local', local=True)
+	for _ in range(attempts):
+		await asyncio.sleep(1)
+		try:
+			await client.get(f'http://127.0.0.1:{port}/json/version', timeout=2)
+			return True
+		except Exception:
+			pass
+	return False
+
+
+def chrome_command(debug_port, user_data_dir):
+	"""Chrome 启动参数"""
+	args = [
+		CHROME_EXE, f'--remote-debugging-port={debug_port}', f'--user-data-dir={user_data_dir}',
+		'--no-first-run', '--no-default-browser-check',
+	]
+	if IS_LINUX:
+		args += [
+			'--headless=new', '--no-sandbox', '--disable-gpu', '--disable-dev-shm-usage',
+			'--disable-blink-features=AutomationControlled', '--window-size=1920,1080',
+		]
+	if PROXY_URL:
+		args.append(f'--proxy-server={PROXY_URL}')
+	args.append('about:blank')
+	return args
+
+
+@traced('chrome_launch', cat='browser', outcome=lambda r: 'ok' if r[0] else 'fail')
+async def launch_chrome(debug_port, prefix='chrome_'):
+	"""启动 Chrome（临时 profile）并等待 CDP 就绪。返回 (proc, tmpdir)，失败返回 (None, None)"""
+	start = time.monotonic()
+	tmpdir = tempfile.mkdtemp(prefix=prefix)
+	proc = await asyncio.create_subprocess_exec(*chrome_command(debug_port, tmpdir),
+												stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+	if not await wait_cdp_ready(debug_port):
+		await stop_chrome(proc, tmpdir)
+		metric_chrome_launch_seconds.observe(time.monotonic() - start, outcome='fail')
+		return None, None
+	metric_chrome_launch_seconds.observe(time.monotonic() - start, outcome='ok')
+	return proc, tmpdir
+
+
+async def stop_chrome(proc, tmpdir):
+	"""结束 Chrome 进程并删除临时 profile（异步等待退出，不阻塞其他账号的协程）"""
+	try:
+		proc.terminate()
+		await asyncio.wait_for(proc.wait(), timeout=CHROME_STOP_TIMEOUT)
+	except ProcessLookupError:
+		pass
+	except asyncio.TimeoutError:
+		if proc.returncode is None:
+			proc.kill()
+		await proc.wait()
+	await asyncio.to_thread(shutil.rmtree, tmpdir, ignore_errors=True)
+
+
+class SharedChrome:
+	"""浏览器池模式：整轮只启动一个 Chrome，每个账号按需 new_context()（cookie/存储互相隔离），用完即关。
+	首次 new_context() 时才启动，close() 在 main() 结束时调用"""
+
+	def __init__(self, debug_port=DEBUG_PORT):
+		self.debug_port = debug_port
+		self.proc = None
+		self.tmpdir = None
+		self.browser = None
+		self._pw = None
+		self._lock = asyncio.Lock()
+
+	async def _ensure_started(self):
+		async with self._lock:
+			if self.browser is not None and self.browser.is_connected():
+				return True
+			from playwright.async_api import async_playwright
+
+			await self.close()
+			self.proc, self.tmpdir = await launch_chrome(self.debug_port, prefix='chrome_pool_')
+			if not self.proc:
+				return False
+			self._pw = await async_playwright().start()
+			self.browser = await self._pw.chromium.connect_over_cdp(f'http://127.0.0.1:{self.debug_port}')
+			log.info(f'  [POOL] 共享 Chrome 已启动 (port {self.debug_port})')
+			return True
+
+	async def start(self):
+		"""提前启动 Chrome（常驻模式预热），失败返回 False"""
+		return await self._ensure_started()
+
+	async def new_context(self):
+		"""新建一个隔离的 BrowserContext，Chrome 启动失败返回 None"""
+		if not await self._ensure_started():
+			return None
+		return await self.browser.new_context()
+
+	async def close(self):
+		if self.browser is not None:
+			try:
+				await asyncio.wait_for(self.browser.close(), timeout=5)
+			except Exception:
+				pass
+			self.browser = None
+		if self._pw is not None:
+			try:
+				await self._pw.stop()
+			except Exception:
+				pass
+			self._pw = None
+		if self.proc is not None:
+			await stop_chrome(self.proc, self.tmpdir)
+			self.proc = self.tmpdir = None
+
+
+@asynccontextmanager
+async def browser_context(debug_port=DEBUG_PORT, prefix='chrome_', shared=None):
+	"""获取一个 BrowserContext，Chrome 启动失败时 yield None。
+	shared 不为空（池模式）时从共享 Chrome new_context()；否则（进程模式）启动独立 Chrome 进程"""
+	if shared is not None:
+		ctx = await shared.new_context()
+		try:
+			yield ctx
+		finally:
+			if ctx is not None:
+				try:
+					await asyncio.wait_for(ctx.close(), timeout=5)
+				except Exception:
+					pass
+		return
+
+	from playwright.async_api import async_playwright
+
+	proc, tmpdir = await launch_chrome(debug_port, prefix=prefix)
+	if not proc:
+		yield None
+		return
+	try:
+		async with async_playwright() as p:
+			browser = await p.chromium.connect_over_cdp(f'http://127.0.0.1:{debug_port}')
+			try:
+				yield browser.contexts[0]
+			finally:
+				try:
+					await asyncio.wait_for(browser.close(), timeout=5)
+				except Exception:
+					pass
+	finally:
+		await stop_chrome(proc, tmpdir)
+
+
 def record(account_label, site_key, site_name='', domain='', **kwargs):
 	"""记录一条结果"""
 	entry = {
@@ -221,65 +456,19 @@ def record(account_label, site_key, site_name='', domain='', **kwargs):
 		**kwargs,
 	}
 	results.append(entry)
-	with open(RESULTS_FILE, 'w', encoding='utf-8') as f:
-		json.dump(results, f, indent=2, ensure_ascii=False)
+	journal.append(entry)
 	return entry
 
 
 
 # ===================== site_info.json 管理 =====================
+# 字段变更只标记 dirty，防抖合并写入；阶段结束时 site_store.flush() 强制落盘
+site_store = SiteInfoStore(SITE_INFO_FILE, accounts_count=len(LINUXDO_ACCOUNTS))
+
 
 def load_site_info():
 	"""加载 site_info.json，不存在则返回空结构"""
-	try:
-		with open(SITE_INFO_FILE, 'r', encoding='utf-8') as f:
-			return json.load(f)
-	except (FileNotFoundError, json.JSONDecodeError):
-		return {'_meta': {'last_run': None, 'checkin_date': None}}
-
-
-def save_site_info(info):
-	"""保存 site_info.json，自动更新摘要统计"""
-	info['_meta']['last_run'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-	# 计算摘要
-	total = done = success = already = failed = pending = skipped_sites = removed_sites = 0
-	for key, val in info.items():
-		if key == '_meta' or not isinstance(val, dict):
-			continue
-		if val.get('_removed'):
-			removed_sites += 1
-			continue
-		if val.get('skip'):
-			skipped_sites += 1
-			continue
-		for acc_val in val.get('accounts', {}).values():
-			if acc_val.get('_excluded'):
-				continue
-			total += 1
-			s = acc_val.get('checkin_status', 'pending')
-			if s == 'success':
-				done += 1; success += 1
-			elif s == 'already_checked':
-				done += 1; already += 1
-			elif s == 'failed':
-				done += 1; failed += 1
-			else:
-				pending += 1
-	active_sites = sum(1 for k, v in info.items() if k != '_meta' and isinstance(v, dict) and not v.get('skip') and not v.get('_removed'))
-	info['_meta']['summary'] = {
-		'total_sites': active_sites + skipped_sites,
-		'active_sites': active_sites,
-		'skipped_sites': skipped_sites,
-		'accounts': len(LINUXDO_ACCOUNTS),
-		'total_tasks': total,
-		'done': done,
-		'success': success,
-		'already_checked': already,
-		'failed': failed,
-		'pending': pending,
-	}
-	with open(SITE_INFO_FILE, 'w', encoding='utf-8') as f:
-		json.dump(info, f, indent=2, ensure_ascii=False)
+	return site_store.load()
 
 
 def sync_site_info(sites):
@@ -397,7 +586,8 @@ def sync_site_info(sites):
 				info[site_key]['_removed'] = True
 				changes.append(f'  [REMOVED] {info[site_key].get("name", site_key)}')
 
-	save_site_info(info)
+	site_store.rebuild_summary()
+	site_store.flush(force=True)
 
 	if changes:
 		log.info(f'  [SYNC] 检测到变更:')
@@ -411,13 +601,15 @@ def update_site_info(info, site_key, **kwargs):
 	"""更新站点级信息（client_id, alive, has_cf, version 等）"""
 	if site_key in info:
 		info[site_key].update(kwargs)
-		save_site_info(info)
+		site_store.mark_dirty(site_key)
 
 
 def update_account_info(info, site_key, label, **kwargs):
 	"""更新某站点某账号的信息（session, checkin_status 等）。值为 None 的字段会被删除。"""
 	if site_key in info and 'accounts' in info[site_key]:
-		acc = info[site_key]['accounts'].setdefault(label, {})
+		accounts = info[site_key]['accounts']
+		old_status = accounts[label].get('checkin_status', 'pending') if label in accounts else None
+		acc = accounts.setdefault(label, {})
 		for k, v in kwargs.items():
 			if v is None:
 				acc.pop(k, None)
@@ -425,7 +617,10 @@ def update_account_info(info, site_key, label, **kwargs):
 				acc[k] = v
 		if 'checkin_status' in kwargs and kwargs['checkin_status'] != 'pending':
 			acc['checkin_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-		save_site_info(info)
+		new_status = acc.get('checkin_status', 'pending')
+		if new_status != old_status:
+			site_store.transition(site_key, label, old_status, new_status)
+		site_store.mark_dirty(site_key)
 
 
 def get_account_info(info, site_key, label):
@@ -443,89 +638,179 @@ def is_checkin_done_today(info, site_key, label):
 			acc.get('checkin_status') in ('success', 'already_checked'))
 
 
-async def resolve_sites(info):
-	"""补全 info 中缺失的 client_id，优先用缓存，否则 httpx 获取 /api/status"""
-	changed = False
+RESOLVE_CONCURRENCY = 16  # /api/status 并发探测上限
+RESOLVE_NEG_TTL_HOURS = 6  # 负缓存初始有效期，之后每次失败翻倍
+RESOLVE_NEG_MAX_HOURS = 7 * 24  # 负缓存有效期上限
+# 只有确定性失败进负缓存：连接失败（含 DNS 解析失败）、站点明确没有 client_id（/api/status 无该字段或 404）。
+# 5xx / 429 / 读超时 / 熔断中 / 非 JSON 响应都是暂时性的，下次运行照常重试
 
-	for site_key, site_data in info.items():
-		if site_key == '_meta' or not isinstance(site_data, dict):
-			continue
-		if site_data.get('skip') or site_data.get('_removed') or site_data.get('client_id') or site_data.get('provider'):
-			continue
 
-		# httpx 获取 /api/status
+def _resolve_negative_cached(site_data, now):
+	"""站点是否处于负缓存期内（上次探测失败且未到重试时间）"""
+	fail = site_data.get('resolve_fail')
+	if not fail or not fail.get('retry_after'):
+		return False
+	try:
+		return now < datetime.strptime(fail['retry_after'], '%Y-%m-%d %H:%M:%S')
+	except ValueError:
+		return False
+
+
+def _resolve_mark_failed(info, site_key, reason, now):
+	"""记录探测失败，按指数退避计算下次重试时间"""
+	prev = info[site_key].get('resolve_fail') or {}
+	count = prev.get('count', 0) + 1
+	ttl_hours = min(RESOLVE_NEG_TTL_HOURS * 2 ** (count - 1), RESOLVE_NEG_MAX_HOURS)
+	update_site_info(info, site_key, resolve_fail={
+		'reason': reason,
+		'count': count,
+		'last_try': now.strftime('%Y-%m-%d %H:%M:%S'),
+		'retry_after': (now + timedelta(hours=ttl_hours)).strftime('%Y-%m-%d %H:%M:%S'),
+	})
+	return ttl_hours
+
+
+async def _resolve_one(info, site_key, site_data, client, sem, now):
+	"""探测单个站点的 /api/status，返回 True 表示获取到 client_id"""
+	async with sem:
 		try:
-			async with httpx.AsyncClient(verify=False, timeout=15, follow_redirects=True) as client:
-				resp = await client.get(f'{site_data["domain"]}/api/status')
-				if resp.status_code == 200:
-					d = resp.json().get('data', {})
-					cid = d.get('linuxdo_client_id', '')
-					if cid:
-						update_site_info(info, site_key,
-							client_id=cid,
-							name=d.get('system_name', '') or site_data.get('name', site_key),
-							version=d.get('version', ''),
-							checkin_enabled=d.get('checkin_enabled'),
-							min_trust_level=d.get('min_trust_level'),
-						)
-						changed = True
-						log.info(f'  [META] {site_key}: 自动获取 client_id={cid[:12]}...')
+			resp = await send_following(client, 'GET', f'{site_data["domain"]}/api/status',
+										timeout=httpx.Timeout(15, connect=5))
+		except CircuitOpenError:
+			log.debug(f'  [META] {site_key}: 熔断中，下次运行重试')
+			return False
+		except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+			ttl = _resolve_mark_failed(info, site_key, 'unreachable', now)
+			log.debug(f'  [META] {site_key}: /api/status 不可达 ({type(e).__name__})，{ttl}h 内不再探测')
+			return False
+		except Exception as e:
+			log.debug(f'  [META] {site_key}: /api/status 请求失败 ({type(e).__name__})，下次运行重试')
+			return False
+
+	cid = ''
+	d = {}
+	answered = resp.status_code == 404  # 站点明确答复（没有 /api/status 或 JSON 中没有 client_id）
+	if resp.status_code == 200:
+		try:
+			d = resp.json().get('data', {}) or {}
+			cid = d.get('linuxdo_client_id', '')
+			answered = True
 		except Exception:
 			pass
+	if not cid:
+		if not answered:
+			log.debug(f'  [META] {site_key}: 未获取到 client_id (http_{resp.status_code})，下次运行重试')
+			return False
+		ttl = _resolve_mark_failed(info, site_key, 'no_client_id', now)
+		log.debug(f'  [META] {site_key}: 未获取到 client_id (no_client_id)，{ttl}h 内不再探测')
+		return False
+
+	info[site_key].pop('resolve_fail', None)
+	update_site_info(info, site_key,
+		client_id=cid,
+		name=d.get('system_name', '') or site_data.get('name', site_key),
+		version=d.get('version', ''),
+		checkin_enabled=d.get('checkin_enabled'),
+		min_trust_level=d.get('min_trust_level'),
+	)
+	log.info(f'  [META] {site_key}: 自动获取 client_id={cid[:12]}...')
+	return True
 
-	return changed
 
+@traced('resolve_sites', cat='phase', phase='resolve')
+async def resolve_sites(info, client=None):
+	"""补全 info 中缺失的 client_id：并发 httpx 获取 /api/status。
+	失败结果（不可达 / 无 linuxdo_client_id）以 resolve_fail 写入 site_info，按指数退避跳过重试。"""
+	client = client or http_pool.get()
+	now = datetime.now()
+	sem = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+	tasks = []
+	neg_cached = 0
 
-async def do_checkin_via_httpx(domain, checkin_path, session, user_id=None, access_token=None):
+	for site_key, site_data in info.items():
+		if site_key == '_meta' or not isinstance(site_data, dict):
+			continue
+		if site_data.get('skip') or site_data.get('_removed') or site_data.get('client_id') or site_data.get('provider'):
+			continue
+		if _resolve_negative_cached(site_data, now):
+			neg_cached += 1
+			continue
+		tasks.append(_resolve_one(info, site_key, site_data, client, sem, now))
+
+	if neg_cached:
+		log.debug(f'  [META] {neg_cached} 个站点处于负缓存期，跳过 /api/status 探测')
+	if not tasks:
+		return False
+	with timer(f'resolve_sites ({len(tasks)} 个站点)'):
+		outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+	return any(o is True for o in outcomes)
+
+
+def checkin_outcome(result):
+	"""签到结果 → 追踪/统计用的结果标签"""
+	if not result:
+		return 'none'
+	if result.get('success'):
+		return 'success'
+	if result.get('expired'):
+		return 'expired'
+	if result.get('error'):
+		return 'error'
+	return 'message'
+
+
+@traced('checkin', cat='httpx', outcome=checkin_outcome, method='httpx')
+async def do_checkin_via_httpx(domain, checkin_path, session, user_id=None, access_token=None, client=None):
 	"""用 httpx 直接调用签到 API，不走浏览器。返回格式与 do_checkin_via_browser 一致。"""
-	headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+	client = client or http_pool.get()
+	headers = {'Accept': 'application/json', 'Content-Type': 'application/json',
+			   'Cookie': cookie_header({'session': session})}
 	if access_token:
 		headers['Authorization'] = f'Bearer {access_token}'
 	elif user_id:
 		headers['New-Api-User'] = str(user_id)
-	cookies = {'session': session}
 
 	try:
-		async with httpx.AsyncClient(verify=False, timeout=15, follow_redirects=False) as client:
-			resp = await client.post(f'{domain}{checkin_path}', headers=headers, cookies=cookies)
-
-			# 3xx 重定向 = session 过期（跳转到登录页）
-			if resp.status_code in (301, 302, 307, 308):
-				return {'expired': True, 'message': 'session expired (redirect)'}
-			if resp.status_code == 401:
-				return {'expired': True, 'message': 'session expired (401)'}
-
-			# HTML 响应 = session 过期
-			content_type = resp.headers.get('content-type', '')
-			if 'text/html' in content_type:
-				return {'expired': True, 'message': 'session expired (html)'}
-
-			data = resp.json()
-			result = {
-				'status': resp.status_code, 'success': data.get('success'),
-				'message': data.get('message', ''), 'data': data.get('data', {}),
-			}
+		resp = await client.post(f'{domain}{checkin_path}', headers=headers, timeout=15, follow_redirects=False)
+
+		# 3xx 重定向 = session 过期（跳转到登录页）
+		if resp.status_code in (301, 302, 307, 308):
+			return {'expired': True, 'expired_by': 'redirect', 'message': 'session expired (redirect)'}
+		if resp.status_code == 401:
+			return {'expired': True, 'expired_by': '401', 'message': 'session expired (401)'}
+
+		# HTML 响应 = session 过期（也可能是 WAF / CF 挑战页，不作为寿命样本）
+		content_type = resp.headers.get('content-type', '')
+		if 'text/html' in content_type:
+			return {'expired': True, 'expired_by': 'html', 'message': 'session expired (html)'}
+
+		data = resp.json()
+		result = {
+			'status': resp.status_code, 'success': data.get('success'),
+			'message': data.get('message', ''), 'data': data.get('data', {}),
+		}
 
-			# POST 404 → GET 降级
-			if resp.status_code == 404:
-				resp2 = await client.get(f'{domain}{checkin_path}', headers=headers, cookies=cookies)
-				if 'text/html' in resp2.headers.get('content-type', ''):
-					return {'expired': True, 'message': 'session expired (html)'}
-				data2 = resp2.json()
-				return {
-					'status': resp2.status_code, 'success': data2.get('success'),
-					'message': data2.get('message', ''), 'data': data2.get('data', {}), 'method': 'GET',
-				}
+		# POST 404 → GET 降级
+		if resp.status_code == 404:
+			resp2 = await client.get(f'{domain}{checkin_path}', headers=headers, timeout=15, follow_redirects=False)
+			if 'text/html' in resp2.headers.get('content-type', ''):
+				return {'expired': True, 'expired_by': 'html', 'message': 'session expired (html)'}
+			data2 = resp2.json()
+			return {
+				'status': resp2.status_code, 'success': data2.get('success'),
+				'message': data2.get('message', ''), 'data': data2.get('data', {}), 'method': 'GET',
+			}
 
-			return result
+		return result
 	except (httpx.ConnectError, httpx.ConnectTimeout):
 		return {'error': '站点无法连接'}
 	except Exception as e:
 		return {'error': str(e)[:80]}
 
 
-def handle_checkin_result(label, site_key, checkin_result, session_value, info, method='httpx'):
-	"""统一处理签到结果（httpx 和浏览器共用）。返回 True 表示有效成功。"""
+def handle_checkin_result(label, site_key, checkin_result, session_value, info, method='httpx', log_prefix=''):
+	"""统一处理签到结果（httpx 和浏览器共用）。返回 True 表示有效成功。
+	log_prefix: 并发执行时用于区分账号/站点的日志前缀"""
 	today = datetime.now().strftime('%Y-%m-%d')
 	site_data = info.get(site_key, {})
 	sn = site_data.get('name', site_key)
@@ -538,48 +823,52 @@ def handle_checkin_result(label, site_key, checkin_result, session_value, info,
 		data = checkin_result.get('data', {})
 		quota = data.get('quota_awarded') or data.get('quota', '?')
 		msg = checkin_result.get('message', '') or '签到成功'
-		log.info(f'    [OK] {msg} (额度: {quota})')
+		log.info(f'    {log_prefix}[OK] {msg} (额度: {quota})')
 		record(label, site_key, site_name=sn, domain=dm, login_ok=True, checkin_ok=True,
 			   session=session_value[:50], checkin_msg=msg, quota=quota)
 		update_account_info(info, site_key, label,
 			checkin_status='success', checkin_date=today,
 			checkin_method=method, checkin_msg=msg, quota=quota, error=None)
+		metric_results.inc(method=method, outcome='success')
 		return True
 	elif checkin_result and checkin_result.get('error'):
-		log.warning(f'    [FAIL] {checkin_result["error"]}')
+		log.warning(f'    {log_prefix}[FAIL] {checkin_result["error"]}')
 		record(label, site_key, site_name=sn, domain=dm, login_ok=True, checkin_ok=False,
 			   session=session_value[:50], error=checkin_result['error'])
 		update_account_info(info, site_key, label,
 			checkin_status='failed', checkin_date=today,
 			checkin_method=method, error=checkin_result['error'], checkin_msg=None)
+		metric_results.inc(method=method, outcome='error')
 		return False
 	else:
 		msg = checkin_result.get('message', '未知') if checkin_result else '无响应'
 		already_kws = ['已签到', '签到过', 'already', 'checked']
 		is_already = any(kw in msg for kw in already_kws)
 		if is_already:
-			log.info(f'    [INFO] {msg}')
+			log.info(f'    {log_prefix}[INFO] {msg}')
 			record(label, site_key, site_name=sn, domain=dm, login_ok=True, checkin_ok=False,
 				   session=session_value[:50], checkin_msg=msg, already_checked=True)
 			update_account_info(info, site_key, label,
 				checkin_status='already_checked', checkin_date=today,
 				checkin_method=method, checkin_msg=msg, error=None)
 		else:
-			log.info(f'    [INFO] {msg}')
+			log.info(f'    {log_prefix}[INFO] {msg}')
 			record(label, site_key, site_name=sn, domain=dm, login_ok=True, checkin_ok=False,
 				   session=session_value[:50], checkin_msg=msg)
 			update_account_info(info, site_key, label,
 				checkin_status='failed', checkin_date=today,
 				checkin_method=method, checkin_msg=msg, error=None)
+		metric_results.inc(method=method, outcome='already_checked' if is_already else 'failed')
 		return is_already
 
 
+@traced('linuxdo_password_login', cat='browser', outcome=lambda ok: 'ok' if ok else 'fail')
 async def do_login(page, credentials):
 	"""登录 LinuxDO"""
 	log.debug('    建立 CF 信任...')
 	try:
 		await page.goto('https://linux.do/session/csrf', wait_until='commit', timeout=15000)
-		await asyncio.sleep(3)
+		await wait_page_settled(page, 3, state='load')
 	except Exception:
 		pass
 
@@ -589,16 +878,8 @@ async def do_login(page, credentials):
 		await asyncio.sleep(2)
 		await page.goto('https://linux.do/login', wait_until='domcontentloaded', timeout=30000)
 
-	for i in range(30):
-		await asyncio.sleep(2)
-		try:
-			title = await page.title()
-		except Exception:
-			continue
-		if not any(kw in title for kw in ['稍候', 'moment', 'Cloudflare']):
-			break
-
-	await asyncio.sleep(3)
+	await wait_challenge_cleared(page, timeout=60, keywords=('稍候', 'moment', 'Cloudflare'))
+	await wait_page_settled(page, 3)
 
 	log.debug('    Discourse API 登录...')
 	login_js = """
@@ -631,6 +912,39 @@ async def do_login(page, credentials):
 	return ok
 
 
+@traced('linuxdo_login', cat='browser', outcome=lambda ok: 'ok' if ok else 'fail',
+		bind=lambda ctx, page, credentials: {'account': credentials['label']})
+async def login_linuxdo(ctx, page, credentials):
+	"""LinuxDO 登录：先恢复 browser_state/<label>.json 并用 /session/current.json 校验，失效才走 do_login()。
+	登录成功后保存登录态供下次复用。返回 'restored'（复用已保存的登录态）/ 'login'（重新登录，cookie 已更新）/ False"""
+	path = state_path(credentials['label'])
+	try:
+		restored = await restore_state(ctx, path)
+	except Exception as e:
+		log.debug(f'    [STATE] 恢复登录态失败: {e}')
+		restored = False
+	if restored:
+		if await session_valid(ctx):
+			log.info(f'    [STATE] 复用已保存的 LinuxDO 登录态')
+			return 'restored'
+		log.info(f'    [STATE] 已保存的登录态失效，重新登录')
+		await ctx.clear_cookies()
+
+	if not await do_login(page, credentials):
+		return False
+	await persist_linuxdo_state(ctx, credentials['label'])
+	return 'login'
+
+
+async def persist_linuxdo_state(ctx, label):
+	"""保存 context 中的 LinuxDO 登录态（含 connect.linux.do 授权 cookie）"""
+	try:
+		await save_state(ctx, state_path(label))
+	except Exception as e:
+		log.warning(f'    [WARN] 保存登录态失败: {e}')
+
+
+@traced('site_config', cat='browser', outcome=lambda r: 'ok' if r else 'fail')
 async def get_site_config_via_browser(page, domain):
 	"""通过浏览器获取站点配置（处理 WAF）"""
 	try:
@@ -643,16 +957,8 @@ async def get_site_config_via_browser(page, domain):
 			return None
 
 	# 等待 WAF/CF
-	for i in range(30):
-		await asyncio.sleep(2)
-		try:
-			title = await page.title()
-		except Exception:
-			continue
-		if not any(kw in title for kw in ['稍候', 'moment', 'Cloudflare', 'Just a', 'checking', '403']):
-			break
-
-	await asyncio.sleep(3)
+	await wait_challenge_cleared(page, timeout=60, keywords=CF_TITLE_KEYWORDS + ('403',))
+	await wait_page_settled(page, 3)
 
 	# fetch /api/status
 	status_result = await page.evaluate("""
@@ -672,6 +978,7 @@ async def get_site_config_via_browser(page, domain):
 	return None
 
 
+@traced('oauth_login', cat='browser', outcome=lambda r: 'ok' if r[0] else 'fail', method='browser')
 async def oauth_login_site(page, ctx, domain, client_id, max_wait=60):
 	"""
 	在已登录 LinuxDO 的浏览器中，通过 OAuth 登录指定站点。
@@ -681,9 +988,7 @@ async def oauth_login_site(page, ctx, domain, client_id, max_wait=60):
 	captured_token = [None]
 
 	# 提取根域名用于跨域重定向匹配（如 jp.duckcoding.com → duckcoding.com）
-	domain_parts = domain_host.split('.')
-	# 取最后两段作为根域名（处理 .com, .xyz 等）
-	root_domain = '.'.join(domain_parts[-2:]) if len(domain_parts) >= 2 else domain_host
+	root_host = root_domain(domain_host)
 
 	async def on_oauth_response(response):
 		"""拦截 OAuth 回调响应，捕获 access_token"""
@@ -712,16 +1017,8 @@ async def oauth_login_site(page, ctx, domain, client_id, max_wait=60):
 			return None, None
 
 	# 等待 WAF/CF 通过
-	for i in range(15):
-		await asyncio.sleep(2)
-		try:
-			title = await page.title()
-		except Exception:
-			continue
-		if not any(kw in title for kw in ['稍候', 'moment', 'Cloudflare', 'Just a', 'checking']):
-			break
-
-	await asyncio.sleep(2)
+	await wait_challenge_cleared(page, timeout=30)
+	await wait_page_settled(page, 2)
 
 	# 2. 浏览器内获取 OAuth state
 	state_result = await page.evaluate("""
@@ -754,7 +1051,7 @@ async def oauth_login_site(page, ctx, domain, client_id, max_wait=60):
 		for c in pre_cookies:
 			if c['name'] == 'session':
 				c_domain = c.get('domain', '')
-				if domain_host in c_domain or c_domain.endswith(root_domain):
+				if domain_host in c_domain or c_domain.endswith(root_host):
 					pre_oauth_sessions.add(c['value'])
 	except Exception:
 		pass
@@ -773,86 +1070,89 @@ async def oauth_login_site(page, ctx, domain, client_id, max_wait=60):
 		await page.goto(oauth_url, wait_until='commit', timeout=30000)
 	except Exception:
 		await asyncio.sleep(2)
+	await wait_for_oauth_page(page, domain_host, timeout=15)
 
-	# 4. 等待: CF -> 允许 -> session cookie
+	# 4. 等待: CF -> 允许 -> session cookie（页面跳转 / session cookie 下发事件唤醒，无事件时每 2s 兜底检查）
 	clicked_allow = False
-	for i in range(max_wait // 2):
-		await asyncio.sleep(2)
-		try:
-			cur_url = page.url
-			title = await page.title()
-		except Exception:
-			break
-
-		# Cloudflare
-		if any(kw in title for kw in ['稍候', 'moment', 'Cloudflare', 'Just a', 'checking']):
-			if i % 15 == 0:
-				log.debug(f'    [{(i + 1) * 2}s] CF: {title[:30]}')
-			continue
+	started = time.monotonic()
+	deadline = started + max_wait
+	woken_after = None
+	try:
+		with SessionCookieWatcher(ctx, page, domain_host, root_host) as watcher:
+			for i in itertools.count():
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					break
+				if i > 0:
+					waited = time.monotonic()
+					woken_after = time.monotonic() - waited if await watcher.wait(min(2.0, remaining)) else None
+				t = int(time.monotonic() - started)
+				try:
+					cur_url = page.url
+					title = await page.title()
+				except Exception:
+					break
 
-		# 点击"允许"
-		if 'connect.linux.do' in cur_url and not clicked_allow:
-			try:
-				allow_btn = page.locator('text=允许').first
-				if await allow_btn.is_visible():
-					log.debug(f'    [{(i + 1) * 2}s] 点击"允许"...')
-					await allow_btn.click()
-					clicked_allow = True
-					await asyncio.sleep(5)
+				# Cloudflare
+				if any(kw in title for kw in CF_TITLE_KEYWORDS):
+					log.debug(f'    [{t}s] CF: {title[:30]}')
+					await wait_challenge_cleared(page, timeout=deadline - time.monotonic())
 					continue
-			except Exception:
-				pass
 
-		# 检查 session cookie（必须是 OAuth 后新产生的）
-		# 支持跨域重定向：如 jp.duckcoding.com → duckcoding.com
-		try:
-			cookies = await ctx.cookies()
-		except Exception:
-			break
-		for c in cookies:
-			if c['name'] == 'session':
-				c_domain = c.get('domain', '')
-				# 匹配原始域名或同根域名
-				if domain_host in c_domain or c_domain.endswith(root_domain):
-					if c['value'] not in pre_oauth_sessions:
-						log.info(f'    [{(i + 1) * 2}s] [OK] 获取新 session!')
-						if c_domain != domain_host and c_domain not in domain_host:
-							log.debug(f'    [INFO] Cookie 来自重定向域: {c_domain}')
-						try:
-							page.remove_listener('response', on_oauth_response)
-						except Exception:
-							pass
-						return c['value'], captured_token[0]
+				# 点击"允许"
+				if 'connect.linux.do' in cur_url and not clicked_allow:
+					try:
+						allow_btn = page.locator('text=允许').first
+						if await allow_btn.is_visible():
+							log.debug(f'    [{t}s] 点击"允许"...')
+							await allow_btn.click()
+							clicked_allow = True
+							await wait_for_oauth_callback(page, domain_host)
+							continue
+					except Exception:
+						pass
 
-		# 检测 OAuth 回调后的异常重定向（如跳到 /login?expired=true）
-		if clicked_allow and 'connect.linux.do' not in cur_url:
-			# 跨域重定向到 /login
-			if domain_host not in cur_url and ('login' in cur_url or 'expired' in cur_url):
-				log.warning(f'    [{(i + 1) * 2}s] [FAIL] OAuth 回调重定向到: {cur_url[:80]}')
+				# 检查 session cookie（必须是 OAuth 后新产生的）
+				# 支持跨域重定向：如 jp.duckcoding.com → duckcoding.com
 				try:
-					page.remove_listener('response', on_oauth_response)
+					cookies = await ctx.cookies()
 				except Exception:
-					pass
-				return None, None
-			# 同域重定向到 /login?expired=true（如六哥API）
-			if domain_host in cur_url and '/login' in cur_url and ('expired' in cur_url or 'error' in cur_url):
-				log.warning(f'    [{(i + 1) * 2}s] [FAIL] OAuth 回调失败 (expired): {cur_url[:80]}')
-				try:
-					page.remove_listener('response', on_oauth_response)
-				except Exception:
-					pass
-				return None, None
-
-		if i % 15 == 0:
-			log.debug(f'    [{(i + 1) * 2}s] {title[:25]} | {cur_url[:55]}')
-
-	try:
-		page.remove_listener('response', on_oauth_response)
-	except Exception:
-		pass
+					break
+				for c in cookies:
+					if c['name'] == 'session':
+						c_domain = c.get('domain', '')
+						# 匹配原始域名或同根域名
+						if domain_host in c_domain or c_domain.endswith(root_host):
+							if c['value'] not in pre_oauth_sessions:
+								log.info(f'    [{t}s] [OK] 获取新 session!')
+								if c_domain != domain_host and c_domain not in domain_host:
+									log.debug(f'    [INFO] Cookie 来自重定向域: {c_domain}')
+								if woken_after is not None:
+									record_saved(polled_cost(woken_after, 2.0) - woken_after)
+								return c['value'], captured_token[0]
+
+				# 检测 OAuth 回调后的异常重定向（如跳到 /login?expired=true）
+				if clicked_allow and 'connect.linux.do' not in cur_url:
+					# 跨域重定向到 /login
+					if domain_host not in cur_url and ('login' in cur_url or 'expired' in cur_url):
+						log.warning(f'    [{t}s] [FAIL] OAuth 回调重定向到: {cur_url[:80]}')
+						return None, None
+					# 同域重定向到 /login?expired=true（如六哥API）
+					if domain_host in cur_url and '/login' in cur_url and ('expired' in cur_url or 'error' in cur_url):
+						log.warning(f'    [{t}s] [FAIL] OAuth 回调失败 (expired): {cur_url[:80]}')
+						return None, None
+
+				if i % 15 == 0:
+					log.debug(f'    [{t}s] {title[:25]} | {cur_url[:55]}')
+	finally:
+		try:
+			page.remove_listener('response', on_oauth_response)
+		except Exception:
+			pass
 	return None, None
 
 
+@traced('checkin', cat='browser', outcome=checkin_outcome, method='browser')
 async def do_checkin_via_browser(page, domain, checkin_path, user_id=None, access_token=None):
 	"""在浏览器内调用签到 API（支持 access_token 或 New-Api-User 认证），带重试。
 	POST 返回 404 时自动降级为 GET（部分站点的 POST 被 OpenAI API 代理拦截）。"""
@@ -913,17 +1213,12 @@ async def get_user_id_from_page(page, domain):
 			pass
 
 	# 等待 WAF/CF
-	for i in range(15):
-		await asyncio.sleep(2)
-		try:
-			title = await page.title()
-		except Exception:
-			continue
-		if not any(kw in title for kw in ['稍候', 'moment', 'Cloudflare', 'Just a', 'checking']):
-			break
+	await wait_challenge_cleared(page, timeout=30)
 
-	# 等待 SPA 初始化（React 应用需要时间加载和设置 localStorage）
-	await asyncio.sleep(5)
+	# 等待 SPA 初始化（React 应用加载后写入 localStorage 的用户信息），最多 5 秒
+	await wait_for_condition(page, """
+		() => ['user', 'userInfo', 'currentUser', 'user_info'].some(k => localStorage.getItem(k))
+	""", 5)
 
 	# 从 localStorage 提取用户 ID
 	try:
@@ -980,7 +1275,9 @@ def get_active_sites(info, label):
 	return result
 
 
-async def _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies=None):
+@traced('ext_checkin', cat='site', outcome=lambda ok: 'done' if ok else 'refresh', phase='phase0',
+		bind=lambda acc, site_key, *a, **kw: {'account': extract_label(acc.get('name', '')), 'site': site_key})
+async def _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies=None, client=None):
 	"""Phase 1: httpx 直连签到单个外部账号。返回 True=完成(成功或已签), False=需刷新"""
 	name = acc.get('name', '')
 	label = extract_label(name)
@@ -1001,6 +1298,7 @@ async def _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies=None):
 		log.info(f'    [{label}] 今日已签到，跳过')
 		return True
 
+	client = client or http_pool.get()
 	all_cookies = {**(waf_cookies or {}), 'session': session}
 	headers = {
 		'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -1010,71 +1308,86 @@ async def _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies=None):
 	}
 
 	try:
-		async with httpx.AsyncClient(timeout=30.0, verify=False, follow_redirects=True) as client:
-			# WAF 二次验证
-			if needs_waf:
-				resp_verify = await client.get(f'{domain}/api/user/self', headers=headers, cookies=all_cookies)
-				if '<script>' in resp_verify.text and 'arg1=' in resp_verify.text:
-					scripts = re.findall(r'<script[^>]*>([\s\S]*?)</script>', resp_verify.text, re.IGNORECASE)
-					if scripts:
-						solved = solve_waf_challenge(scripts[0])
-						if solved:
-							all_cookies.update(solved)
-							all_cookies.update(dict(resp_verify.cookies))
-
-			# 验证 session
-			resp = await client.get(f'{domain}/api/user/self', headers=headers, cookies=all_cookies)
-			try:
-				user_data = resp.json()
-			except Exception:
-				log.warning(f'    [{label}] Session 过期（非 JSON 响应）')
-				return False  # 需要刷新
-
-			if not user_data.get('success'):
-				log.warning(f'    [{label}] Session 过期: {user_data.get("message", "")}')
-				return False  # 需要刷新
-
-			# 签到
-			checkin_headers = {**headers, 'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'}
-			resp_checkin = await client.post(f'{domain}{sign_in_path}', headers=checkin_headers, cookies=all_cookies)
-			try:
-				result_data = resp_checkin.json()
-			except Exception:
-				log.warning(f'    [{label}] 签到响应异常')
-				record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=False, error='签到响应异常')
-				update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='签到响应异常')
-				save_site_info(info)
-				return True
-
-			msg = result_data.get('msg', result_data.get('message', ''))
-			if result_data.get('ret') == 1 or result_data.get('code') == 0 or result_data.get('success'):
-				log.info(f'    [{label}] 签到成功! {msg}')
-				record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=True, checkin_msg=msg)
-				update_account_info(info, site_key, label, checkin_status='success', checkin_msg=msg, checkin_date=info['_meta']['checkin_date'])
-			elif '已' in msg or 'already' in msg.lower():
-				log.info(f'    [{label}] 今日已签到')
-				record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=True, checkin_msg='今日已签到')
-				update_account_info(info, site_key, label, checkin_status='already_checked', checkin_msg='今日已签到', checkin_date=info['_meta']['checkin_date'])
+		# WAF 二次验证
+		if needs_waf:
+			resp_verify = await send_following(client, 'GET', f'{domain}/api/user/self', cookies=all_cookies,
+											   headers=headers, timeout=30.0)
+			# 共享连接池不持久化 cookie，服务端下发的 WAF cookie 需手动带到后续请求
+			challenged, solved = await solve_waf_response(domain, resp_verify)
+			if challenged:
+				all_cookies = {**(solved or {}), 'session': session}
 			else:
-				log.warning(f'    [{label}] 签到失败: {msg}')
-				record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=False, error=msg)
-				update_account_info(info, site_key, label, checkin_status='failed', checkin_msg=msg)
-			save_site_info(info)
+				all_cookies = {**chain_cookies(resp_verify), **all_cookies}
+
+		# 验证 session
+		resp = await send_following(client, 'GET', f'{domain}/api/user/self', cookies=all_cookies,
+									headers=headers, timeout=30.0)
+		if needs_waf and waf_solver.available() and extract_challenge(resp.text):
+			# 求解结果仍被挑战（非标准变种），用 Node 重新求解后重试一次
+			log.debug(f'    [{label}] WAF 结果被拒绝，使用 Node.js 重新求解')
+			_, solved = await solve_waf_response(domain, resp, use_native=False)
+			if solved:
+				all_cookies = {**solved, 'session': session}
+				resp = await send_following(client, 'GET', f'{domain}/api/user/self', cookies=all_cookies,
+											headers=headers, timeout=30.0)
+		try:
+			user_data = resp.json()
+		except Exception:
+			if needs_waf and extract_challenge(resp.text):
+				waf_cache.invalidate(domain_key(domain))
+			log.warning(f'    [{label}] Session 过期（非 JSON 响应）')
+			metric_results.inc(method='ext', outcome='expired')
+			return False  # 需要刷新
+
+		if not user_data.get('success'):
+			log.warning(f'    [{label}] Session 过期: {user_data.get("message", "")}')
+			metric_results.inc(method='ext', outcome='expired')
+			return False  # 需要刷新
+		all_cookies = {**chain_cookies(resp), **all_cookies}
+
+		# 签到
+		checkin_headers = {**headers, 'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'}
+		resp_checkin = await send_following(client, 'POST', f'{domain}{sign_in_path}', cookies=all_cookies,
+											headers=checkin_headers, timeout=30.0)
+		try:
+			result_data = resp_checkin.json()
+		except Exception:
+			log.warning(f'    [{label}] 签到响应异常')
+			record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=False, error='签到响应异常')
+			update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='签到响应异常')
+			metric_results.inc(method='ext', outcome='error')
 			return True
 
+		msg = result_data.get('msg', result_data.get('message', ''))
+		if result_data.get('ret') == 1 or result_data.get('code') == 0 or result_data.get('success'):
+			ext_outcome = 'success'
+			log.info(f'    [{label}] 签到成功! {msg}')
+			record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=True, checkin_msg=msg)
+			update_account_info(info, site_key, label, checkin_status='success', checkin_msg=msg, checkin_date=info['_meta']['checkin_date'])
+		elif '已' in msg or 'already' in msg.lower():
+			ext_outcome = 'already_checked'
+			log.info(f'    [{label}] 今日已签到')
+			record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=True, checkin_msg='今日已签到')
+			update_account_info(info, site_key, label, checkin_status='already_checked', checkin_msg='今日已签到', checkin_date=info['_meta']['checkin_date'])
+		else:
+			ext_outcome = 'failed'
+			log.warning(f'    [{label}] 签到失败: {msg}')
+			record(label, site_key, site_name=site_name, domain=domain, login_ok=True, checkin_ok=False, error=msg)
+			update_account_info(info, site_key, label, checkin_status='failed', checkin_msg=msg)
+		metric_results.inc(method='ext', outcome=ext_outcome)
+		return True
+
 	except Exception as e:
 		log.error(f'    [{label}] 异常: {e}')
 		record(label, site_key, site_name=site_name, domain=domain, login_ok=False, checkin_ok=False, error=str(e))
 		update_account_info(info, site_key, label, checkin_status='failed', checkin_msg=str(e))
-		save_site_info(info)
+		metric_results.inc(method='ext', outcome='error')
 		return True
 
 
-async def _ext_browser_refresh_and_checkin(failed_accounts, info):
+async def _ext_browser_refresh_and_checkin(failed_accounts, info, client=None, shared=None):
 	"""Phase 2: 浏览器 OAuth 刷新过期 session 并签到。
-	按 LinuxDO 凭据分组，每组只启动一个 Chrome、登录一次。"""
-	from playwright.async_api import async_playwright
-
+	按 LinuxDO 凭据分组，每组只登录一次：池模式每组一个 context，进程模式每组启动一个 Chrome。"""
 	# 按 LinuxDO 邮箱分组
 	groups = defaultdict(list)  # email → [(acc, site_key, site_cfg), ...]
 	for acc, site_key, site_cfg in failed_accounts:
@@ -1095,46 +1408,15 @@ async def _ext_browser_refresh_and_checkin(failed_accounts, info):
 		log.info(f'\n  {"─" * 50}')
 		log.info(f'  [LOGIN] LinuxDO: {cred_email} ({len(items)} 个账号)')
 
-		# 启动 Chrome
-		tmpdir = tempfile.mkdtemp(prefix='chrome_ext_')
-		chrome_args = [
-			CHROME_EXE, f'--remote-debugging-port={DEBUG_PORT}', f'--user-data-dir={tmpdir}',
-			'--no-first-run', '--no-default-browser-check',
-		]
-		if IS_LINUX:
-			chrome_args += ['--headless=new', '--no-sandbox', '--disable-gpu', '--disable-dev-shm-usage',
-							'--disable-blink-features=AutomationControlled', '--window-size=1920,1080']
-		if PROXY_URL:
-			chrome_args.append(f'--proxy-server={PROXY_URL}')
-		chrome_args.append('about:blank')
-		proc = subprocess.Popen(chrome_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-		# 等待 CDP
-		cdp_ready = False
-		for _ in range(10):
-			await asyncio.sleep(1)
-			try:
-				async with httpx.AsyncClient() as _c:
-					await _c.get(f'http://127.0.0.1:{DEBUG_PORT}/json/version', timeout=2)
-				cdp_ready = True
-				break
-			except Exception:
-				pass
-
-		if not cdp_ready:
-			log.error(f'    [FAIL] Chrome CDP 未就绪')
-			proc.terminate()
-			shutil.rmtree(tmpdir, ignore_errors=True)
-			continue
-
-		async with async_playwright() as p:
+		async with browser_context(DEBUG_PORT, prefix='chrome_ext_', shared=shared) as ctx:
+			if ctx is None:
+				log.error(f'    [FAIL] Chrome CDP 未就绪')
+				continue
 			try:
-				browser = await p.chromium.connect_over_cdp(f'http://127.0.0.1:{DEBUG_PORT}')
-				ctx = browser.contexts[0]
 				page = await ctx.new_page()
 
 				# 登录 LinuxDO
-				logged_in = await do_login(page, creds)
+				logged_in = await login_linuxdo(ctx, page, creds)
 				if not logged_in:
 					log.error(f'    [FAIL] LinuxDO 登录失败')
 					for acc, site_key, site_cfg, _ in items:
@@ -1143,11 +1425,7 @@ async def _ext_browser_refresh_and_checkin(failed_accounts, info):
 						record(label, site_key, site_name=site_name, domain=site_cfg['domain'],
 							   login_ok=False, checkin_ok=False, error='LinuxDO 登录失败')
 						update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='LinuxDO 登录失败')
-					save_site_info(info)
 					await page.close()
-					await browser.close()
-					proc.terminate()
-					shutil.rmtree(tmpdir, ignore_errors=True)
 					continue
 
 				log.info(f'    [OK] LinuxDO 登录成功!')
@@ -1204,7 +1482,6 @@ async def _ext_browser_refresh_and_checkin(failed_accounts, info):
 						record(label, site_key, site_name=site_name, domain=domain,
 							   login_ok=False, checkin_ok=False, error='获取 OAuth state 失败')
 						update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='获取 OAuth state 失败')
-						save_site_info(info)
 						continue
 
 					# 构建 OAuth URL（用 sites.json 中的 oauth_client_id + redirect_uri）
@@ -1274,43 +1551,38 @@ async def _ext_browser_refresh_and_checkin(failed_accounts, info):
 						# 用新 session 签到
 						waf_cookies = None
 						if needs_waf:
-							waf_cookies = get_waf_cookies(domain)
-						done = await _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies)
+							waf_cookies = await get_waf_cookies(domain, client=client)
+						done = await _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies, client=client)
 						if not done:
 							log.warning(f'    [{label}] 刷新后签到仍失败')
 							record(label, site_key, site_name=site_name, domain=domain,
 								   login_ok=True, checkin_ok=False, error='刷新后 session 仍无效')
 							update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='刷新后 session 仍无效')
-							save_site_info(info)
 					else:
 						log.warning(f'    [{label}] [FAIL] Session 刷新失败')
 						record(label, site_key, site_name=site_name, domain=domain,
 							   login_ok=False, checkin_ok=False, error='OAuth 刷新 session 失败')
 						update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='OAuth 刷新 session 失败')
-						save_site_info(info)
 
 				try:
 					await page.close()
-					await browser.close()
 				except Exception:
 					pass
 			except Exception as e:
 				log.error(f'    [ERROR] 浏览器异常: {e}')
 
-		proc.terminate()
-		try:
-			proc.wait(timeout=5)
-		except Exception:
-			proc.kill()
-		shutil.rmtree(tmpdir, ignore_errors=True)
-		# 清理 Chrome 进程，避免影响后续 Phase 1+2
-		kill_chrome()
-		await asyncio.sleep(2)
+		if shared is None:
+			# 清理 Chrome 进程，避免影响后续 Phase 1+2
+			kill_chrome()
+			await asyncio.sleep(2)
 
 
-async def process_external_sites(info, external_accounts):
-	"""处理 AnyRouter/AgentRouter 签到: Phase 1 httpx 直连 → Phase 2 浏览器 OAuth 刷新"""
-	external_sites = {k: v for k, v in SITES.items() if v.get('provider') and not v.get('skip')}
+@traced('phase0', cat='phase', phase='phase0')
+async def process_external_sites(info, external_accounts, client=None, shared=None, only=None):
+	"""处理 AnyRouter/AgentRouter 签到: Phase 1 httpx 直连 → Phase 2 浏览器 OAuth 刷新。
+	only: 只处理这些站点（常驻模式按站点错峰触发），账号按站点的 provider 筛选"""
+	external_sites = {k: v for k, v in SITES.items()
+					  if v.get('provider') and not v.get('skip') and (only is None or k in only)}
 	if not external_sites or not external_accounts:
 		return
 
@@ -1338,31 +1610,24 @@ async def process_external_sites(info, external_accounts):
 		# WAF cookies
 		waf_cookies = None
 		if needs_waf:
-			if not shutil.which('node'):
-				log.warning(f'    [FAIL] Node.js 未安装，无法解析 WAF')
-				for acc in site_accounts:
-					label = extract_label(acc.get('name', ''))
-					record(label, site_key, site_name=site_name, domain=domain,
-						   login_ok=False, checkin_ok=False, error='Node.js 未安装')
-					update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='Node.js 未安装')
-				save_site_info(info)
-				continue
+			if not waf_solver.available():
+				log.info(f'    [WAF] Node.js 未安装，仅使用 Python 求解标准挑战')
 
 			log.info(f'    [WAF] 获取 WAF cookies...')
-			waf_cookies = get_waf_cookies(domain)
+			waf_cookies = await get_waf_cookies(domain, client=client)
 			if not waf_cookies:
-				log.warning(f'    [FAIL] WAF cookies 获取失败')
+				error = 'WAF cookies 获取失败' + ('' if waf_solver.available() else '（Node.js 未安装）')
+				log.warning(f'    [FAIL] {error}')
 				for acc in site_accounts:
 					label = extract_label(acc.get('name', ''))
 					record(label, site_key, site_name=site_name, domain=domain,
-						   login_ok=False, checkin_ok=False, error='WAF cookies 获取失败')
-					update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='WAF cookies 获取失败')
-				save_site_info(info)
+						   login_ok=False, checkin_ok=False, error=error)
+					update_account_info(info, site_key, label, checkin_status='failed', checkin_msg=error)
 				continue
 			log.info(f'    [OK] WAF cookies 获取成功')
 
 		for acc in site_accounts:
-			done = await _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies)
+			done = await _ext_try_checkin(acc, site_key, site_cfg, info, waf_cookies, client=client)
 			if not done:
 				if site_cfg.get('no_auto_refresh'):
 					label = extract_label(acc.get('name', ''))
@@ -1370,84 +1635,359 @@ async def process_external_sites(info, external_accounts):
 					record(label, site_key, site_name=site_cfg.get('name', site_key), domain=site_cfg['domain'],
 						   login_ok=False, checkin_ok=False, error='Session 过期，需手动刷新')
 					update_account_info(info, site_key, label, checkin_status='failed', checkin_msg='Session 过期，需手动刷新')
-					save_site_info(info)
 				else:
 					failed_accounts.append((acc, site_key, site_cfg))
 
 	# === Phase 2: 浏览器 OAuth 刷新过期 session ===
 	if failed_accounts:
 		log.info(f'\n  [INFO] {len(failed_accounts)} 个账号 session 过期，启动浏览器 OAuth 刷新...')
-		await _ext_browser_refresh_and_checkin(failed_accounts, info)
+		await _ext_browser_refresh_and_checkin(failed_accounts, info, client=client, shared=shared)
+
+
+# ===================== Phase 1: 全局并发 httpx 快速签到 =====================
+PHASE1_CONCURRENCY = 32  # 全局并发上限
+PHASE1_PER_DOMAIN = 2  # 同一站点的并发上限（多个账号同时打同一域名）
+
+# 浏览器阶段：同一账号并发标签页数（--tabs 覆盖），连续 OAuth 失败上限（各标签页共享计数）
+BROWSER_TABS = 3
+MAX_CONSECUTIVE_OAUTH_FAILS = 5
+LIFETIME_EXPIRY = ('401', 'redirect')  # 可作为 session 寿命样本的失效类型
+HTTP_OAUTH_CONCURRENCY = 8  # 无浏览器 OAuth（已保存的 linux.do cookie）并发上限
+# 这些 fallback 说明 linux.do 登录态本身不可用，同账号后续站点不再尝试 httpx OAuth
+HTTP_OAUTH_ACCOUNT_FALLBACKS = ('linuxdo_cf', 'login_required')
+# 浏览器并发内存预算：单 worker 默认开销（池模式一个 context / 进程模式一个 Chrome）与系统预留
+BROWSER_CONTEXT_MB = 200
+BROWSER_PROCESS_MB = 350
+BROWSER_RESERVE_MB = 400
+
+
+@traced('cached_checkin', cat='site', outcome=lambda ok: 'done' if ok else 'browser',
+		bind=lambda label, site_key, *a, **kw: {'account': label, 'site': site_key})
+async def _cached_checkin_one(label, site_key, site_data, session, acc_info, info, client, sem, domain_sem):
+	"""用缓存 session 对单个 (站点, 账号) 签到。返回 True 表示已处理（无需浏览器）"""
+	site_name = site_data.get('name', site_key)
+	domain = site_data['domain']
+	checkin_path = site_data.get('checkin_path', '/api/user/checkin')
+
+	async with sem, domain_sem.hold(domain_key(domain)):
+		try:
+			log.info(f'  [{label}] [{site_name}] httpx 签到...')
+			result = await do_checkin_via_httpx(
+				domain, checkin_path, session,
+				user_id=acc_info.get('user_id'), access_token=acc_info.get('access_token'), client=client,
+			)
+		except Exception as e:
+			log.debug(f'    [CACHE] {label}/{site_name} httpx 异常: {e}, 降级到浏览器')
+			metric_session_cache.inc(result='error')
+			return False
+
+	if result.get('expired'):
+		# 失效时的 session 年龄作为该站点寿命样本，供续期模式提前刷新。
+		# 只采信 401 / 重定向：HTML 响应也可能是 WAF / CF 挑战页，不代表 session 真的到期
+		age = session_age(acc_info, datetime.now().date())
+		log.debug(f'    [CACHE] {label}/{site_name} session 已过期 (已用 {age} 天), 需重新 OAuth')
+		if age is not None and result.get('expired_by') in LIFETIME_EXPIRY:
+			update_site_info(info, site_key, session_lifetimes=add_sample(site_data.get('session_lifetimes'), age))
+		update_account_info(info, site_key, label, session=None, session_updated=None)
+		metric_session_cache.inc(result='expired')
+		return False
 
+	if result.get('error') and '站点无法连接' in result['error']:
+		log.debug(f'    [CACHE] {label}/{site_name} 站点连接失败, 降级到浏览器重试')
+		metric_session_cache.inc(result='unreachable')
+		return False
 
-async def process_account(account, info, debug_port=9222):
-	"""处理单个 LinuxDO 账号在所有站点的登录和签到"""
-	from playwright.async_api import async_playwright
+	if result.get('error'):
+		log.debug(f'    [CACHE] {label}/{site_name} httpx 错误: {result["error"]}, 降级到浏览器')
+		metric_session_cache.inc(result='error')
+		return False
 
-	label = account['label']
+	handle_checkin_result(label, site_key, result, session, info, method='httpx', log_prefix=f'[{label}] [{site_name}] ')
+	metric_session_cache.inc(result='hit')
+	return True
+
+
+@traced('phase1', cat='phase', phase='phase1')
+async def run_cached_checkins(info, accounts, client=None, only=None):
+	"""Phase 1: 所有 (站点, 账号) 的缓存 session 签到一次性并发发出（全局信号量 + 每域名上限）。
+	返回 {label: 已处理站点集合}，剩余站点交给浏览器阶段。
+	only: 只处理这些站点，其余站点直接计入已处理（本轮不签到）"""
+	client = client or http_pool.get()
 	today = datetime.now().strftime('%Y-%m-%d')
-	log.info(f'\n{"=" * 70}')
-	log.info(f'[ACCOUNT] {label} ({account["login"]})')
-	log.info(f'{"=" * 70}')
+	sem = asyncio.Semaphore(PHASE1_CONCURRENCY)
+	domain_sem = KeyedSemaphore(PHASE1_PER_DOMAIN)
+	handled = {a['label']: set() for a in accounts}
+	jobs = []  # [(label, site_key, coroutine)]
+	missing = 0  # 需要签到但没有缓存 session
+
+	for account in accounts:
+		label = account['label']
+		for site_key, site_data in get_active_sites(info, label):
+			if only is not None and site_key not in only:
+				handled[label].add(site_key)
+				continue
+			site_name = site_data.get('name', site_key)
+			# 其他账号浏览器已确认站点不可达 → 跳过
+			if site_data.get('alive') == False:
+				log.debug(f'  [{label}] [{site_name}] 站点不可达，跳过')
+				record(label, site_key, site_name=site_name, domain=site_data['domain'],
+					login_ok=False, checkin_ok=False, error='站点无法连接')
+				update_account_info(info, site_key, label,
+					checkin_status='failed', checkin_date=today, error='站点无法连接')
+				handled[label].add(site_key)
+				continue
+			# 今日已签到 → 跳过
+			if is_checkin_done_today(info, site_key, label):
+				log.info(f'  [{label}] [{site_name}] 今日已签到，跳过')
+				handled[label].add(site_key)
+				continue
+			# 从 site_info 获取缓存的 session
+			acc_info = get_account_info(info, site_key, label)
+			session = acc_info.get('session')
+			if not session:
+				missing += 1
+				continue
+			jobs.append((label, site_key, _cached_checkin_one(
+				label, site_key, site_data, session, acc_info, info, client, sem, domain_sem)))
+
+	if missing:
+		metric_session_cache.inc(missing, result='missing')
+	if not jobs:
+		if missing:
+			metric_cache_hit_ratio.set(0)
+		return handled
+
+	log.info(f'\n[Phase 1] httpx 缓存签到: {len(jobs)} 个任务并发执行')
+	with timer(f'Phase 1 httpx ({len(jobs)} 个任务)'):
+		outcomes = await asyncio.gather(*(coro for _, _, coro in jobs), return_exceptions=True)
+
+	cache_hits = defaultdict(int)
+	for (label, site_key, _), ok in zip(jobs, outcomes):
+		if ok is True:
+			handled[label].add(site_key)
+			cache_hits[label] += 1
+	for label, hits in cache_hits.items():
+		log.info(f'  [CACHE] {label}: {hits} 个站点通过缓存完成签到')
+	metric_cache_hit_ratio.set(round(sum(cache_hits.values()) / (len(jobs) + missing), 4))
+	return handled
+
+
+@traced('http_oauth_checkin', cat='site', outcome=lambda ok: 'done' if ok else 'browser', method='httpx-oauth',
+		bind=lambda label, site_key, *a, **kw: {'account': label, 'site': site_key})
+async def _http_oauth_checkin(label, site_key, site_data, info, linuxdo_cookies, client=None, http_oauth=None,
+							  checkin=True):
+	"""用 linux.do cookie 走 httpx OAuth，成功后 httpx 签到。返回 True=已处理，False=需要浏览器。
+	http_oauth: 同账号共享的状态，linux.do 登录态不可用时置 disabled 以跳过后续尝试
+	checkin: False 时只刷新 session（续期模式），不签到"""
+	if http_oauth is not None and http_oauth.get('disabled'):
+		return False
+	client_id = site_data.get('client_id')
+	if not client_id or not linuxdo_cookies:
+		return False
+	site_name = site_data.get('name', site_key)
+	domain = site_data['domain']
+	client = client or http_pool.get()
+
+	with tracer.span('oauth_login', cat='httpx') as span, metric_oauth_seconds.time(method='httpx', outcome='error') as labels:
+		result = await oauth_login_http(client, domain, client_id, linuxdo_cookies, root_host=root_domain(domain_key(domain)))
+		labels['outcome'] = 'ok' if result.get('session') else 'fallback' if result.get('fallback') else 'error'
+		span.set(outcome='ok' if result.get('session') else result.get('fallback') or 'error')
+	session_value = result.get('session')
+	if not session_value:
+		reason = result.get('fallback') or result.get('error')
+		log.debug(f'    [{label}/{site_name}] httpx OAuth 未完成 ({reason})，改用浏览器')
+		if http_oauth is not None and result.get('fallback') in HTTP_OAUTH_ACCOUNT_FALLBACKS:
+			http_oauth['disabled'] = True
+		return False
 
-	# === Phase 1: httpx 快速签到（使用 site_info 中缓存的 session）===
-	handled_sites = set()
-	cache_hits = 0
-	active_sites = get_active_sites(info, label)
+	access_token, user_id = result.get('access_token'), result.get('user_id')
+	today = datetime.now().strftime('%Y-%m-%d')
+	log.info(f'    [{label}/{site_name}] [OK] httpx OAuth 登录成功')
+	update_account_info(info, site_key, label,
+		session=session_value, user_id=user_id, access_token=access_token, session_updated=today)
+	if not checkin:
+		record(label, site_key, site_name=site_name, domain=domain, login_ok=True, refreshed=True, method='httpx-oauth')
+		return True
+	checkin_result = await do_checkin_via_httpx(domain, site_data.get('checkin_path', '/api/user/checkin'),
+												session_value, user_id=user_id, access_token=access_token, client=client)
+	if checkin_result.get('expired'):
+		return False
+	handle_checkin_result(label, site_key, checkin_result, session_value, info, method='httpx-oauth',
+						  log_prefix=f'[{label}/{site_name}] ')
+	return True
 
-	for site_key, site_data in active_sites:
-		site_name = site_data.get('name', site_key)
-		domain = site_data['domain']
-		# 其他账号浏览器已确认站点不可达 → 跳过
-		if site_data.get('alive') == False:
-			log.debug(f'  [{site_name}] 站点不可达，跳过')
-			record(label, site_key, site_name=site_name, domain=domain,
-				login_ok=False, checkin_ok=False, error='站点无法连接')
+
+async def run_http_oauth(label, sites, info, linuxdo_cookies, client=None, checkin=True, http_oauth=None):
+	"""浏览器启动前：用已保存的 linux.do cookie 对剩余站点并发走 httpx OAuth + 签到，返回已处理的站点集合。
+	http_oauth: 同账号共享的状态（见 _http_oauth_checkin），传入时浏览器阶段可沿用"""
+	sem = asyncio.Semaphore(HTTP_OAUTH_CONCURRENCY)
+	http_oauth = http_oauth if http_oauth is not None else {'disabled': False}
+
+	async def one(site_key, site_data):
+		async with sem:
+			if await _http_oauth_checkin(label, site_key, site_data, info, linuxdo_cookies, client, http_oauth, checkin):
+				return site_key
+		return None
+
+	done = await asyncio.gather(*[one(k, d) for k, d in sites])
+	return {k for k in done if k}
+
+
+@traced('browser_site', cat='site', bind=lambda label, site_key, *a, **kw: {'account': label, 'site': site_key})
+async def _browser_site_one(label, site_key, site_data, page, ctx, info, handled_sites, oauth_fails, client=None,
+							checkin=True):
+	"""在一个标签页中完成单个站点的 OAuth + 签到。oauth_fails 为同账号各标签页共享的状态（连续失败计数等）。
+	已知 client_id 时先用浏览器中的 linux.do cookie 尝试 httpx OAuth，失败再走页面；
+	Phase 1.5 已用同一登录态试过的站点（oauth_fails['http_tried']）直接走页面。
+	checkin=False（续期模式）时只刷新 session，不签到、不改写签到状态"""
+	today = datetime.now().strftime('%Y-%m-%d')
+	site_name = site_data.get('name', site_key)
+	domain = site_data['domain']
+	client_id = site_data.get('client_id')
+	checkin_path = site_data.get('checkin_path', '/api/user/checkin')
+
+	# 其他账号浏览器已确认站点不可达 → 跳过
+	if site_data.get('alive') == False:
+		log.debug(f'  [{site_name}] 浏览器确认不可达，跳过')
+		record(label, site_key, site_name=site_name, domain=domain,
+			login_ok=False, checkin_ok=False, error='站点无法连接')
+		if checkin:
 			update_account_info(info, site_key, label,
 				checkin_status='failed', checkin_date=today, error='站点无法连接')
-			handled_sites.add(site_key)
-			continue
-		# 今日已签到 → 跳过
-		if is_checkin_done_today(info, site_key, label):
-			log.info(f'  [{site_name}] 今日已签到，跳过')
-			handled_sites.add(site_key)
-			continue
-		# 从 site_info 获取缓存的 session
-		acc_info = get_account_info(info, site_key, label)
-		session = acc_info.get('session')
-		if not session:
-			continue
+		handled_sites.add(site_key)
+		return
 
-		checkin_path = site_data.get('checkin_path', '/api/user/checkin')
+	# 域名熔断中（httpx 阶段已确认连不上）→ 跳过，不让每个账号的浏览器各自等满超时
+	if domain_guard.is_open(domain_key(domain)):
+		log.debug(f'  [{site_name}] 域名熔断中，跳过')
+		record(label, site_key, site_name=site_name, domain=domain,
+			login_ok=False, checkin_ok=False, error='站点无法连接（熔断）')
+		if checkin:
+			update_account_info(info, site_key, label,
+				checkin_status='failed', checkin_date=today, error='站点无法连接')
+		handled_sites.add(site_key)
+		return
 
-		try:
-			log.info(f'  [{site_name}] httpx 签到...')
-			result = await do_checkin_via_httpx(
-				domain, checkin_path, session,
-				user_id=acc_info.get('user_id'), access_token=acc_info.get('access_token'),
-			)
+	# 今日已签到跳过（Phase 2 重检查）
+	if checkin and is_checkin_done_today(info, site_key, label):
+		log.debug(f'  [SKIP] {site_name} 今日已签到')
+		handled_sites.add(site_key)
+		return
 
-			if result.get('expired'):
-				log.debug(f'    [CACHE] session 已过期, 需重新 OAuth')
-				update_account_info(info, site_key, label, session=None, session_updated=None)
-				continue
+	log.info(f'  {"─" * 50}')
+	log.info(f'  [{site_name}] {domain}')
 
-			if result.get('error') and '站点无法连接' in result['error']:
-				log.debug(f'    [CACHE] 站点连接失败, 降级到浏览器重试')
-				continue
+	try:
+		# 如果 client_id 未知，先通过浏览器获取
+		if not client_id:
+			log.debug(f'    获取站点配置...')
+			status_data = await get_site_config_via_browser(page, domain)
+			if status_data:
+				client_id = status_data.get('linuxdo_client_id', '')
+				checkin_enabled = status_data.get('checkin_enabled', False)
+				log.debug(f'    Client ID: {client_id}')
+				log.debug(f'    签到功能: {"开启" if checkin_enabled else "关闭"}')
+				if not client_id:
+					log.warning(f'    [SKIP] 无 LinuxDO OAuth')
+					record(label, site_key, site_name=site_name, domain=domain,
+						login_ok=False, checkin_ok=False, error='无 LinuxDO OAuth')
+					return
+				update_site_info(info, site_key,
+					client_id=client_id, alive=True,
+					version=status_data.get('version', ''),
+					checkin_enabled=checkin_enabled,
+					min_trust_level=status_data.get('min_trust_level'),
+				)
+			else:
+				log.warning(f'    [FAIL] 无法获取站点配置')
+				update_site_info(info, site_key, alive=False)  # 浏览器确认不可达，其他账号跳过
+				domain_guard.trip(domain_key(domain))
+				record(label, site_key, site_name=site_name, domain=domain,
+					login_ok=False, checkin_ok=False, error='无法访问站点（WAF/CF）')
+				return
 
-			if result.get('error'):
-				log.debug(f'    [CACHE] httpx 错误: {result["error"]}, 降级到浏览器')
-				continue
+		# 优先无浏览器 OAuth（复用 context 中的 linux.do cookie）
+		if site_key not in oauth_fails.get('http_tried', ()):
+			linuxdo_cookies = await ctx.cookies(['https://linux.do', 'https://connect.linux.do'])
+			if await _http_oauth_checkin(label, site_key, site_data | {'client_id': client_id}, info, linuxdo_cookies,
+										 client, oauth_fails.setdefault('http', {}), checkin):
+				oauth_fails['consecutive'] = 0
+				return
 
-			handle_checkin_result(label, site_key, result, session, info, method='httpx')
-			handled_sites.add(site_key)
-			cache_hits += 1
-		except Exception as e:
-			log.debug(f'    [CACHE] httpx 异常: {e}, 降级到浏览器')
+		# OAuth 登录
+		log.info(f'    --- OAuth 登录 ---')
+		with timer(f'{label}/{site_name} OAuth'), metric_oauth_seconds.time(method='browser', outcome='error') as labels:
+			session_value, access_token = await oauth_login_site(page, ctx, domain, client_id)
+			labels['outcome'] = 'ok' if session_value else 'fail'
 
-	if cache_hits > 0:
-		log.info(f'  [CACHE] {cache_hits} 个站点通过缓存完成签到')
+		if not session_value:
+			log.warning(f'    [FAIL] 登录失败')
+			record(label, site_key, site_name=site_name, domain=domain,
+				login_ok=False, checkin_ok=False, error='OAuth 获取 session 失败')
+			if checkin:
+				update_account_info(info, site_key, label,
+					checkin_status='failed', checkin_date=today, error='OAuth 获取 session 失败')
+			oauth_fails['consecutive'] += 1
+			return
+
+		oauth_fails['consecutive'] = 0
+		log.info(f'    [OK] 登录成功! Session: {session_value[:40]}...')
+		if access_token:
+			log.debug(f'    Access Token: {access_token[:30]}...')
+
+		# 获取用户 ID
+		user_id = None
+		if not access_token:
+			log.debug(f'    --- 获取用户 ID ---')
+			user_id = await get_user_id_from_page(page, domain)
+			if user_id:
+				log.debug(f'    用户 ID: {user_id}')
+			else:
+				log.warning(f'    [WARN] 未获取到用户 ID 和 access_token，尝试直接签到')
+
+		# 保存 session 到 site_info
+		update_account_info(info, site_key, label,
+			session=session_value, user_id=user_id, access_token=access_token,
+			session_updated=today)
+		if not checkin:
+			record(label, site_key, site_name=site_name, domain=domain, login_ok=True, refreshed=True, method='browser')
+			return
+
+		# 签到
+		log.info(f'    --- 签到 ---')
+		try:
+			await page.goto(f'{domain}/', wait_until='domcontentloaded', timeout=15000)
+			await wait_page_settled(page, 2)
+		except Exception:
+			pass
+
+		with timer(f'{label}/{site_name} 签到'):
+			checkin_result = await do_checkin_via_browser(page, domain, checkin_path, user_id=user_id, access_token=access_token)
+		handle_checkin_result(label, site_key, checkin_result, session_value, info, method='browser')
+
+	except Exception as e:
+		log.error(f'    [ERROR] 站点处理异常: {e}', exc_info=True)
+		record(label, site_key, site_name=site_name, domain=domain,
+			login_ok=False, checkin_ok=False, error=f'异常: {str(e)[:80]}')
+
+
+@traced('account', cat='phase', phase='browser', bind=lambda account, *a, **kw: {'account': account['label']})
+async def process_account(account, info, debug_port=9222, client=None, handled_sites=None, tabs=BROWSER_TABS,
+						  shared=None, checkin=True):
+	"""处理单个 LinuxDO 账号在所有站点的登录和签到。
+	handled_sites: Phase 1 已处理的站点集合（由 run_cached_checkins 提供），其余站点走浏览器
+	tabs: 浏览器阶段同一账号并发的标签页数
+	shared: 池模式下的 SharedChrome（每个账号一个独立 context）；为空时启动独立 Chrome 进程
+	checkin: False 时只对剩余站点重新 OAuth 刷新 session（续期模式）"""
+	label = account['label']
+	log.info(f'\n{"=" * 70}')
+	log.info(f'[ACCOUNT] {label} ({account["login"]})')
+	log.info(f'{"=" * 70}')
+
+	# === Phase 1: httpx 快速签到（main() 已全局并发执行，单独调用时在此补跑）===
+	if handled_sites is None:
+		handled_sites = (await run_cached_checkins(info, [account], client=client))[label]
+	active_sites = get_active_sites(info, label)
 
 	# 检查是否还有需要浏览器的站点
 	remaining = [k for k, _ in active_sites if k not in handled_sites]
@@ -1455,53 +1995,43 @@ async def process_account(account, info, debug_port=9222):
 		log.info(f'  [OK] 所有站点已通过缓存完成!')
 		return
 
+	# === Phase 1.5: 已保存的 LinuxDO 登录态 → httpx OAuth，无需启动 Chrome ===
+	# http_tried / http_state 交给浏览器阶段：登录态没有更新时，这些站点不再在标签页里重试 httpx OAuth
+	http_tried, http_state = set(), {'disabled': False}
+	saved_state = load_state(state_path(label))
+	if saved_state:
+		http_sites = [(k, d) for k, d in active_sites
+					  if k in remaining and d.get('client_id') and d.get('alive') is not False]
+		if http_sites:
+			http_tried = {k for k, _ in http_sites}
+			with timer(f'{label} httpx OAuth ({len(http_sites)} 个站点)'):
+				done = await run_http_oauth(label, http_sites, info, saved_state['cookies'], client=client, checkin=checkin,
+											http_oauth=http_state)
+			handled_sites.update(done)
+			remaining = [k for k in remaining if k not in done]
+			log.info(f'  [OAUTH] httpx 完成 {len(done)}/{len(http_sites)} 个站点')
+			if not remaining:
+				return
+
 	log.info(f'  需要浏览器 OAuth: {len(remaining)} 个站点\n')
 
 	# === Phase 2: 浏览器 OAuth ===
-	tmpdir = tempfile.mkdtemp(prefix=f'chrome_{label}_')
-	chrome_args = [
-		CHROME_EXE, f'--remote-debugging-port={debug_port}', f'--user-data-dir={tmpdir}',
-		'--no-first-run', '--no-default-browser-check',
-	]
-	if IS_LINUX:
-		chrome_args += [
-			'--headless=new', '--no-sandbox', '--disable-gpu', '--disable-dev-shm-usage',
-			'--disable-blink-features=AutomationControlled', '--window-size=1920,1080',
-		]
-	if PROXY_URL:
-		chrome_args.append(f'--proxy-server={PROXY_URL}')
-	chrome_args.append('about:blank')
-	proc = subprocess.Popen(chrome_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-	# 等待 CDP 就绪
-	for _ in range(10):
-		await asyncio.sleep(1)
-		try:
-			async with httpx.AsyncClient() as _client:
-				await _client.get(f'http://127.0.0.1:{debug_port}/json/version', timeout=2)
-			break
-		except Exception:
-			pass
-	else:
-		log.error('  [FAIL] Chrome CDP 未就绪')
-		proc.terminate()
-		shutil.rmtree(tmpdir, ignore_errors=True)
-		for site_key, site_data in active_sites:
-			if site_key not in handled_sites:
-				record(label, site_key, site_name=site_data.get('name', site_key),
-					domain=site_data['domain'], login_ok=False, checkin_ok=False, error='Chrome CDP 未就绪')
-		return
+	async with browser_context(debug_port, prefix=f'chrome_{label}_', shared=shared) as ctx:
+		if ctx is None:
+			log.error('  [FAIL] Chrome CDP 未就绪')
+			for site_key, site_data in active_sites:
+				if site_key not in handled_sites:
+					record(label, site_key, site_name=site_data.get('name', site_key),
+						domain=site_data['domain'], login_ok=False, checkin_ok=False, error='Chrome CDP 未就绪')
+			return
 
-	async with async_playwright() as p:
 		try:
-			browser = await p.chromium.connect_over_cdp(f'http://127.0.0.1:{debug_port}')
-			ctx = browser.contexts[0]
 			page = await ctx.new_page()
 
 			# === 登录 LinuxDO ===
 			log.info(f'\n  [Step 1] 登录 LinuxDO...')
 			with timer(f'{label} LinuxDO 登录'):
-				logged_in = await do_login(page, account)
+				logged_in = await login_linuxdo(ctx, page, account)
 			if not logged_in:
 				log.error(f'  [FAIL] LinuxDO 登录失败，跳过所有站点')
 				for site_key, site_data in active_sites:
@@ -1509,170 +2039,137 @@ async def process_account(account, info, debug_port=9222):
 						record(label, site_key, site_name=site_data.get('name', site_key),
 							domain=site_data['domain'], login_ok=False, checkin_ok=False, error='LinuxDO 登录失败')
 				await page.close()
-				await browser.close()
-				proc.terminate()
-				shutil.rmtree(tmpdir, ignore_errors=True)
 				return
 
 			log.info(f'  [OK] LinuxDO 登录成功!\n')
 
-			# === 逐站点 OAuth + 签到 ===
-			consecutive_oauth_fails = 0
-			MAX_CONSECUTIVE_FAILS = 5
-
-			for site_key, site_data in active_sites:
-				site_name = site_data.get('name', site_key)
-				domain = site_data['domain']
-				client_id = site_data.get('client_id')
-				checkin_path = site_data.get('checkin_path', '/api/user/checkin')
-
-				if site_key in handled_sites:
-					continue
-
-				# 其他账号浏览器已确认站点不可达 → 跳过
-				if site_data.get('alive') == False:
-					log.debug(f'  [{site_name}] 浏览器确认不可达，跳过')
-					record(label, site_key, site_name=site_name, domain=domain,
-						login_ok=False, checkin_ok=False, error='站点无法连接')
-					update_account_info(info, site_key, label,
-						checkin_status='failed', checkin_date=today, error='站点无法连接')
-					handled_sites.add(site_key)
-					continue
-
-				# 今日已签到跳过（Phase 2 重检查）
-				if is_checkin_done_today(info, site_key, label):
-					log.debug(f'  [SKIP] {site_name} 今日已签到')
-					handled_sites.add(site_key)
-					continue
-
-				# 连续 OAuth 失败检测
-				if consecutive_oauth_fails >= MAX_CONSECUTIVE_FAILS:
-					log.warning(f'  [SKIP] 连续 {consecutive_oauth_fails} 次 OAuth 失败，跳过剩余站点')
-					for sk, sd in active_sites:
-						if sk not in handled_sites:
-							record(label, sk, site_name=sd.get('name', sk), domain=sd['domain'],
-								login_ok=False, checkin_ok=False, error=f'跳过(连续{consecutive_oauth_fails}次OAuth失败)')
-					break
+			# === 多标签页并发 OAuth + 签到（同一 ctx 共享 LinuxDO 登录态，同根域名站点不并发）===
+			if logged_in == 'login':
+				http_tried, http_state = set(), {'disabled': False}  # cookie 已更新，httpx OAuth 值得再试
+			oauth_fails = {'consecutive': 0, 'aborted': False, 'http': http_state, 'http_tried': http_tried}
+			site_queue = ExclusiveKeyQueue(
+				[(k, d) for k, d in active_sites if k not in handled_sites],
+				key=lambda item: root_domain(domain_key(item[1]['domain'])),
+			)
+			pages = [page] + [await ctx.new_page() for _ in range(max(1, min(tabs, len(site_queue))) - 1)]
+			log.info(f'  [TABS] {len(pages)} 个标签页并发处理 {len(site_queue)} 个站点')
+
+			async def tab_worker(tab):
+				while True:
+					if oauth_fails['consecutive'] >= MAX_CONSECUTIVE_OAUTH_FAILS:
+						if not oauth_fails['aborted']:
+							oauth_fails['aborted'] = True
+							log.warning(f'  [SKIP] 连续 {oauth_fails["consecutive"]} 次 OAuth 失败，跳过剩余站点')
+							for sk, sd in site_queue.drain():
+								record(label, sk, site_name=sd.get('name', sk), domain=sd['domain'],
+									login_ok=False, checkin_ok=False, error=f'跳过(连续{oauth_fails["consecutive"]}次OAuth失败)')
+						return tab
+					item = await site_queue.take()
+					if item is None:
+						return tab
+					try:
+						if tab.is_closed():
+							tab = await ctx.new_page()
+						await _browser_site_one(label, item[0], item[1], tab, ctx, info, handled_sites, oauth_fails, client,
+												checkin)
+					finally:
+						await site_queue.done(item)
 
-				log.info(f'  {"─" * 50}')
-				log.info(f'  [{site_name}] {domain}')
+			pages = await asyncio.gather(*[tab_worker(tab) for tab in pages])
+			await persist_linuxdo_state(ctx, label)
 
+			for tab in pages:
 				try:
-					# 如果 client_id 未知，先通过浏览器获取
-					if not client_id:
-						log.debug(f'    获取站点配置...')
-						status_data = await get_site_config_via_browser(page, domain)
-						if status_data:
-							client_id = status_data.get('linuxdo_client_id', '')
-							checkin_enabled = status_data.get('checkin_enabled', False)
-							log.debug(f'    Client ID: {client_id}')
-							log.debug(f'    签到功能: {"开启" if checkin_enabled else "关闭"}')
-							if not client_id:
-								log.warning(f'    [SKIP] 无 LinuxDO OAuth')
-								record(label, site_key, site_name=site_name, domain=domain,
-									login_ok=False, checkin_ok=False, error='无 LinuxDO OAuth')
-								continue
-							update_site_info(info, site_key,
-								client_id=client_id, alive=True,
-								version=status_data.get('version', ''),
-								checkin_enabled=checkin_enabled,
-								min_trust_level=status_data.get('min_trust_level'),
-							)
-						else:
-							log.warning(f'    [FAIL] 无法获取站点配置')
-							update_site_info(info, site_key, alive=False)  # 浏览器确认不可达，其他账号跳过
-							record(label, site_key, site_name=site_name, domain=domain,
-								login_ok=False, checkin_ok=False, error='无法访问站点（WAF/CF）')
-							continue
-
-					# OAuth 登录
-					log.info(f'    --- OAuth 登录 ---')
-					with timer(f'{label}/{site_name} OAuth'):
-						session_value, access_token = await oauth_login_site(page, ctx, domain, client_id)
-
-					if not session_value:
-						log.warning(f'    [FAIL] 登录失败')
-						record(label, site_key, site_name=site_name, domain=domain,
-							login_ok=False, checkin_ok=False, error='OAuth 获取 session 失败')
-						update_account_info(info, site_key, label,
-							checkin_status='failed', checkin_date=today, error='OAuth 获取 session 失败')
-						consecutive_oauth_fails += 1
-						continue
-
-					consecutive_oauth_fails = 0
-					log.info(f'    [OK] 登录成功! Session: {session_value[:40]}...')
-					if access_token:
-						log.debug(f'    Access Token: {access_token[:30]}...')
-
-					# 获取用户 ID
-					user_id = None
-					if not access_token:
-						log.debug(f'    --- 获取用户 ID ---')
-						user_id = await get_user_id_from_page(page, domain)
-						if user_id:
-							log.debug(f'    用户 ID: {user_id}')
-						else:
-							log.warning(f'    [WARN] 未获取到用户 ID 和 access_token，尝试直接签到')
-
-					# 保存 session 到 site_info
-					update_account_info(info, site_key, label,
-						session=session_value, user_id=user_id, access_token=access_token,
-						session_updated=today)
+					await asyncio.wait_for(tab.close(), timeout=5)
+				except Exception:
+					pass
+		except Exception as e:
+			log.error(f'  [ERROR] 浏览器异常: {e}', exc_info=True)
 
-					# 签到
-					log.info(f'    --- 签到 ---')
-					try:
-						await page.goto(f'{domain}/', wait_until='domcontentloaded', timeout=15000)
-						await asyncio.sleep(2)
-					except Exception:
-						pass
 
-					with timer(f'{label}/{site_name} 签到'):
-						checkin_result = await do_checkin_via_browser(page, domain, checkin_path, user_id=user_id, access_token=access_token)
-					handle_checkin_result(label, site_key, checkin_result, session_value, info, method='browser')
+@traced('refresh', cat='phase', phase='refresh')
+async def refresh_sessions(info, accounts, client=None, shared=None, tabs=BROWSER_TABS, serial=False,
+						   margin=REFRESH_MARGIN_DAYS):
+	"""续期模式：对年龄接近站点寿命（或已失效被清空）的 session 重新 OAuth，不签到。
+	复用 process_account：不需要续期的站点作为 handled_sites 传入，剩余站点先 httpx OAuth、再浏览器。返回待续期数"""
+	today = datetime.now().date()
+	plan = {}  # {label: 无需续期的站点集合}
+	total = 0
+	for account in accounts:
+		label = account['label']
+		active = get_active_sites(info, label)
+		due = sessions_due(active, label, today, margin)
+		for site_key, site_data, reason in due:
+			log.info(f'  [REFRESH] {label}/{site_data.get("name", site_key)}: {reason}')
+		if due:
+			due_keys = {k for k, _, _ in due}
+			plan[label] = {k for k, _ in active if k not in due_keys}
+			total += len(due)
+	if not plan:
+		log.info('  [REFRESH] 没有需要续期的 session')
+		return 0
+	log.info(f'  [REFRESH] {len(plan)} 个账号共 {total} 个 session 待续期')
+
+	budget = MemoryBudget(
+		max_workers=len(plan),
+		per_worker_mb=BROWSER_CONTEXT_MB if shared is not None else BROWSER_PROCESS_MB,
+		reserve_mb=BROWSER_RESERVE_MB,
+		fixed=1 if serial else None,
+	)
 
-				except Exception as e:
-					log.error(f'    [ERROR] 站点处理异常: {e}', exc_info=True)
-					record(label, site_key, site_name=site_name, domain=domain,
-						login_ok=False, checkin_ok=False, error=f'异常: {str(e)[:80]}')
+	async def run_account(i, account):
+		async with budget.slot():
+			await process_account(account, info, debug_port=DEBUG_PORT + i, client=client,
+								  handled_sites=plan[account['label']], tabs=tabs, shared=shared, checkin=False)
 
-			try:
-				await asyncio.wait_for(page.close(), timeout=5)
-			except Exception:
-				pass
-			try:
-				await asyncio.wait_for(browser.close(), timeout=5)
-			except Exception:
-				pass
-		except Exception as e:
-			log.error(f'  [ERROR] 浏览器异常: {e}', exc_info=True)
+	outcomes = await asyncio.gather(*[run_account(i, a) for i, a in enumerate(accounts) if a['label'] in plan],
+									return_exceptions=True)
+	for result in outcomes:
+		if isinstance(result, Exception):
+			log.error(f'  [ERROR] 续期异常: {result}')
+	return total
 
-	proc.terminate()
-	try:
-		proc.wait(timeout=5)
-	except Exception:
-		proc.kill()
-	shutil.rmtree(tmpdir, ignore_errors=True)
 
+DAEMON_SCHEDULE = '08:00'  # 常驻模式默认每日签到时刻
+DAEMON_JITTER_MINUTES = 30  # 每个站点在时段内的错峰上限
+DAEMON_STATUS_PORT = 8765  # 本地状态接口端口（仅 127.0.0.1）
+DAEMON_TOKEN_ENV = 'CHECKIN_STATUS_TOKEN'  # POST /run 的 Bearer token；未设置时每次启动随机生成
+DAEMON_TOKEN_FILE = 'status_token'  # 随机 token 写入此文件（0600），供本机 curl 读取
+DAEMON_POLL_SECONDS = 30  # 检查 sites.json 变更 / 跨天的间隔
 
-async def main():
-	global log
-	log = setup_logging()
-	overall_start = time.monotonic()
 
-	# 解析命令行参数
+def parse_args(argv=None):
+	"""解析命令行参数"""
 	parser = argparse.ArgumentParser(description='多站点自动签到')
 	parser.add_argument('--serial', action='store_true', help='串行执行（低内存服务器）')
-	args = parser.parse_args()
+	parser.add_argument('--tabs', type=int, default=BROWSER_TABS, help=f'每个账号浏览器阶段并发标签页数（默认 {BROWSER_TABS}）')
+	parser.add_argument('--browser-mode', choices=['pool', 'process'], default='pool',
+						help='pool: 单个 Chrome + 每账号独立 context（默认）；process: 每账号一个 Chrome 进程')
+	parser.add_argument('--refresh', action='store_true',
+						help='续期模式：只对即将过期的 session 重新 OAuth，不签到（建议在低峰时段定时运行）')
+	parser.add_argument('--refresh-margin', type=int, default=REFRESH_MARGIN_DAYS,
+						help=f'续期提前天数（默认 {REFRESH_MARGIN_DAYS}）')
+	parser.add_argument('--no-trace', action='store_true', help='不记录追踪（默认每轮导出 logs/trace_*.json）')
+	parser.add_argument('--metrics-file', default=None,
+						help='每轮结束写出 Prometheus 指标文件（node_exporter textfile collector，如 /var/lib/node_exporter/checkin.prom）')
+	parser.add_argument('--daemon', action='store_true',
+						help='常驻模式：保持连接池、WAF 求解器和浏览器，按每日计划错峰签到')
+	parser.add_argument('--at', default=DAEMON_SCHEDULE, help=f'常驻模式每日签到时刻，逗号分隔（默认 {DAEMON_SCHEDULE}）')
+	parser.add_argument('--jitter', type=int, default=DAEMON_JITTER_MINUTES,
+						help=f'常驻模式每个站点的错峰上限，分钟（默认 {DAEMON_JITTER_MINUTES}）')
+	parser.add_argument('--status-port', type=int, default=DAEMON_STATUS_PORT,
+						help=f'常驻模式状态接口端口，0 为关闭（默认 {DAEMON_STATUS_PORT}）')
+	args = parser.parse_args(argv)
+	if args.daemon:
+		try:
+			parse_times(args.at)
+		except ValueError as e:
+			parser.error(f'--at: {e}')
+	return args
 
-	log.info('=' * 70)
-	log.info('多站点自动登录 + 签到')
-	log.info(f'站点配置: {SITES_FILE} ({len(SITES)} 个)')
-	log.info(f'时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
-	log.info(f'环境: Python {sys.version.split()[0]} | {platform.system()} {platform.release()}')
-	log.info('=' * 70)
 
-	# Chrome 存在性检查
+def check_chrome():
+	"""Chrome 存在性检查，未找到时退出"""
 	if IS_LINUX:
 		chrome_exists = shutil.which(CHROME_EXE) is not None or os.path.exists(CHROME_EXE)
 	else:
@@ -1683,58 +2180,108 @@ async def main():
 			log.error('Linux 安装: sudo dnf install -y chromium 或 sudo apt install -y chromium-browser')
 		sys.exit(1)
 
-	# 清理遗留 Chrome 进程
-	kill_chrome()
-	await asyncio.sleep(2)
 
-	# 同步 sites.json → site_info.json（唯一执行数据源）
-	info = sync_site_info(SITES)
-	summary = info['_meta'].get('summary', {})
-	log.info(f'  site_info: {SITE_INFO_FILE} (今日: {info["_meta"]["checkin_date"]})')
-	log.info(f'  活跃站点: {summary.get("active_sites", 0)} | 跳过: {summary.get("skipped_sites", 0)} | 账号: {len(LINUXDO_ACCOUNTS)}')
+@traced('run', cat='phase')
+async def run_checkin(info, args, client, shared=None, only=None, truncate=True, started=None):
+	"""一轮签到：Phase 0 外部站点 → Phase 1 缓存签到 → Phase 2 浏览器 OAuth，结束后输出汇总并压缩结果日志。
+	only: 只处理这些站点（常驻模式按站点错峰触发），为空时处理全部
+	truncate: 是否清空结果日志（常驻模式同一天的多轮追加）
+	返回汇总统计"""
+	started = started or time.monotonic()
+	results.clear()
+	journal.open(truncate=truncate)
 
 	# 自动补全缺失的 client_id
-	await resolve_sites(info)
+	await resolve_sites(info, client=client)
+	site_store.flush()
 
 	# Phase 0: AnyRouter/AgentRouter 签到（httpx 直连，无需浏览器）
 	external_accounts = load_external_accounts()
-	if external_accounts:
-		await process_external_sites(info, external_accounts)
-
-	# 自动检测串行模式：Linux + 内存 < 3GB
-	serial_mode = args.serial
-	if IS_LINUX and not args.serial:
-		try:
-			with open('/proc/meminfo') as f:
-				for line in f:
-					if line.startswith('MemTotal:'):
-						kb = int(line.split()[1])
-						if kb < 3 * 1024 * 1024:
-							serial_mode = True
-							log.info('  [INFO] 内存不足 3GB，自动切换串行模式')
-						break
-		except Exception:
-			pass
-
-	if serial_mode:
+	if external_accounts and (only is None or any(SITES.get(k, {}).get('provider') for k in only)):
+		await process_external_sites(info, external_accounts, client=client, shared=shared, only=only)
+		journal.flush(sync=True)
+		site_store.flush()
+
+	# Phase 1: 所有账号 × 站点的缓存 session 全局并发签到，剩余站点才进入浏览器阶段
+	handled = await run_cached_checkins(info, LINUXDO_ACCOUNTS, client=client, only=only)
+	journal.flush(sync=True)
+	site_store.flush()
+
+	# 按内存预算调度浏览器账号：MemAvailable + 实测 Chrome RSS 决定并发数，其余排队；--serial 固定为 1
+	budget = MemoryBudget(
+		max_workers=len(LINUXDO_ACCOUNTS),
+		per_worker_mb=BROWSER_CONTEXT_MB if shared is not None else BROWSER_PROCESS_MB,
+		reserve_mb=BROWSER_RESERVE_MB,
+		fixed=1 if args.serial else None,
+	)
+	if args.serial:
 		log.info(f'  [MODE] 串行执行')
-		for account in LINUXDO_ACCOUNTS:
-			try:
-				await process_account(account, info, debug_port=9222)
-			except Exception as e:
-				log.error(f'  [ERROR] 账号 {account["label"]} 异常: {e}')
 	else:
-		log.info(f'  [MODE] 并行执行 ({len(LINUXDO_ACCOUNTS)} 个 Chrome)')
-		tasks = []
-		for i, account in enumerate(LINUXDO_ACCOUNTS):
-			tasks.append(process_account(account, info, debug_port=9222 + i))
-		gather_results = await asyncio.gather(*tasks, return_exceptions=True)
-		for i, result in enumerate(gather_results):
-			if isinstance(result, Exception):
-				log.error(f'  [ERROR] 账号 {LINUXDO_ACCOUNTS[i]["label"]} 异常: {result}')
+		chrome_desc = '1 个 Chrome, 每账号一个 context' if shared is not None else '每账号一个 Chrome'
+		log.info(f'  [MODE] 内存自适应并行 ({chrome_desc}, 当前容量 {budget.capacity()}/{len(LINUXDO_ACCOUNTS)})')
+
+	async def run_account(i, account):
+		async with budget.slot():
+			log.debug(f'  [MEM] {account["label"]} 开始 (活跃 {budget.active}, 容量 {budget.last_capacity or budget.fixed})')
+			await process_account(account, info, debug_port=9222 + i, client=client,
+								  handled_sites=handled[account['label']], tabs=args.tabs, shared=shared)
+
+	gather_results = await asyncio.gather(*[run_account(i, a) for i, a in enumerate(LINUXDO_ACCOUNTS)],
+										  return_exceptions=True)
+	for i, result in enumerate(gather_results):
+		if isinstance(result, Exception):
+			log.error(f'  [ERROR] 账号 {LINUXDO_ACCOUNTS[i]["label"]} 异常: {result}')
+	log.info(f'  [MEM] 浏览器阶段峰值并发: {budget.peak}')
+	opened = [k for k, v in domain_guard.snapshot().items() if v['state'] == 'open']
+	if opened:
+		log.info(f'  [CIRCUIT] 熔断域名 ({len(opened)}): {", ".join(sorted(opened))}')
+	journal.flush(sync=True)
+	site_store.flush()
 
 	# 输出汇总（基于 site_info，包含缓存跳过的完整视图）
-	overall_ms = round((time.monotonic() - overall_start) * 1000)
+	stats = log_summary(info, round((time.monotonic() - started) * 1000))
+	metric_tasks.set(stats['success'], status='success')
+	metric_tasks.set(stats['already'], status='already_checked')
+	metric_tasks.set(stats['failed'], status='failed')
+	metric_last_run_timestamp.set(round(time.time()))
+	metric_last_run_seconds.set(stats['duration_s'])
+
+	# 压缩结果日志 → checkin_results.json（供 analyze_* 等脚本读取）
+	journal.compact(RESULTS_FILE)
+	journal.close()
+
+	log.info(f'\n结果已保存到: {RESULTS_FILE}')
+	log.info(f'站点信息已保存到: {SITE_INFO_FILE}')
+	return stats
+
+
+def export_trace():
+	"""导出本轮追踪为 logs/trace_<时间>.json（Chrome trace / Perfetto 格式），导出后清空供下一轮使用"""
+	path = LOG_DIR / f'trace_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.json'
+	try:
+		count = tracer.export(str(path))
+	except OSError as e:
+		log.warning(f'  [TRACE] 追踪导出失败: {e}')
+		count = 0
+	tracer.reset()
+	if count:
+		log.info(f'追踪已保存到: {path} ({count} 个 span)')
+	return path if count else None
+
+
+def write_metrics(path):
+	"""写出 Prometheus textfile（node_exporter --collector.textfile.directory 下的 *.prom），未指定路径时跳过"""
+	if not path:
+		return
+	try:
+		metrics.write_textfile(path)
+		log.debug(f'  [METRICS] 指标已写入: {path}')
+	except OSError as e:
+		log.warning(f'  [METRICS] 指标写入失败: {e}')
+
+
+def log_summary(info, overall_ms):
+	"""输出汇总报告（按站点、按账号、失败原因），返回统计数字"""
 	all_labels = [a['label'] for a in LINUXDO_ACCOUNTS]
 
 	# 按站点汇总状态（从 site_info 读取，覆盖缓存+本次执行）
@@ -1858,8 +2405,197 @@ async def main():
 		for err, count in sorted(errors.items(), key=lambda x: -x[1]):
 			log.info(f'    {err}: {count} 次')
 
-	log.info(f'\n结果已保存到: {RESULTS_FILE}')
-	log.info(f'站点信息已保存到: {SITE_INFO_FILE}')
+	return {'tasks': total_tasks, 'success': total_ok, 'already': total_already, 'failed': total_fail,
+			'duration_s': round(overall_ms / 1000, 1)}
+
+
+def _sites_mtime():
+	try:
+		return os.stat(SITES_FILE).st_mtime_ns
+	except OSError:
+		return None
+
+
+def reload_sites():
+	"""常驻模式：重新读取 sites.json 并原地更新 SITES，读取失败时保留旧配置"""
+	try:
+		sites = read_sites()
+	except (OSError, json.JSONDecodeError) as e:
+		log.warning(f'  [DAEMON] sites.json 重新加载失败，沿用旧配置: {e}')
+		return False
+	SITES.clear()
+	SITES.update(sites)
+	log.info(f'  [DAEMON] sites.json 已重新加载 ({len(SITES)} 个站点)')
+	return True
+
+
+async def run_daemon(args, info, client, shared=None):
+	"""常驻模式：进程内保持连接池、WAF 求解器和共享 Chrome，按每日计划错峰触发签到。
+	- 每个站点在时段开始后按哈希延后 [0, --jitter) 分钟触发，执行期间到期的站点在下一轮合并执行
+	- 启动时补跑当天已过时段的站点（今日已签到的在 Phase 1 直接跳过）
+	- sites.json 修改后重新加载并同步 site_info；跨天时重新同步（重置签到状态）
+	- 状态接口: GET /status 查看运行状态，GET /metrics 为 Prometheus 指标，POST /run 立即对全部站点签到
+	收到 SIGTERM 后等当前一轮结束再退出"""
+	schedule = DailySchedule(parse_times(args.at), jitter=args.jitter * 60)
+	now = datetime.now()
+	# 游标从今日零点前开始：当天已过时段在启动后立即补跑
+	cursor = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(microseconds=1)
+	info_date = now.date()
+	sites_mtime = _sites_mtime()
+	journal_date = None
+	trigger = asyncio.Event()
+	stop = asyncio.Event()
+	status = {
+		'state': 'idle', 'pid': os.getpid(), 'started_at': now.strftime('%Y-%m-%d %H:%M:%S'),
+		'schedule': args.at, 'jitter_minutes': args.jitter, 'sites': len(SITES), 'sites_reloaded_at': None,
+		'runs': 0, 'current_run': None, 'last_run': None, 'next_run': None,
+	}
+
+	def request_run():
+		trigger.set()
+		return 202, 'application/json', json.dumps({'queued': True})
+
+	server = None
+	if args.status_port:
+		token = os.environ.get(DAEMON_TOKEN_ENV)
+		if not token:
+			token = secrets.token_urlsafe(24)
+			atomic_write(DAEMON_TOKEN_FILE, token + '\n', mode=0o600, keep_mode=False)
+		server = StatusServer({
+			('GET', '/status'): lambda: {**status, 'circuits': domain_guard.snapshot()},
+			('POST', '/run'): request_run,
+			('GET', '/metrics'): lambda: (200, METRICS_CONTENT_TYPE, metrics.render()),
+		}, port=args.status_port, token=token)
+		try:
+			port = await server.start()
+			log.info(f'  [DAEMON] 状态接口: http://127.0.0.1:{port}/status')
+		except OSError as e:
+			log.warning(f'  [DAEMON] 状态接口启动失败: {e}')
+			server = None
+
+	try:
+		asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+	except (NotImplementedError, RuntimeError):
+		pass  # Windows 不支持 add_signal_handler
+
+	# 预热共享 Chrome，首轮浏览器阶段无需等待启动
+	if shared is not None and LINUXDO_ACCOUNTS:
+		await shared.start()
+	log.info(f'  [DAEMON] 每日 {args.at} 签到，站点错峰 {args.jitter} 分钟')
+
+	try:
+		while not stop.is_set():
+			now = datetime.now()
+			mtime = _sites_mtime()
+			if mtime != sites_mtime:
+				sites_mtime = mtime
+				if reload_sites():
+					info = sync_site_info(SITES)
+					status.update(sites=len(SITES), sites_reloaded_at=now.strftime('%Y-%m-%d %H:%M:%S'))
+			if now.date() != info_date:
+				info = sync_site_info(SITES)
+				info_date = now.date()
+
+			keys = [k for k, cfg in SITES.items() if not cfg.get('skip')]
+			if trigger.is_set():
+				trigger.clear()
+				due, reason = keys, '手动触发'
+			else:
+				due, reason = sorted({k for _, k in schedule.fire_times(keys, cursor, now)}), '计划'
+			cursor = now
+
+			if due:
+				log.info(f'\n[DAEMON] {reason}: {len(due)} 个站点')
+				current = {'started_at': now.strftime('%Y-%m-%d %H:%M:%S'), 'reason': reason, 'sites': len(due)}
+				status.update(state='running', current_run=current)
+				try:
+					stats = await run_checkin(info, args, client, shared, only=set(due),
+											  truncate=journal_date != now.date())
+				except Exception as e:
+					log.error(f'  [DAEMON] 本轮签到异常: {e}', exc_info=True)
+					stats = {'error': str(e)[:200]}
+				journal_date = now.date()
+				export_trace()
+				write_metrics(args.metrics_file)
+				status['runs'] += 1
+				status.update(state='idle', current_run=None, last_run={
+					**current, 'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), **stats})
+				# 立即检查执行期间到期的站点
+				continue
+
+			next_fire = schedule.next_fire(keys, now)
+			status['next_run'] = next_fire.strftime('%Y-%m-%d %H:%M:%S') if next_fire else None
+			timeout = DAEMON_POLL_SECONDS
+			if next_fire is not None:
+				timeout = min(max((next_fire - now).total_seconds(), 0.1), DAEMON_POLL_SECONDS)
+			waiters = [asyncio.ensure_future(trigger.wait()), asyncio.ensure_future(stop.wait())]
+			await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+			for w in waiters:
+				w.cancel()
+	finally:
+		if server is not None:
+			await server.close()
+	log.info('[DAEMON] 已停止')
+
+
+async def main():
+	global log
+	log = setup_logging()
+	overall_start = time.monotonic()
+	args = parse_args()
+	tracer.enabled = not args.no_trace
+
+	mode = '多站点 session 续期' if args.refresh else '多站点自动签到（常驻）' if args.daemon else '多站点自动登录 + 签到'
+	log.info('=' * 70)
+	log.info(mode)
+	log.info(f'站点配置: {SITES_FILE} ({len(SITES)} 个)')
+	log.info(f'时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+	log.info(f'环境: Python {sys.version.split()[0]} | {platform.system()} {platform.release()}')
+	log.info('=' * 70)
+
+	check_chrome()
+
+	# 清理遗留 Chrome 进程
+	kill_chrome()
+	await asyncio.sleep(2)
+
+	# 同步 sites.json → site_info.json（唯一执行数据源）
+	info = sync_site_info(SITES)
+	summary = info['_meta'].get('summary', {})
+	log.info(f'  site_info: {SITE_INFO_FILE} (今日: {info["_meta"]["checkin_date"]})')
+	log.info(f'  活跃站点: {summary.get("active_sites", 0)} | 跳过: {summary.get("skipped_sites", 0)} | 账号: {len(LINUXDO_ACCOUNTS)}')
+
+	client = http_pool.get()
+	# 浏览器池模式：整轮共用一个 Chrome（按需启动），每个账号一个独立 context
+	shared = SharedChrome() if args.browser_mode == 'pool' else None
+	try:
+		if args.refresh:
+			# 续期模式写独立日志，不影响当天签到结果
+			journal.path = REFRESH_JOURNAL_FILE
+			journal.open(truncate=True)
+			await resolve_sites(info, client=client)
+			site_store.flush()
+			total = await refresh_sessions(info, LINUXDO_ACCOUNTS, client=client, shared=shared, tabs=args.tabs,
+										   serial=args.serial, margin=args.refresh_margin)
+			site_store.flush(force=True)
+			journal.close()
+			refreshed = sum(1 for r in results if r.get('refreshed'))
+			log.info(f'\n[REFRESH] 完成: 续期 {refreshed}/{total} | 耗时 {time.monotonic() - overall_start:.1f}s')
+			log.info(f'结果日志: {REFRESH_JOURNAL_FILE}')
+			export_trace()
+			write_metrics(args.metrics_file)
+		elif args.daemon:
+			await run_daemon(args, info, client, shared)
+		else:
+			await run_checkin(info, args, client, shared, started=overall_start)
+			export_trace()
+			write_metrics(args.metrics_file)
+	finally:
+		# 网络阶段全部结束，关闭共享 Chrome、连接池和 WAF 求解进程
+		if shared is not None:
+			await shared.close()
+		await http_pool.aclose()
+		waf_solver.close()
 
 
 if __name__ == '__main__':
@@ -1867,5 +2603,10 @@ if __name__ == '__main__':
 		asyncio.run(main())
 	except KeyboardInterrupt:
 		log.info('\n[INFO] 用户中断')
+		if journal.count and journal.path == RESULTS_JOURNAL_FILE:
+			journal.compact(RESULTS_FILE)
+		export_trace()
+		site_store.flush()
+		waf_solver.close()
 		kill_chrome()
 		sys.exit(0)
@@ -3,7 +3,9 @@
 批量探测站点状态 v2
 - 从 sites.json 读取站点列表
 - 多路径检测（/, /api/status, /login, /api/user/checkin）
-- 20s 超时，asyncio.Semaphore 并发控制
+- 先请求 /api/status（完整响应体，同时作为该路径的探测结果）；连接失败或 CF 源站不可达（521/522/530）时跳过其余路径
+- 其余路径并发请求，只读响应体开头；连接 / 读取分别超时，安装了 h2 时同站多路径复用一条 HTTP/2 连接
+- 全局 + 每 host 并发上限（asyncio.Semaphore + HostLimitedTransport）
 - 与上次结果对比，输出变更摘要
 - 6 类分类（configured/pending/needs_work/no_checkin/non_newapi/dead）
 - 自动生成 multi_site_checkin.py 配置片段
@@ -20,6 +22,8 @@ from pathlib import Path
 
 import httpx
 
+from utils.http_pool import HTTP2_AVAILABLE, HostLimitedTransport
+
 # ===================== 常量 =====================
 PROBE_PATHS = [
 	('/', 'root'),
@@ -27,8 +31,15 @@ PROBE_PATHS = [
 	('/login', 'login'),
 	('/api/user/checkin', 'checkin_get'),
 ]
-TIMEOUT = 20
-MAX_CONCURRENT = 20
+STATUS_PATH = '/api/status'
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 10
+PATH_DEADLINE = 15  # 单个路径的总时限（含重定向和读取响应体）
+MAX_CONCURRENT = 100
+PER_HOST = 4  # 同一 host 并发请求上限（HTTP/2 下复用同一连接）
+PREVIEW_BYTES = 4096  # 非 /api/status 路径只读响应体开头
+CF_DEAD_STATUS = (521, 522, 530)  # Cloudflare: 源站拒绝连接 / 连接超时 / 源站解析失败
+UNREACHABLE_ERRORS = ('ConnectError', 'ConnectTimeout')
 SITES_FILE = 'sites.json'
 RESULTS_FILE = 'site_probe_results.json'
 CONFIG_OUTPUT_FILE = 'generated_sites_config.txt'
@@ -94,21 +105,55 @@ def load_previous_results() -> dict[str, dict]:
 	return {}
 
 
+# ===================== HTTP 客户端 =====================
+def make_client() -> httpx.AsyncClient:
+	"""探测用客户端：连接 / 读取分别超时，每 host 并发上限，安装了 h2 时启用 HTTP/2"""
+	limits = httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+	transport = HostLimitedTransport(httpx.AsyncHTTPTransport(http2=HTTP2_AVAILABLE, limits=limits), PER_HOST)
+	return httpx.AsyncClient(
+		transport=transport,
+		headers=HEADERS,
+		timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+		follow_redirects=True,
+	)
+
+
+async def _read_body(resp: httpx.Response, full: bool) -> str:
+	if full:
+		await resp.aread()
+		return resp.text
+	chunks, size = [], 0
+	async for chunk in resp.aiter_bytes():
+		chunks.append(chunk)
+		size += len(chunk)
+		if size >= PREVIEW_BYTES:
+			break
+	return b''.join(chunks).decode(resp.encoding or 'utf-8', errors='replace')
+
+
 # ===================== 单路径探测 =====================
-async def probe_path(client: httpx.AsyncClient, domain: str, path: str, label: str, sem: asyncio.Semaphore) -> dict:
+async def probe_path(client: httpx.AsyncClient, domain: str, path: str, label: str, sem: asyncio.Semaphore,
+					 full_body: bool = False) -> tuple[dict, str | None]:
+	"""探测单个路径，返回 (路径结果, 响应体)。full_body=False 时只读响应体开头"""
 	url = f'{domain}{path}'
 	start = time.monotonic()
 	pr = {
 		'path': path, 'label': label,
 		'status': None, 'content_type': None, 'body_preview': None,
-		'redirect': None, 'time_ms': 0, 'error': None,
+		'redirect': None, 'time_ms': 0, 'error': None, 'error_type': None,
 	}
+	text = None
+
+	async def fetch():
+		async with client.stream('GET', url) as resp:
+			return resp, await _read_body(resp, full_body)
+
 	async with sem:
 		try:
-			resp = await client.get(url, timeout=TIMEOUT)
+			resp, text = await asyncio.wait_for(fetch(), PATH_DEADLINE)
 			pr['status'] = resp.status_code
 			pr['content_type'] = resp.headers.get('content-type', '')
-			body = resp.text[:300]
+			body = text[:300]
 			if 'html' in pr['content_type'].lower():
 				m = re.search(r'<title[^>]*>(.*?)</title>', body, re.I | re.S)
 				if m:
@@ -118,46 +163,33 @@ async def probe_path(client: httpx.AsyncClient, domain: str, path: str, label: s
 			pr['body_preview'] = body
 			if str(resp.url) != url:
 				pr['redirect'] = str(resp.url)
-		except httpx.ConnectTimeout:
-			pr['error'] = '连接超时'
-		except httpx.ReadTimeout:
-			pr['error'] = f'读取超时({TIMEOUT}s)'
+		except httpx.ConnectTimeout as e:
+			pr['error'], pr['error_type'] = f'连接超时({CONNECT_TIMEOUT}s)', type(e).__name__
+		except httpx.ReadTimeout as e:
+			pr['error'], pr['error_type'] = f'读取超时({READ_TIMEOUT}s)', type(e).__name__
+		except asyncio.TimeoutError:
+			pr['error'], pr['error_type'] = f'总超时({PATH_DEADLINE}s)', 'PathDeadline'
 		except httpx.ConnectError as e:
-			pr['error'] = f'连接失败: {str(e)[:80]}'
+			pr['error'], pr['error_type'] = f'连接失败: {str(e)[:80]}', type(e).__name__
 		except Exception as e:
-			pr['error'] = f'{type(e).__name__}: {str(e)[:80]}'
+			pr['error'], pr['error_type'] = f'{type(e).__name__}: {str(e)[:80]}', type(e).__name__
 		finally:
 			pr['time_ms'] = round((time.monotonic() - start) * 1000)
 
 	status_str = str(pr['status']) if pr['status'] else 'ERR'
 	err_str = f' | {pr["error"]}' if pr['error'] else ''
 	log.debug(f'    {label:15s} {status_str:>5} {pr["time_ms"]:>6}ms{err_str}')
-	return pr
+	return pr, text
 
 
-# ===================== /api/status 解析 =====================
-def parse_api_status(result: dict, path_result: dict):
-	try:
-		body = path_result.get('body_preview', '')
-		if not body or body.startswith('title='):
-			return
-		data = json.loads(body)
-		if data.get('success') and data.get('data'):
-			d = data['data']
-			result['is_newapi'] = True
-			result['system_name'] = d.get('system_name', '')
-			result['version'] = d.get('version', '')
-			result['linuxdo_oauth'] = d.get('linuxdo_oauth', False)
-			result['linuxdo_client_id'] = d.get('linuxdo_client_id', '')
-			result['checkin_enabled'] = d.get('checkin_enabled')
-			result['turnstile_check'] = d.get('turnstile_check', False)
-			result['min_trust_level'] = d.get('linuxdo_minimum_trust_level')
-	except (json.JSONDecodeError, TypeError):
-		pass
+def is_unreachable(pr: dict) -> bool:
+	"""连接失败或 CF 报源站不可达：其余路径也不会有结果"""
+	return pr['error_type'] in UNREACHABLE_ERRORS or pr['status'] in CF_DEAD_STATUS
 
 
+# ===================== /api/status 解析 =====================
 def parse_api_status_from_raw(result: dict, resp_text: str):
-	"""从完整响应文本解析 /api/status（当 body_preview 被截断时）"""
+	"""从完整响应文本解析 /api/status"""
 	try:
 		data = json.loads(resp_text)
 		if data.get('success') and data.get('data'):
@@ -201,33 +233,30 @@ async def probe_site(client: httpx.AsyncClient, site: dict, sem: asyncio.Semapho
 		'changes': [],
 	}
 
-	# 先做 /api/status 的完整请求（不截断 body）
-	async with sem:
-		try:
-			resp = await client.get(f'{domain}/api/status', timeout=TIMEOUT)
-			if resp.status_code == 200:
-				parse_api_status_from_raw(result, resp.text)
-		except Exception:
-			pass
-
-	# 多路径探测
-	path_tasks = [probe_path(client, domain, path, label, sem) for path, label in PROBE_PATHS]
-	path_results = await asyncio.gather(*path_tasks)
+	# 先做 /api/status 的完整请求（不截断 body），结果同时作为该路径的探测结果
+	status_label = dict(PROBE_PATHS)[STATUS_PATH]
+	status_pr, status_text = await probe_path(client, domain, STATUS_PATH, status_label, sem, full_body=True)
+	if status_pr['status'] == 200:
+		parse_api_status_from_raw(result, status_text)
+
+	# 其余路径并发探测；/api/status 已确认站点不可达时跳过
+	by_path = {STATUS_PATH: status_pr}
+	if is_unreachable(status_pr):
+		log.debug(f'    跳过其余路径: {status_pr["error"] or status_pr["status"]}')
+	else:
+		rest = [(path, label) for path, label in PROBE_PATHS if path != STATUS_PATH]
+		rest_results = await asyncio.gather(*[probe_path(client, domain, path, label, sem) for path, label in rest])
+		by_path.update({path: pr for (path, _), (pr, _) in zip(rest, rest_results)})
+	path_results = [by_path[path] for path, _ in PROBE_PATHS if path in by_path]
 	result['path_results'] = path_results
 
-	# 从 /api/status 路径结果补充解析（如果完整请求失败了）
-	if not result['is_newapi']:
-		for pr in path_results:
-			if pr['label'] == 'api_status' and pr.get('status') == 200:
-				parse_api_status(result, pr)
-
 	# 判断存活：任意路径返回非 5xx 状态码即为存活
 	for pr in path_results:
 		if pr.get('status') is not None:
 			if pr['status'] < 500:
 				result['alive'] = True
 				break
-			elif pr['status'] in (521, 522, 530):
+			elif pr['status'] in CF_DEAD_STATUS:
 				pass  # CF 错误码仍为死亡
 			else:
 				result['alive'] = True
@@ -388,12 +417,13 @@ async def main():
 	log.info(f'批量站点探测 v2 - {len(sites)} 个站点')
 	log.info(f'时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
 	log.info(f'已配置站点: {len(configured_keys)} 个 | 上次记录: {len(previous)} 个')
-	log.info(f'检测路径: {", ".join(p for p, _ in PROBE_PATHS)} | 超时: {TIMEOUT}s')
+	log.info(f'检测路径: {", ".join(p for p, _ in PROBE_PATHS)} | 超时: 连接 {CONNECT_TIMEOUT}s / 读取 {READ_TIMEOUT}s'
+			 f' | HTTP/2: {"开" if HTTP2_AVAILABLE else "关"}')
 	log.info('=' * 80)
 
 	# 并发探测
 	sem = asyncio.Semaphore(MAX_CONCURRENT)
-	async with httpx.AsyncClient(headers=HEADERS, follow_redirects=True) as client:
+	async with make_client() as client:
 		tasks = [probe_site(client, site, sem) for site in sites]
 		results = await asyncio.gather(*tasks)
 
@@ -2,8 +2,90 @@
 // 核心思路：WAF 脚本会设置 document.cookie 然后 reload
 // 我们拦截 cookie setter 拿到值后立即退出，避免反调试死循环
 
+// 用法:
+//   node solve_waf.js <script_file>   单次模式：输出 cookie JSON 后退出
+//   node solve_waf.js --server        常驻模式：stdin 每行 {"id","script","host"}，stdout 每行 {"id","cookies"}
+
 const fs = require('fs');
 
+if (process.argv[2] === '--server') {
+  runServer();
+  return;
+}
+
+// 常驻模式：每个挑战在独立 vm 上下文中执行，cookie 被设置后抛出哨兵异常中断脚本，
+// 同步死循环（反调试）由 vm timeout 打断；异步定时器全部置空，不会残留
+function runServer() {
+  const vm = require('vm');
+  const readline = require('readline');
+  const DONE = Symbol('done');
+
+  function solve(scriptContent, host, timeoutMs) {
+    const cookieMap = new Map();
+    const location = {
+      reload() {
+        if (cookieMap.size > 0) throw DONE;
+      },
+      replace() {
+        if (cookieMap.size > 0) throw DONE;
+      },
+      href: `https://${host}/`,
+      hostname: host,
+      host: host,
+      pathname: '/',
+      protocol: 'https:',
+      search: '',
+      hash: '',
+    };
+    const document = {
+      set cookie(val) {
+        const mainPart = val.split(';')[0];
+        const eqIndex = mainPart.indexOf('=');
+        if (eqIndex > 0) {
+          cookieMap.set(mainPart.slice(0, eqIndex).trim(), mainPart.slice(eqIndex + 1).trim());
+        }
+        if (cookieMap.size > 0) throw DONE;
+      },
+      get cookie() {
+        return [...cookieMap.entries()].map(([k, v]) => `${k}=${v}`).join('; ');
+      },
+      location,
+    };
+    const noop = () => 0;
+    const sandbox = {
+      document,
+      location,
+      navigator: { userAgent: 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36' },
+      setTimeout: noop,
+      setInterval: noop,
+      clearTimeout: noop,
+      clearInterval: noop,
+      console: { log: noop, warn: noop, error: noop, debug: noop, info: noop },
+    };
+    sandbox.window = sandbox;
+    sandbox.self = sandbox;
+    try {
+      vm.runInNewContext(scriptContent, sandbox, { timeout: timeoutMs });
+    } catch (err) {
+      // DONE / 超时 / 脚本异常，均以已拿到的 cookie 为准
+    }
+    return Object.fromEntries(cookieMap);
+  }
+
+  const rl = readline.createInterface({ input: process.stdin, terminal: false });
+  rl.on('line', (line) => {
+    let job;
+    try {
+      job = JSON.parse(line);
+    } catch (err) {
+      return;
+    }
+    const cookies = solve(job.script || '', job.host || 'anyrouter.top', job.timeout_ms || 5000);
+    process.stdout.write(JSON.stringify({ id: job.id, cookies }) + '\n');
+  });
+  rl.on('close', () => process.exit(0));
+}
+
 const scriptFile = process.argv[2];
 const scriptContent = fs.readFileSync(scriptFile, 'utf8');
 
@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.atomic import atomic_write
+
+
+def _mode(path):
+	return os.stat(path).st_mode & 0o777
+
+
+def test_new_file_mode_and_existing_mode_preserved(tmp_path):
+	path = tmp_path / 'sub' / 'site_info.json'
+	atomic_write(str(path), '{"a": "签到"}')
+	assert path.read_text(encoding='utf-8') == '{"a": "签到"}' and _mode(path) == 0o644
+
+	os.chmod(path, 0o640)
+	atomic_write(str(path), b'{}')
+	assert path.read_bytes() == b'{}' and _mode(path) == 0o640
+
+	atomic_write(str(path), '{}', mode=0o600, keep_mode=False)
+	assert _mode(path) == 0o600
+	assert [p.name for p in path.parent.iterdir()] == ['site_info.json']
+
+
+def test_failed_write_keeps_old_file_and_removes_temp(tmp_path):
+	path = tmp_path / 'results.json'
+	atomic_write(str(path), 'old')
+	with pytest.raises(TypeError):
+		atomic_write(str(path), None)
+	assert path.read_text() == 'old'
+	assert [p.name for p in tmp_path.iterdir()] == ['results.json']
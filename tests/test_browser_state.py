@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.browser_state import filter_state, load_state, restore_state, session_valid, write_state
+
+STATE = {
+	'cookies': [
+		{'name': '_t', 'value': 'tok', 'domain': 'linux.do', 'path': '/', 'expires': -1},
+		{'name': 'auth', 'value': 'a', 'domain': '.connect.linux.do', 'path': '/', 'expires': 4102444800},
+		{'name': 'old', 'value': 'x', 'domain': 'linux.do', 'path': '/', 'expires': 1000},
+		{'name': 'session', 'value': 's', 'domain': 'example.com', 'path': '/', 'expires': -1},
+	],
+	'origins': [
+		{'origin': 'https://linux.do', 'localStorage': [{'name': 'discourse_theme', 'value': '1'}]},
+		{'origin': 'https://example.com', 'localStorage': [{'name': 'user', 'value': '{}'}]},
+	],
+}
+
+
+class _FakeCtx:
+	def __init__(self, status=200, body=None):
+		self.cookies = []
+		self.scripts = []
+		self.request = self
+		self._status = status
+		self._body = body
+
+	async def add_cookies(self, cookies):
+		self.cookies.extend(cookies)
+
+	async def add_init_script(self, script=None):
+		self.scripts.append(script)
+
+	async def get(self, url, **kwargs):
+		return self
+
+	@property
+	def status(self):
+		return self._status
+
+	async def json(self):
+		return self._body
+
+
+def test_filter_state_keeps_only_live_linuxdo_entries():
+	state = filter_state(STATE, now=2000)
+	assert [c['name'] for c in state['cookies']] == ['_t', 'auth']
+	assert [o['origin'] for o in state['origins']] == ['https://linux.do']
+
+
+def test_write_and_load_roundtrip(tmp_path):
+	path = tmp_path / 'browser_state' / 'alice.json'
+	write_state(str(path), filter_state(STATE, now=2000))
+	assert os.stat(path).st_mode & 0o777 == 0o600
+	assert [c['name'] for c in load_state(str(path))['cookies']] == ['_t', 'auth']
+	assert load_state(str(tmp_path / 'missing.json')) is None
+
+
+def test_restore_state_injects_cookies_and_local_storage(tmp_path):
+	path = tmp_path / 'alice.json'
+	write_state(str(path), filter_state(STATE, now=2000))
+	ctx = _FakeCtx()
+	assert asyncio.run(restore_state(ctx, str(path))) is True
+	assert {c['name'] for c in ctx.cookies} == {'_t', 'auth'}
+	assert len(ctx.scripts) == 1 and 'discourse_theme' in ctx.scripts[0]
+	assert asyncio.run(restore_state(_FakeCtx(), str(tmp_path / 'missing.json'))) is False
+
+
+def test_session_valid():
+	assert asyncio.run(session_valid(_FakeCtx(200, {'current_user': {'id': 1}}))) is True
+	assert asyncio.run(session_valid(_FakeCtx(404, {'error': 'not logged in'}))) is False
+	assert asyncio.run(session_valid(_FakeCtx(200, {'current_user': None}))) is False
@@ -0,0 +1,71 @@
+import asyncio
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.browser_waits import SessionCookieWatcher, polled_cost, record_saved, saved_time
+
+
+class _Emitter:
+	def __init__(self):
+		self.handlers = {}
+		self.main_frame = object()
+
+	def on(self, event, handler):
+		self.handlers.setdefault(event, []).append(handler)
+
+	def remove_listener(self, event, handler):
+		self.handlers[event].remove(handler)
+
+
+class _Response:
+	def __init__(self, cookie):
+		self.cookie = cookie
+
+	async def header_value(self, name):
+		return self.cookie
+
+
+class _Request:
+	def __init__(self, url, cookie=None):
+		self.url = url
+		self._response = _Response(cookie)
+
+	async def response(self):
+		return self._response
+
+
+def test_polled_cost():
+	assert polled_cost(0.3, 2.0) == 2.0
+	assert polled_cost(4.1, 2.0) == 6.0
+
+
+def test_saved_time_nested_ledgers():
+	with saved_time() as outer:
+		record_saved(1.5)
+		with saved_time() as inner:
+			record_saved(0.5)
+			record_saved(-3)
+	assert inner[0] == 0.5
+	assert outer[0] == 2.0
+	record_saved(10)  # 无账本时忽略
+	assert outer[0] == 2.0
+
+
+def test_session_cookie_watcher_wakes_on_matching_cookie():
+	async def run():
+		ctx, page = _Emitter(), _Emitter()
+		with SessionCookieWatcher(ctx, page, 'jp.duckcoding.com', 'duckcoding.com') as watcher:
+			handler = ctx.handlers['requestfinished'][0]
+			await handler(_Request('https://other.example/api/oauth/linuxdo', 'session=x; Path=/'))
+			await handler(_Request('https://duckcoding.com/api/status'))
+			assert await watcher.wait(0.05) is False
+			await handler(_Request('https://duckcoding.com/api/oauth/linuxdo?code=1', 'session=abc; Path=/'))
+			assert await watcher.wait(0.05) is True
+			page.handlers['framenavigated'][0](page.main_frame)
+			assert await watcher.wait(0.05) is True
+		assert ctx.handlers['requestfinished'] == [] and page.handlers['framenavigated'] == []
+
+	asyncio.run(run())
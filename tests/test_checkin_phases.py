@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# multi_site_checkin 导入时读取当前目录的 sites.json：在临时目录中导入
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix='checkin_test_'))
+try:
+	with open('sites.json', 'w', encoding='utf-8') as f:
+		json.dump({}, f)
+	import multi_site_checkin as m
+finally:
+	os.chdir(_cwd)
+
+from utils.circuit import CircuitOpenError
+from utils.journal import ResultJournal
+
+TODAY = '2026-03-10'
+
+
+@pytest.fixture
+def checkin(monkeypatch, tmp_path):
+	monkeypatch.chdir(tmp_path)
+	monkeypatch.setattr(m, 'journal', ResultJournal(str(tmp_path / 'results.jsonl')))
+	monkeypatch.setattr(m, 'results', [])
+	return m
+
+
+def _site(i, labels, **accounts):
+	return {
+		'domain': f'https://site{i}.example', 'name': f'Site {i}', 'checkin_path': '/api/user/checkin',
+		'client_id': f'cid{i}',
+		'accounts': {label: {'session': f's-{label}-{i}', 'user_id': 1, 'session_updated': TODAY,
+							 **accounts.get(label, {})} for label in labels},
+	}
+
+
+def _client(handler):
+	return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_phase1_respects_global_and_per_domain_caps(checkin, monkeypatch):
+	monkeypatch.setattr(m, 'PHASE1_CONCURRENCY', 6)
+	monkeypatch.setattr(m, 'PHASE1_PER_DOMAIN', 2)
+	labels = [f'acc{i}' for i in range(5)]
+	info = {f'site{i}': _site(i, labels) for i in range(8)}
+	accounts = [{'label': label} for label in labels]
+	active, peak = Counter(), Counter()
+
+	async def handler(request):
+		host = request.url.host
+		active[host] += 1
+		active['*'] += 1
+		peak[host] = max(peak[host], active[host])
+		peak['*'] = max(peak['*'], active['*'])
+		await asyncio.sleep(0.01)
+		active[host] -= 1
+		active['*'] -= 1
+		return httpx.Response(200, json={'success': True, 'message': '签到成功', 'data': {'quota': 1}})
+
+	async def run():
+		async with _client(handler) as client:
+			return await m.run_cached_checkins(info, accounts, client=client)
+
+	handled = asyncio.run(run())
+	assert all(handled[label] == set(info) for label in labels)
+	assert peak['*'] == 6  # 全局信号量被占满
+	assert max(v for k, v in peak.items() if k != '*') <= 2
+
+
+def test_phase1_splits_handled_and_browser_leftovers(checkin):
+	info = {f'site{i}': _site(i, ['alice']) for i in range(5)}
+	info['site1']['accounts']['alice']['session_updated'] = '2026-03-01'
+	responses = {
+		'site0.example': httpx.Response(200, json={'success': True, 'message': '签到成功', 'data': {}}),
+		'site1.example': httpx.Response(401, json={'success': False}),
+		'site3.example': httpx.Response(200, text='not json'),
+		'site4.example': httpx.Response(200, json={'success': False, 'message': '今日已签到'}),
+	}
+
+	async def handler(request):
+		if request.url.host == 'site2.example':
+			raise httpx.ConnectError('refused', request=request)
+		return responses[request.url.host]
+
+	async def run():
+		async with _client(handler) as client:
+			return await m.run_cached_checkins(info, [{'label': 'alice'}], client=client)
+
+	handled = asyncio.run(run())
+	assert handled['alice'] == {'site0', 'site4'}
+	# 401 → 清空 session 交给浏览器；不可达 / 异常响应保留 session
+	assert 'session' not in info['site1']['accounts']['alice']
+	assert info['site2']['accounts']['alice']['session'] == 's-alice-2'
+	assert info['site3']['accounts']['alice']['session'] == 's-alice-3'
+	assert info['site0']['accounts']['alice']['checkin_status'] == 'success'
+	assert info['site4']['accounts']['alice']['checkin_status'] == 'already_checked'
+
+
+def test_resolve_negative_cache_backoff_and_transient_failures(checkin):
+	now = datetime(2026, 3, 10, 12, 0, 0)
+	info = {'dead': {'domain': 'https://dead.example'}}
+	hours = [m._resolve_mark_failed(info, 'dead', 'unreachable', now) for _ in range(8)]
+	assert hours == [6, 12, 24, 48, 96, 168, 168, 168]  # 翻倍，封顶 RESOLVE_NEG_MAX_HOURS
+	assert info['dead']['resolve_fail']['count'] == 8
+	assert m._resolve_negative_cached(info['dead'], now + timedelta(hours=167))
+	assert not m._resolve_negative_cached(info['dead'], now + timedelta(hours=169))
+
+	sites = ['ok', 'refused', 'nocid', 'notfound', 'bad502', 'busy429', 'slow', 'circuit', 'html']
+	info = {key: {'domain': f'https://{key}.example', 'name': key} for key in sites}
+	info['ok']['resolve_fail'] = {'reason': 'unreachable', 'count': 3}
+
+	async def handler(request):
+		key = request.url.host.split('.')[0]
+		if key == 'refused':
+			raise httpx.ConnectError('dns', request=request)
+		if key == 'slow':
+			raise httpx.ReadTimeout('slow', request=request)
+		if key == 'circuit':
+			raise CircuitOpenError('open', request=request)
+		statuses = {'notfound': 404, 'bad502': 502, 'busy429': 429}
+		if key in statuses:
+			return httpx.Response(statuses[key])
+		if key == 'html':
+			return httpx.Response(200, text='<html>challenge</html>')
+		cid = 'cid-ok' if key == 'ok' else ''
+		return httpx.Response(200, json={'success': True, 'data': {'linuxdo_client_id': cid}})
+
+	async def run():
+		async with _client(handler) as client:
+			return await m.resolve_sites(info, client=client)
+
+	assert asyncio.run(run()) is True
+	assert info['ok']['client_id'] == 'cid-ok' and 'resolve_fail' not in info['ok']
+	assert {k for k in sites if 'resolve_fail' in info[k]} == {'refused', 'nocid', 'notfound'}
+	assert info['refused']['resolve_fail']['reason'] == 'unreachable'
+	assert info['nocid']['resolve_fail']['reason'] == 'no_client_id'
+
+
+class _FakePage:
+	def is_closed(self):
+		return False
+
+	async def close(self):
+		pass
+
+
+class _FakeContext:
+	def __init__(self, cookies):
+		self._cookies = cookies
+
+	async def cookies(self, urls=None):
+		return self._cookies
+
+	async def new_page(self):
+		return _FakePage()
+
+
+def test_browser_tabs_skip_http_oauth_already_tried_in_phase15(checkin, monkeypatch):
+	cookies = [{'name': '_t', 'value': 'alice', 'domain': '.linux.do', 'path': '/'}]
+	calls = Counter()
+
+	@asynccontextmanager
+	async def fake_browser(*args, **kwargs):
+		yield _FakeContext(cookies)
+
+	async def page_oauth(page, ctx, domain, client_id, max_wait=60):
+		calls['page'] += 1
+		return None, None
+
+	async def noop(*args, **kwargs):
+		pass
+
+	async def handler(request):
+		calls[request.url.host] += 1
+		if request.url.path == '/api/oauth/state':
+			return httpx.Response(200, json={'success': True, 'data': 'state'})
+		return httpx.Response(302, headers={'Location': 'https://linux.do/login'})
+
+	monkeypatch.setattr(m, 'load_state', lambda path: {'cookies': cookies})
+	monkeypatch.setattr(m, 'browser_context', fake_browser)
+	monkeypatch.setattr(m, 'oauth_login_site', page_oauth)
+	monkeypatch.setattr(m, 'persist_linuxdo_state', noop)
+
+	for login, authorize_calls in (('restored', 1), ('login', 2)):
+		async def login_linuxdo(ctx, page, credentials, result=login):
+			return result
+
+		monkeypatch.setattr(m, 'login_linuxdo', login_linuxdo)
+		calls.clear()
+		info = {'site0': _site(0, ['alice'], alice={'session': None})}
+
+		async def run():
+			async with _client(handler) as client:
+				await m.process_account({'label': 'alice', 'login': 'alice@example'}, info, client=client,
+										handled_sites=set(), tabs=1)
+
+		asyncio.run(run())
+		# Phase 1.5 一次；登录态复用时标签页不再重试 httpx OAuth，重新登录后才再试
+		assert calls['connect.linux.do'] == authorize_calls
+		assert calls['page'] == 1
+
+
+def test_external_sites_respect_only(checkin, monkeypatch):
+	sites = {
+		'ext_a': {'domain': 'https://a.example', 'name': 'A', 'provider': 'prov_a'},
+		'ext_b': {'domain': 'https://b.example', 'name': 'B', 'provider': 'prov_b'},
+	}
+	accounts = [{'name': 'linuxdo_1_alice_a', 'provider': 'prov_a'}, {'name': 'linuxdo_1_alice_b', 'provider': 'prov_b'}]
+	tried = []
+
+	async def try_checkin(acc, site_key, site_cfg, info, waf_cookies=None, client=None):
+		tried.append((acc['provider'], site_key))
+		return True
+
+	monkeypatch.setattr(m, 'SITES', sites)
+	monkeypatch.setattr(m, '_ext_try_checkin', try_checkin)
+	asyncio.run(m.process_external_sites({}, accounts, only={'ext_a', 'site0'}))
+	assert tried == [('prov_a', 'ext_a')]
+	asyncio.run(m.process_external_sites({}, accounts))
+	assert tried[1:] == [('prov_a', 'ext_a'), ('prov_b', 'ext_b')]
+
+
+def test_stop_chrome_does_not_block_event_loop(monkeypatch, tmp_path):
+	monkeypatch.setattr(m, 'CHROME_STOP_TIMEOUT', 0.5)
+	script = 'import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(30)'
+	profile = tmp_path / 'profile'
+	profile.mkdir()
+	ticks = []
+
+	async def ticker():
+		while True:
+			ticks.append(1)
+			await asyncio.sleep(0.05)
+
+	async def run():
+		proc = await asyncio.create_subprocess_exec(sys.executable, '-c', script)
+		await asyncio.sleep(0.2)
+		task = asyncio.create_task(ticker())
+		await m.stop_chrome(proc, str(profile))
+		task.cancel()
+		return proc.returncode
+
+	# SIGTERM 被忽略 → 等待超时后 kill；等待期间其他协程照常运行
+	assert asyncio.run(run()) == -9
+	assert len(ticks) >= 5 and not profile.exists()
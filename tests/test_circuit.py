@@ -0,0 +1,93 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.circuit import CLOSED, OPEN, CircuitOpenError, DomainGuard, TokenBucket
+from utils.http_pool import HostLimitedTransport
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+def _client(handler, guard):
+	return httpx.AsyncClient(transport=HostLimitedTransport(httpx.MockTransport(handler), per_host=6, guard=guard))
+
+
+def test_first_connect_failure_short_circuits_other_requests():
+	calls = []
+
+	async def handler(request):
+		calls.append(request.url.host)
+		await asyncio.sleep(0.01)
+		if request.url.host == 'dead.example':
+			raise httpx.ConnectError('refused', request=request)
+		return httpx.Response(200)
+
+	async def run():
+		guard = DomainGuard()
+		async with _client(handler, guard) as client:
+			urls = ['https://dead.example/api/user/checkin'] * 5 + ['https://ok.example/'] * 3
+			return await asyncio.gather(*[client.get(u) for u in urls], return_exceptions=True), guard
+
+	outcomes, guard = asyncio.run(run())
+	dead, ok = outcomes[:5], outcomes[5:]
+	assert calls.count('dead.example') == 1
+	assert isinstance(dead[0], httpx.ConnectError) and not isinstance(dead[0], CircuitOpenError)
+	assert all(isinstance(e, CircuitOpenError) for e in dead[1:])
+	assert all(r.status_code == 200 for r in ok)
+	assert guard.is_open('dead.example') and not guard.is_open('ok.example')
+
+
+def test_gateway_errors_open_after_threshold_and_probe_recovers():
+	clock = FakeClock()
+	guard = DomainGuard(failure_threshold=3, reset_timeout=60, clock=clock)
+	status = {'code': 502}
+
+	async def run():
+		async with _client(lambda request: httpx.Response(status['code']), guard) as client:
+			# 新域名首个请求 502 不直接熔断
+			for _ in range(3):
+				await client.get('https://flaky.example/')
+			breaker = guard.breaker('flaky.example')
+			assert breaker.state == OPEN
+			with pytest.raises(CircuitOpenError):
+				await client.get('https://flaky.example/')
+
+			# 冷却后放行一个探测请求，失败则熔断时间翻倍
+			clock.now += 61
+			await client.get('https://flaky.example/')
+			assert breaker.state == OPEN and breaker.open_for == 120
+
+			clock.now += 121
+			status['code'] = 200
+			await client.get('https://flaky.example/')
+			assert breaker.state == CLOSED and breaker.open_for == 60
+
+	asyncio.run(run())
+
+
+def test_trip_and_snapshot():
+	guard = DomainGuard(reset_timeout=30, clock=FakeClock())
+	guard.trip('gone.example')
+	assert guard.is_open('gone.example')
+	assert guard.snapshot() == {'gone.example': {'state': 'open', 'failures': 0, 'retry_in': 30.0}}
+
+
+def test_token_bucket():
+	clock = FakeClock()
+	bucket = TokenBucket(rate=2, burst=2, clock=clock)
+	assert bucket.try_acquire() == 0 and bucket.try_acquire() == 0
+	assert bucket.try_acquire() == pytest.approx(0.5)
+	clock.now += 0.5
+	assert bucket.try_acquire() == 0
@@ -0,0 +1,68 @@
+import asyncio
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.concurrency import ExclusiveKeyQueue, KeyedSemaphore, domain_key, root_domain
+
+
+def test_root_domain():
+	assert root_domain(domain_key('https://jp.duckcoding.com')) == 'duckcoding.com'
+	assert root_domain('localhost') == 'localhost'
+
+
+def test_keyed_semaphore_limits_each_key_independently():
+	sem = KeyedSemaphore(2)
+	running, peak = {}, {}
+
+	async def job(key):
+		async with sem.hold(key):
+			running[key] = running.get(key, 0) + 1
+			peak[key] = max(peak.get(key, 0), running[key])
+			await asyncio.sleep(0.01)
+			running[key] -= 1
+
+	async def run():
+		await asyncio.gather(*[job(domain_key(f'https://{host}/x')) for host in ['a.com', 'b.com'] * 5])
+
+	asyncio.run(run())
+	assert peak == {'a.com': 2, 'b.com': 2}
+	assert sem.get('a.com') is sem.get('a.com')
+
+
+def test_exclusive_key_queue_never_runs_same_root_concurrently():
+	sites = ['https://a.one.com', 'https://b.one.com', 'https://two.com', 'https://c.one.com', 'https://three.com']
+	running = {}
+	peak_per_root = {}
+	finished = []
+
+	async def worker(queue):
+		while (item := await queue.take()) is not None:
+			root = root_domain(domain_key(item))
+			running[root] = running.get(root, 0) + 1
+			peak_per_root[root] = max(peak_per_root.get(root, 0), running[root])
+			await asyncio.sleep(0.01)
+			running[root] -= 1
+			finished.append(item)
+			await queue.done(item)
+
+	async def run():
+		queue = ExclusiveKeyQueue(sites, key=lambda url: root_domain(domain_key(url)))
+		await asyncio.gather(*[worker(queue) for _ in range(3)])
+
+	asyncio.run(run())
+	assert sorted(finished) == sorted(sites)
+	assert peak_per_root == {'one.com': 1, 'two.com': 1, 'three.com': 1}
+
+
+def test_exclusive_key_queue_drain():
+	async def run():
+		queue = ExclusiveKeyQueue(['x', 'y', 'z'], key=lambda item: item)
+		first = await queue.take()
+		rest = queue.drain()
+		await queue.done(first)
+		return first, rest, await queue.take()
+
+	assert asyncio.run(run()) == ('x', ['y', 'z'], None)
@@ -0,0 +1,59 @@
+import asyncio
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.fake_upstream import FakeUpstream, Faults, make_client, user_id
+from utils.oauth_http import oauth_login_http
+from utils.waf_solver import extract_challenge, solve_native
+
+LINUXDO_COOKIES = [{'name': '_t', 'value': 'alice', 'domain': '.linux.do', 'path': '/'}]
+
+
+def test_oauth_redirect_chain_and_checkin():
+	async def run(upstream):
+		async with make_client(upstream) as client:
+			status = (await client.get('https://site0001.test/api/status')).json()['data']
+			assert status['linuxdo_client_id'] == upstream.client_id('site0001.test')
+			result = await oauth_login_http(client, 'https://site0001.test', status['linuxdo_client_id'], LINUXDO_COOKIES)
+			assert result['session'] == upstream.session_for('site0001.test', 'alice')
+			assert result['user_id'] == str(user_id('alice'))
+			headers = {'Cookie': f'session={result["session"]}', 'New-Api-User': result['user_id']}
+			first = (await client.post('https://site0001.test/api/user/checkin', headers=headers)).json()
+			second = (await client.post('https://site0001.test/api/user/checkin', headers=headers)).json()
+			# 没有 linux.do 登录态 → 跳转登录页
+			no_login = await oauth_login_http(client, 'https://site0001.test', status['linuxdo_client_id'], [])
+			return first, second, no_login
+
+	with FakeUpstream() as upstream:
+		first, second, no_login = asyncio.run(run(upstream))
+	assert first['success'] and second['message'] == '今日已签到'
+	assert no_login == {'fallback': 'login_required'}
+
+
+def test_fault_injection_and_waf_challenge():
+	async def run(upstream):
+		async with make_client(upstream) as client:
+			consent = await oauth_login_http(client, 'https://site0002.test', 'cid', LINUXDO_COOKIES)
+			challenge = await client.get('https://waf0001.test/api/user/self')
+			script, _ = extract_challenge(challenge.text)
+			cookies = {**dict(challenge.cookies), **solve_native(script),
+					   'session': upstream.session_for('waf0001.test', 'alice')}
+			cookie_header = '; '.join(f'{k}={v}' for k, v in cookies.items())
+			user = await client.get('https://waf0001.test/api/user/self', headers={'Cookie': cookie_header})
+			return consent, user.json()
+
+	async def run_dead(upstream):
+		async with make_client(upstream) as client:
+			return await oauth_login_http(client, 'https://site0003.test', 'cid', LINUXDO_COOKIES)
+
+	with FakeUpstream(Faults(consent_rate=1.0)) as upstream:
+		consent, user = asyncio.run(run(upstream))
+	assert consent == {'fallback': 'consent'}
+	assert user['data']['username'] == 'alice'
+
+	with FakeUpstream(Faults(dead_rate=1.0)) as upstream:
+		assert asyncio.run(run_dead(upstream)) == {'error': '站点无法连接'}
+		assert upstream.total_requests() == 0
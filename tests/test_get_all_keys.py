@@ -0,0 +1,147 @@
+import asyncio
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import get_all_keys
+
+SITES = {
+	'alpha': {'domain': 'https://alpha.example', 'name': 'Alpha'},
+	'skipped': {'domain': 'https://skip.example', 'skip': True},
+	'beta': {'domain': 'https://beta.example', 'name': 'Beta'},
+}
+INFO = {
+	'alpha': {'accounts': {'ZHnagsan': {'session': 's1', 'user_id': 1}, 'CaiWai': {'session': 's2', 'user_id': 2}}},
+	'beta': {'accounts': {'caijijiji': {}, 'ZHnagsan': {'session': 's3', 'user_id': 3}}},
+}
+
+
+def _handler(calls, active, peak):
+	rng = random.Random(7)
+
+	async def handler(request):
+		host, path = request.url.host, request.url.path
+		calls[(host, path)] += 1
+		active[host] += 1
+		peak[host] = max(peak[host], active[host])
+		await asyncio.sleep(rng.uniform(0, 0.02))
+		active[host] -= 1
+		uid = request.headers['New-Api-User']
+		if path == '/api/user/self':
+			return httpx.Response(200, json={'data': {'quota': 1_000_000 * int(uid), 'used_quota': 250_000,
+													  'request_count': 7, 'group': 'vip'}})
+		if path == '/api/token/':
+			return httpx.Response(200, json={'data': {'items': [
+				{'key': f'{host[:1]}{uid}a', 'name': 'main', 'status': 1, 'remain_quota': 500_000, 'expired_time': -1},
+				{'key': 'disabled', 'status': 2},
+				{'key': f'{host[:1]}{uid}b', 'name': 'spare', 'status': 1, 'unlimited_quota': True, 'expired_time': -1},
+			]}})
+		if path == '/api/models':
+			return httpx.Response(200, json={'data': {'default': ['gpt-4o', 'claude-3-5-sonnet', 'qwen-max']}})
+		if path == '/api/log/self/':
+			return httpx.Response(200, json={'data': {'items': [
+				{'model_name': 'gpt-4o', 'prompt_tokens': 10, 'completion_tokens': 5, 'quota': 1000},
+			]}})
+		return httpx.Response(404, json={})
+
+	return handler
+
+
+def test_concurrent_collect_keeps_report_order():
+	calls, active, peak = Counter(), Counter(), Counter()
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(_handler(calls, active, peak))) as client:
+			return await get_all_keys.collect(SITES, INFO, client=client,
+											  limiter=get_all_keys.Limiter(total=8, per_domain=2))
+
+	fetched = asyncio.run(run())
+	md, all_json = get_all_keys.build_report(SITES, INFO, fetched, '2026-01-01 00:00:00')
+
+	assert calls[('alpha.example', '/api/models')] == 1 and calls[('beta.example', '/api/models')] == 1
+	assert max(peak.values()) <= 2
+	lines = md.splitlines()
+	assert [line for line in lines if line.startswith('| Alpha') or line.startswith('| Beta')][:3] == [
+		'| Alpha | ZHnagsan | 2.00$ | 0.5000$ | 7 | vip |',
+		'| Alpha | CaiWai | 4.00$ | 0.5000$ | 7 | vip |',
+		'| Beta | ZHnagsan | 6.00$ | 0.5000$ | 7 | vip |',
+	]
+	assert '- ZHnagsan: 8.00$' in lines and '- CaiWai: 4.00$' in lines
+	assert '| Alpha | ZHnagsan | main | default | `sk-a1a` | 1.00$ | 永不过期 |' in lines
+	assert '| Alpha | ZHnagsan | spare | default | `sk-a1b` | | |' in lines
+	assert '共 6 个令牌' in md
+	assert '| Beta | 3 | claude-3-5-sonnet, gpt-4o |' in lines
+	assert [(j['site'], j['account']) for j in all_json] == [('Alpha', 'ZHnagsan'), ('Alpha', 'CaiWai'), ('Beta', 'ZHnagsan')]
+
+
+def test_unreachable_site_does_not_block_report():
+	async def handler(request):
+		if request.url.host == 'beta.example':
+			raise httpx.ConnectError('refused', request=request)
+		return httpx.Response(200, json={'data': {'quota': 500_000}})
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await get_all_keys.collect(SITES, INFO, client=client)
+
+	fetched = asyncio.run(run())
+	md, all_json = get_all_keys.build_report(SITES, INFO, fetched, 'now')
+	assert '| Alpha | ZHnagsan | 1.00$ | 0.0000$ | 0 | default |' in md
+	assert '| Beta |' not in md and all_json == []
+
+
+def _log_handler(logs, requests, one_based=False, inserts=None):
+	"""logs 按 id 降序；inserts: {请求序号: 新日志}，模拟遍历过程中产生的新日志"""
+
+	async def handler(request):
+		p, size = int(request.url.params['p']), int(request.url.params['page_size'])
+		requests.append((p, size))
+		if inserts and len(requests) in inserts:
+			logs.insert(0, inserts[len(requests)])
+		if one_based:
+			p = max(p - 1, 0)
+		return httpx.Response(200, json={'data': {'items': logs[p * size:(p + 1) * size], 'total': len(logs)}})
+
+	return handler
+
+
+def _stream(handler, high_water=None):
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await get_all_keys.stream_logs(client, get_all_keys.Limiter(), 'https://a.example', 's', 1, high_water)
+
+	return asyncio.run(run())
+
+
+def _logs(n, start=1):
+	return [{'id': i, 'type': 2, 'model_name': f'm{i % 2}', 'prompt_tokens': 1, 'completion_tokens': 2, 'quota': 10,
+			 'created_at': 1_700_000_000 + i * 3600} for i in range(start + n - 1, start - 1, -1)]
+
+
+def test_stream_logs_aggregates_every_page():
+	for one_based in (False, True):
+		requests = []
+		result = _stream(_log_handler(_logs(500), requests, one_based))
+		assert sum(row[0] for row in result['usage'].values()) == 500
+		assert sum(row[3] for row in result['usage'].values()) == 5000
+		assert result['high_water'] == 500 and [it['id'] for it in result['recent']] == [500, 499, 498, 497, 496]
+		assert max(size for _, size in requests) == get_all_keys.LOG_PAGE_MAX
+		assert len(requests) <= 9 + one_based
+
+	requests = []
+	result = _stream(_log_handler(_logs(300), requests, inserts={3: _logs(1, start=301)[0]}), high_water=None)
+	assert sum(row[0] for row in result['usage'].values()) == 300  # 遍历中插入的日志留给下次（高水位 300）
+	assert result['high_water'] == 300
+
+	requests = []
+	result = _stream(_log_handler(_logs(303), requests), high_water=300)
+	assert requests == [(0, get_all_keys.LOG_PAGE_MIN)]
+	assert sum(row[0] for row in result['usage'].values()) == 3 and result['high_water'] == 303
+
+	assert _stream(lambda request: httpx.Response(502)) is None
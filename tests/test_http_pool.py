@@ -0,0 +1,99 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.http_pool import (
+	HostLimitedTransport,
+	HttpClientPool,
+	_NullCookieJar,
+	chain_cookies,
+	cookie_header,
+	send_following,
+)
+
+
+def test_cookie_header():
+	assert cookie_header({'session': 'abc', 'acw_tc': '1', 'skip': None}) == 'session=abc; acw_tc=1'
+
+
+def test_host_limit_caps_concurrency():
+	state = {'active': 0, 'peak': 0}
+
+	async def handler(request):
+		state['active'] += 1
+		state['peak'] = max(state['peak'], state['active'])
+		await asyncio.sleep(0.01)
+		state['active'] -= 1
+		return httpx.Response(200, json={'ok': True})
+
+	async def run():
+		transport = HostLimitedTransport(httpx.MockTransport(handler), per_host=2)
+		async with httpx.AsyncClient(transport=transport) as client:
+			resps = await asyncio.gather(*[client.get('https://a.example/api/status') for _ in range(8)])
+		assert all(r.json()['ok'] for r in resps)
+
+	asyncio.run(run())
+	assert state['peak'] == 2
+
+
+def test_shared_client_does_not_persist_cookies():
+	seen = []
+
+	def handler(request):
+		seen.append(request.headers.get('cookie'))
+		return httpx.Response(200, headers={'set-cookie': 'session=leaked; Path=/'})
+
+	async def run():
+		client = httpx.AsyncClient(transport=httpx.MockTransport(handler), cookies=_NullCookieJar())
+		first = await client.get('https://a.example/', headers={'Cookie': cookie_header({'session': 'A'})})
+		await client.get('https://a.example/')
+		await client.aclose()
+		return first
+
+	first = asyncio.run(run())
+	assert first.cookies.get('session') == 'leaked'
+	assert seen == ['session=A', None]
+
+
+def test_send_following_carries_cookies_across_redirects():
+	seen = []
+
+	def handler(request):
+		seen.append((request.url.host, request.url.path, request.headers.get('cookie')))
+		if request.url.path == '/api/user/self':
+			return httpx.Response(302, headers=[('location', '/waf'), ('set-cookie', 'acw_tc=t1; Path=/')])
+		if request.url.path == '/waf':
+			return httpx.Response(302, headers=[('location', 'https://cdn.example/x'), ('set-cookie', 'session=rotated; Path=/')])
+		return httpx.Response(200, json={'ok': True})
+
+	async def run():
+		client = httpx.AsyncClient(transport=httpx.MockTransport(handler), cookies=_NullCookieJar())
+		resp = await send_following(client, 'GET', 'https://a.example/api/user/self', cookies={'session': 'A'})
+		await client.aclose()
+		return resp
+
+	resp = asyncio.run(run())
+	assert resp.json() == {'ok': True} and len(resp.history) == 2
+	assert seen == [
+		('a.example', '/api/user/self', 'session=A'),
+		('a.example', '/waf', 'session=A; acw_tc=t1'),
+		('cdn.example', '/x', None),  # 跨 host 跳转不带站点 cookie
+	]
+	assert chain_cookies(resp) == {'acw_tc': 't1', 'session': 'rotated'}
+
+
+def test_pool_reuses_named_clients():
+	async def run():
+		pool = HttpClientPool()
+		assert pool.get() is pool.get()
+		assert pool.get('local', local=True) is not pool.get()
+		await pool.aclose()
+		assert pool.get().is_closed is False
+		await pool.aclose()
+
+	asyncio.run(run())
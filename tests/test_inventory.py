@@ -0,0 +1,186 @@
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import get_all_keys
+from utils.inventory import Inventory, normalize_model, token_state
+
+NOW = 1_800_000_000
+
+
+def _token(key, **kw):
+	return {'key': key, 'name': key, 'status': 1, 'remain_quota': 500_000, 'expired_time': -1, **kw}
+
+
+def test_token_state():
+	assert token_state(_token('a'), NOW) == 'active'
+	assert token_state(_token('a', status=2), NOW) == 'disabled'
+	assert token_state(_token('a', expired_time=NOW - 1), NOW) == 'expired'
+	assert token_state(_token('a', status=4), NOW) == 'exhausted'
+	assert token_state(_token('a', remain_quota=0), NOW) == 'exhausted'
+	assert token_state(_token('a', remain_quota=0, unlimited_quota=True), NOW) == 'active'
+
+
+def test_save_records_token_events(tmp_path):
+	user = {'quota': 1, 'used_quota': 2, 'request_count': 3}
+	with Inventory(str(tmp_path / 'inv.db')) as inv:
+		run = inv.begin_run()
+		first = [_token('keep'), _token('expire'), _token('drain'), _token('gone'), _token('off', status=2)]
+		assert inv.save(run, 'alpha', 'acc', user, first, 'h1', [], now=NOW) == []
+		inv.finish_run(run, 1, 0)
+
+		run = inv.begin_run()
+		second = [_token('keep'), _token('expire', expired_time=NOW - 1), _token('drain', remain_quota=0),
+				  _token('off', status=2), _token('fresh')]
+		events = inv.save(run, 'alpha', 'acc', user, second, 'h2', [], site_name='Alpha', now=NOW)
+		inv.finish_run(run, 1, 0)
+
+		assert sorted((e['event'], e['key']) for e in events) == [
+			('exhausted', 'drain'), ('expired', 'expire'), ('new', 'fresh'), ('removed', 'gone')]
+		assert [e['key'] for e in inv.events()] == [e['key'] for e in events]
+		assert inv.events()[0]['site_name'] == 'Alpha'
+		assert [t['key'] for t in inv.tokens('alpha', 'acc')] == ['keep', 'expire', 'drain', 'off', 'fresh']
+
+
+def test_collect_reuses_unchanged_snapshot(tmp_path):
+	sites = {'alpha': {'domain': 'https://alpha.example', 'name': 'Alpha'}}
+	info = {'alpha': {'accounts': {'acc': {'session': 's1', 'user_id': 1}}}}
+	calls = Counter()
+	state = {'used': 100, 'tokens': [_token(f'k{i}') for i in range(3)]}
+
+	async def handler(request):
+		path, page = request.url.path, int(request.url.params.get('p', 0))
+		calls[path] += 1
+		if path == '/api/user/self':
+			return httpx.Response(200, json={'data': {'quota': 1000, 'used_quota': state['used'], 'request_count': 1}})
+		if path == '/api/token/':
+			size = int(request.url.params['page_size'])
+			items = state['tokens'][page * size:(page + 1) * size]
+			return httpx.Response(200, json={'data': {'items': items, 'total': len(state['tokens'])}})
+		if path == '/api/log/self/':
+			return httpx.Response(200, json={'data': {'items': [{'model_name': 'gpt-4o', 'quota': state['used']}]}})
+		return httpx.Response(200, json={'data': {'default': ['gpt-4o']}})
+
+	async def run(inv):
+		calls.clear()
+		stats = {}
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			fetched = await get_all_keys.collect(sites, info, client=client, inventory=inv, stats=stats)
+		return fetched, stats
+
+	get_all_keys.TOKEN_PAGE_SIZE, page_size = 2, get_all_keys.TOKEN_PAGE_SIZE
+	try:
+		with Inventory(str(tmp_path / 'inv.db')) as inv:
+			first, stats = asyncio.run(run(inv))
+			assert calls['/api/token/'] == 2 and stats['reused'] == 0 and stats['events'] == []
+
+			second, stats = asyncio.run(run(inv))
+			assert calls['/api/token/'] == 1 and calls['/api/log/self/'] == 0 and stats['reused'] == 1
+			assert get_all_keys.build_report(sites, info, second, 'now') == get_all_keys.build_report(sites, info, first, 'now')
+
+			state['tokens'].append(_token('k3'))
+			_, stats = asyncio.run(run(inv))
+			assert calls['/api/token/'] == 2 and calls['/api/log/self/'] == 0 and stats['reused'] == 0
+			assert [(e['event'], e['key']) for e in stats['events']] == [('new', 'k3')]
+			assert [e['key'] for e in inv.events()] == ['k3']
+	finally:
+		get_all_keys.TOKEN_PAGE_SIZE = page_size
+
+
+def test_usage_accumulates_from_high_water(tmp_path):
+	sites = {'alpha': {'domain': 'https://alpha.example', 'name': 'Alpha'}}
+	info = {'alpha': {'accounts': {'acc': {'session': 's1', 'user_id': 1}}}}
+	logs = [{'id': i, 'model_name': 'gpt-4o' if i % 3 else 'claude', 'prompt_tokens': 2, 'completion_tokens': 1,
+			 'quota': 100, 'created_at': NOW + i} for i in range(60, 0, -1)]
+	log_pages = []
+
+	async def handler(request):
+		path = request.url.path
+		if path == '/api/user/self':
+			return httpx.Response(200, json={'data': {'quota': 1000, 'used_quota': 100 * len(logs), 'request_count': len(logs)}})
+		if path == '/api/log/self/':
+			p, size = int(request.url.params['p']), int(request.url.params['page_size'])
+			log_pages.append(p)
+			return httpx.Response(200, json={'data': {'items': logs[p * size:(p + 1) * size], 'total': len(logs)}})
+		return httpx.Response(200, json={'data': {'items': []}})
+
+	async def run(inv, full=False):
+		log_pages.clear()
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			await get_all_keys.collect(sites, info, client=client, inventory=inv, full=full)
+		return inv.usage_summary()
+
+	with Inventory(str(tmp_path / 'inv.db')) as inv:
+		usage = asyncio.run(run(inv))
+		assert usage['models'] == [('gpt-4o', 40, 80, 40, 4000), ('claude', 20, 40, 20, 2000)]
+		assert usage['sites'] == [('Alpha', 60, 120, 60, 6000)]
+		assert inv.snapshot('alpha', 'acc')['log_high_water'] == 60
+
+		for i in (61, 62):
+			logs.insert(0, {'id': i, 'model_name': 'gpt-4o', 'quota': 100, 'created_at': NOW + i})
+		usage = asyncio.run(run(inv))
+		assert log_pages == [0] and usage['sites'] == [('Alpha', 62, 120, 60, 6200)]
+		assert [it['id'] for it in inv.snapshot('alpha', 'acc')['logs']] == [62, 61, 60, 59, 58]
+
+		usage = asyncio.run(run(inv))
+		assert log_pages == [] and usage['sites'][0][1] == 62
+
+		usage = asyncio.run(run(inv, full=True))
+		assert usage['sites'] == [('Alpha', 62, 120, 60, 6200)]
+
+
+def test_model_index_lookup(tmp_path):
+	assert normalize_model('anthropic/claude-3.5-sonnet-20241022') == 'claude-3-5-sonnet'
+	assert normalize_model('GPT4o') == normalize_model('gpt-4o-2024-08-06') == 'gpt-4o'
+
+	sites = {'alpha': {'domain': 'https://alpha.example', 'name': 'Alpha'},
+			 'beta': {'domain': 'https://beta.example', 'name': 'Beta'}}
+	info = {'alpha': {'accounts': {'acc': {'session': 's1', 'user_id': 1}}},
+			'beta': {'accounts': {'acc': {'session': 's2', 'user_id': 2}}}}
+	catalogs = {
+		'alpha.example': {'default': ['gpt-4o'], 'vip': ['claude-3-5-sonnet-20241022', 'gpt-4o']},
+		'beta.example': [{'id': 'claude-3.5-sonnet'}, {'id': 'deepseek-chat'}],
+	}
+	tokens = {
+		'alpha.example': [_token('a-default', group='default', remain_quota=900_000),
+						  _token('a-vip', group='vip', remain_quota=100_000), _token('a-off', group='vip', status=2)],
+		'beta.example': [_token('b-any', group='', unlimited_quota=True)],
+	}
+	calls = Counter()
+
+	async def handler(request):
+		host, path = request.url.host, request.url.path
+		calls[path] += 1
+		if path == '/api/user/self':
+			return httpx.Response(200, json={'data': {'quota': 1, 'used_quota': 0, 'request_count': 0}})
+		if path == '/api/token/':
+			return httpx.Response(200, json={'data': {'items': tokens[host], 'total': len(tokens[host])}})
+		if path == '/api/models':
+			return httpx.Response(200, json={'data': catalogs[host]})
+		return httpx.Response(200, json={'data': {'items': []}})
+
+	async def run(inv):
+		calls.clear()
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			await get_all_keys.collect(sites, info, client=client, inventory=inv)
+
+	with Inventory(str(tmp_path / 'inv.db')) as inv:
+		asyncio.run(run(inv))
+		assert calls['/api/models'] == 2
+		hits = inv.find_model('Claude-3.5-Sonnet')
+		assert [(r['site'], r['key'], r['model']) for r in hits] == [
+			('beta', 'b-any', 'claude-3.5-sonnet'), ('alpha', 'a-vip', 'claude-3-5-sonnet-20241022')]
+		assert [r['key'] for r in inv.find_model('gpt-4o')] == ['a-default', 'a-vip']
+		assert [r['model'] for r in inv.find_model('deepseek-v3')] == ['deepseek-chat']
+		assert [r['key'] for r in inv.find_model('sonnet')] == ['b-any', 'a-vip']
+		assert inv.find_model('gemini') == []
+
+		asyncio.run(run(inv))
+		assert calls['/api/models'] == 0
+		assert inv.catalog('beta') == {'*': ['claude-3.5-sonnet', 'deepseek-chat']}
@@ -0,0 +1,43 @@
+import json
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.journal import ResultJournal
+
+
+def test_append_and_compact(tmp_path):
+	journal = ResultJournal(str(tmp_path / 'results.jsonl'))
+	journal.open(truncate=True)
+	journal.append({'account': 'a', 'site': '站点1', 'checkin_ok': True})
+	journal.append({'account': 'b', 'site': '站点2', 'checkin_ok': False})
+	journal.flush(sync=True)
+
+	target = tmp_path / 'results.json'
+	assert journal.compact(str(target)) == 2
+	data = json.loads(target.read_text(encoding='utf-8'))
+	assert [e['account'] for e in data] == ['a', 'b']
+	assert data[0]['site'] == '站点1'
+	journal.close()
+
+
+def test_truncate_discards_previous_run(tmp_path):
+	path = str(tmp_path / 'results.jsonl')
+	first = ResultJournal(path)
+	first.append({'account': 'old'})
+	first.close()
+
+	second = ResultJournal(path)
+	second.open(truncate=True)
+	second.append({'account': 'new'})
+	second.flush()
+	assert [e['account'] for e in second.read()] == ['new']
+	second.close()
+
+
+def test_read_skips_partial_line(tmp_path):
+	path = tmp_path / 'results.jsonl'
+	path.write_text('{"account": "a"}\n{"account": "b', encoding='utf-8')
+	assert ResultJournal(str(path)).read() == [{'account': 'a'}]
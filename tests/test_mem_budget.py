@@ -0,0 +1,62 @@
+import asyncio
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.mem_budget import MemoryBudget, chrome_rss_mb, read_meminfo
+
+
+def _fake_proc(tmp_path, processes):
+	for pid, (comm, rss_kb) in processes.items():
+		d = tmp_path / str(pid)
+		d.mkdir()
+		(d / 'comm').write_text(comm + '\n')
+		(d / 'status').write_text(f'Name:\t{comm}\nVmRSS:\t{rss_kb} kB\n')
+	(tmp_path / 'self').mkdir()
+	return str(tmp_path)
+
+
+def test_read_meminfo(tmp_path):
+	path = tmp_path / 'meminfo'
+	path.write_text('MemTotal:       4000000 kB\nMemAvailable:   1024000 kB\nHugePages_Total:       0\n')
+	info = read_meminfo(str(path))
+	assert info['MemAvailable'] == 1024000
+	assert info['HugePages_Total'] == 0
+
+
+def test_chrome_rss_sums_only_chrome(tmp_path):
+	root = _fake_proc(tmp_path, {10: ('chrome', 204800), 11: ('chromium-browse', 102400), 12: ('python3', 999999)})
+	assert chrome_rss_mb(root) == 300
+
+
+def test_capacity_follows_available_memory():
+	sample = {'available': 2000.0, 'chrome': 0.0}
+	budget = MemoryBudget(max_workers=5, per_worker_mb=400, reserve_mb=400,
+						  sampler=lambda: (sample['available'], sample['chrome']))
+	assert budget.capacity() == 4
+	sample['available'] = 300.0
+	assert budget.capacity() == 1
+	assert MemoryBudget(max_workers=5, fixed=1).capacity() == 1
+	assert MemoryBudget(max_workers=3, sampler=lambda: None).capacity() == 3
+
+
+def test_slot_queues_when_memory_is_short():
+	sample = {'available': 1200.0}
+
+	async def run():
+		budget = MemoryBudget(max_workers=4, per_worker_mb=400, reserve_mb=400,
+							  sampler=lambda: (sample['available'], 0.0))
+
+		async def job():
+			async with budget.slot(poll_interval=0.01):
+				# 每个 worker 启动后吃掉 400MB
+				sample['available'] -= 400
+				await asyncio.sleep(0.02)
+				sample['available'] += 400
+
+		await asyncio.gather(*[job() for _ in range(6)])
+		return budget.peak
+
+	assert asyncio.run(run()) == 2
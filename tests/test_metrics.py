@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.metrics import Registry
+
+
+def test_render_counter_and_gauge():
+	reg = Registry(prefix='checkin_')
+	results = reg.counter('results_total', '签到结果数', ('method', 'outcome'))
+	ratio = reg.gauge('hit_ratio', '命中率')
+	results.inc(method='httpx', outcome='success')
+	results.inc(2, method='browser', outcome='failed')
+	results.inc(method='httpx', outcome='success')
+	ratio.set(0.75)
+	assert results.get(method='httpx', outcome='success') == 2
+	assert reg.render().splitlines() == [
+		'# HELP checkin_results_total 签到结果数',
+		'# TYPE checkin_results_total counter',
+		'checkin_results_total{method="browser",outcome="failed"} 2',
+		'checkin_results_total{method="httpx",outcome="success"} 2',
+		'# HELP checkin_hit_ratio 命中率',
+		'# TYPE checkin_hit_ratio gauge',
+		'checkin_hit_ratio 0.75',
+	]
+
+
+def test_histogram_buckets_and_timer():
+	reg = Registry()
+	hist = reg.histogram('oauth_seconds', 'OAuth 耗时', ('outcome',), buckets=(1, 5))
+	hist.observe(0.5, outcome='ok')
+	hist.observe(3, outcome='ok')
+	hist.observe(7, outcome='ok')
+	with hist.time(outcome='error') as labels:
+		labels['outcome'] = 'fail'
+	assert hist.count(outcome='fail') == 1 and hist.count(outcome='error') == 0
+	lines = reg.render().splitlines()
+	assert 'oauth_seconds_bucket{outcome="ok",le="1"} 1' in lines
+	assert 'oauth_seconds_bucket{outcome="ok",le="5"} 2' in lines
+	assert 'oauth_seconds_bucket{outcome="ok",le="+Inf"} 3' in lines
+	assert 'oauth_seconds_sum{outcome="ok"} 10.5' in lines
+	assert 'oauth_seconds_count{outcome="ok"} 3' in lines
+
+
+def test_label_validation_and_escaping():
+	reg = Registry()
+	counter = reg.counter('errors_total', '错误', ('reason',))
+	with pytest.raises(ValueError):
+		counter.inc(site='x')
+	with pytest.raises(ValueError):
+		reg.counter('errors_total', '重复')
+	counter.inc(reason='say "hi"\n')
+	assert 'errors_total{reason="say \\"hi\\"\\n"} 1' in reg.render()
+
+
+def test_write_textfile(tmp_path):
+	reg = Registry()
+	reg.gauge('up', '在线').set(1)
+	path = tmp_path / 'collector' / 'checkin.prom'
+	reg.write_textfile(str(path))
+	assert path.read_text() == '# HELP up 在线\n# TYPE up gauge\nup 1\n'
+	assert [p.name for p in path.parent.iterdir()] == ['checkin.prom']
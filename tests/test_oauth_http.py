@@ -0,0 +1,73 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.http_pool import _NullCookieJar
+from utils.oauth_http import oauth_login_http, parse_callback_data
+
+LINUXDO_COOKIES = [
+	{'name': '_t', 'value': 'login-token', 'domain': 'linux.do', 'path': '/'},
+	{'name': 'auth.session-token', 'value': 'connect', 'domain': 'connect.linux.do', 'path': '/'},
+]
+
+
+def _handler(callback_data='access-token-12345', consent=False, cf=False):
+	seen = []
+
+	def handler(request):
+		url = request.url
+		seen.append((url.host, url.path, request.headers.get('cookie')))
+		if url.host == 'site.example' and url.path == '/api/oauth/state':
+			return httpx.Response(200, json={'success': True, 'data': 'st4te'},
+								  headers={'set-cookie': 'session=state-only; Path=/'})
+		if url.host == 'connect.linux.do' and url.path == '/oauth2/authorize':
+			if cf:
+				return httpx.Response(403, headers={'content-type': 'text/html', 'cf-mitigated': 'challenge'},
+									  text='<title>Just a moment...</title>')
+			if consent:
+				return httpx.Response(200, headers={'content-type': 'text/html'}, text='<button>允许</button>')
+			return httpx.Response(302, headers={
+				'location': f'https://site.example/api/oauth/linuxdo?code=c0de&state={url.params["state"]}'})
+		if url.host == 'site.example' and url.path == '/api/oauth/linuxdo':
+			return httpx.Response(200, json={'success': True, 'data': callback_data},
+								  headers={'set-cookie': 'session=fresh-session; Path=/'})
+		return httpx.Response(404)
+
+	return handler, seen
+
+
+def _run(handler):
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler), cookies=_NullCookieJar()) as client:
+			return await oauth_login_http(client, 'https://site.example', 'cid', LINUXDO_COOKIES)
+
+	return asyncio.run(run())
+
+
+def test_redirect_chain_returns_new_session_and_token():
+	handler, seen = _handler()
+	result = _run(handler)
+	assert result == {'session': 'fresh-session', 'access_token': 'access-token-12345', 'user_id': None}
+	# connect.linux.do 只收到自己的 cookie；回调带着 state session
+	assert seen[1] == ('connect.linux.do', '/oauth2/authorize', 'auth.session-token=connect')
+	assert seen[2] == ('site.example', '/api/oauth/linuxdo', 'session=state-only')
+
+
+def test_callback_user_object_gives_user_id():
+	handler, _ = _handler(callback_data={'id': 42, 'username': 'alice'})
+	assert _run(handler)['user_id'] == '42'
+
+
+def test_consent_and_cf_fall_back_to_browser():
+	assert _run(_handler(consent=True)[0]) == {'fallback': 'consent'}
+	assert _run(_handler(cf=True)[0]) == {'fallback': 'linuxdo_cf'}
+
+
+def test_parse_callback_data():
+	assert parse_callback_data('short') == (None, None)
+	assert parse_callback_data({'username': 'x'}) == (None, None)
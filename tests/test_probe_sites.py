@@ -0,0 +1,84 @@
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import probe_sites
+
+STATUS = {'success': True, 'data': {'system_name': 'New API', 'version': 'v0.6', 'linuxdo_oauth': True,
+									'linuxdo_client_id': 'cid', 'turnstile_check': False, 'notice': 'x' * 2000}}
+
+
+def _probe(handler, sites):
+	async def run():
+		transport = probe_sites.HostLimitedTransport(httpx.MockTransport(handler), probe_sites.PER_HOST)
+		async with httpx.AsyncClient(transport=transport, follow_redirects=True) as client:
+			sem = asyncio.Semaphore(probe_sites.MAX_CONCURRENT)
+			return await asyncio.gather(*[probe_sites.probe_site(client, site, sem) for site in sites])
+
+	return asyncio.run(run())
+
+
+def test_status_fetched_once_and_dead_sites_short_circuit():
+	calls = Counter()
+
+	async def handler(request):
+		host, path = request.url.host, request.url.path
+		calls[(host, path)] += 1
+		if host == 'dead.example':
+			raise httpx.ConnectError('refused', request=request)
+		if host == 'cf.example':
+			return httpx.Response(522, text='origin timeout')
+		if path == '/api/status':
+			return httpx.Response(200, json=STATUS)
+		if path == '/api/user/checkin':
+			return httpx.Response(401, json={'success': False})
+		return httpx.Response(200, headers={'content-type': 'text/html'},
+							  text='<html><title>New API</title></html>' + ' ' * 100_000)
+
+	sites = [{'key': k, 'name': k, 'domain': f'https://{k}.example'} for k in ('ok', 'dead', 'cf')]
+	ok, dead, cf = _probe(handler, sites)
+
+	assert [(h, p) for (h, p), n in calls.items() if n != 1] == []
+	assert sum(1 for h, _ in calls if h == 'ok.example') == 4
+	assert ok['alive'] and ok['is_newapi'] and ok['linuxdo_client_id'] == 'cid' and ok['checkin_enabled'] is True
+	assert [pr['label'] for pr in ok['path_results']] == [label for _, label in probe_sites.PROBE_PATHS]
+	assert ok['path_results'][0]['body_preview'] == 'title="New API"'
+
+	assert sum(1 for h, _ in calls if h == 'dead.example') == 1
+	assert not dead['alive'] and dead['error'].startswith('连接失败') and len(dead['path_results']) == 1
+	assert sum(1 for h, _ in calls if h == 'cf.example') == 1
+	assert not cf['alive'] and cf['error'] == 'HTTP 522'
+	assert probe_sites.classify_site(ok, set()) == 'pending' and probe_sites.classify_site(dead, set()) == 'dead'
+
+
+def test_read_timeout_does_not_skip_other_paths():
+	calls = Counter()
+
+	async def handler(request):
+		calls[request.url.path] += 1
+		if request.url.path == '/api/status':
+			raise httpx.ReadTimeout('slow', request=request)
+		return httpx.Response(200, text='ok')
+
+	(result,) = _probe(handler, [{'key': 'slow', 'name': 'slow', 'domain': 'https://slow.example'}])
+	assert sum(calls.values()) == 4 and result['alive'] and not result['is_newapi']
+	assert result['path_results'][1]['error'] == f'读取超时({probe_sites.READ_TIMEOUT}s)'
+
+
+def test_path_deadline_is_reported_separately(monkeypatch):
+	monkeypatch.setattr(probe_sites, 'PATH_DEADLINE', 0.05)
+
+	async def handler(request):
+		await asyncio.sleep(0.2)
+		return httpx.Response(200, text='late')
+
+	(result,) = _probe(handler, [{'key': 'drip', 'name': 'drip', 'domain': 'https://drip.example'}])
+	status = result['path_results'][1]
+	assert status['error'] == '总超时(0.05s)' and status['error_type'] == 'PathDeadline'
+	assert not probe_sites.is_unreachable(status) and len(result['path_results']) == 4
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.scheduler import DailySchedule, parse_times, site_offset
+from utils.status_server import StatusServer
+
+KEYS = [f'site{i}' for i in range(20)]
+
+
+def test_parse_times():
+	assert parse_times('20:30, 8:00,08:00') == [(8, 0), (20, 30)]
+	with pytest.raises(ValueError):
+		parse_times('25:00')
+	with pytest.raises(ValueError):
+		parse_times(' , ')
+
+
+def test_site_offsets_are_stable_and_within_jitter():
+	slot = datetime(2026, 3, 10, 8, 0)
+	offsets = [site_offset(k, slot, 1800) for k in KEYS]
+	assert all(0 <= o < 1800 for o in offsets)
+	assert len(set(offsets)) == len(KEYS)
+	assert offsets == [site_offset(k, slot, 1800) for k in KEYS]
+	assert site_offset('site0', slot + timedelta(days=1), 1800) != offsets[0]
+	assert site_offset('site0', slot, 0) == 0
+
+
+def test_cursor_walk_fires_each_site_once_per_slot():
+	schedule = DailySchedule([(8, 0), (20, 0)], jitter=1800)
+	cursor = datetime(2026, 3, 10, 0, 0)
+	fired = []
+	# 每 5 分钟推进一次游标，跨两天
+	for step in range(1, 2 * 24 * 12 + 1):
+		now = datetime(2026, 3, 10) + timedelta(minutes=5 * step)
+		fired += schedule.fire_times(KEYS, cursor, now)
+		cursor = now
+	assert len(fired) == len(KEYS) * 4
+	for fire_at, _ in fired:
+		assert fire_at.hour in (8, 20) and fire_at.minute < 30
+
+
+def test_next_fire():
+	schedule = DailySchedule([(8, 0)], jitter=0)
+	assert schedule.next_fire(KEYS, datetime(2026, 3, 10, 9, 0)) == datetime(2026, 3, 11, 8, 0)
+	assert schedule.next_fire([], datetime(2026, 3, 10, 9, 0)) is None
+
+
+def test_status_server_routes():
+	async def fetch(port, method, path, host='localhost', token=None):
+		reader, writer = await asyncio.open_connection('127.0.0.1', port)
+		auth = f'Authorization: Bearer {token}\r\n' if token else ''
+		writer.write(f'{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\n{auth}\r\n'.encode())
+		await writer.drain()
+		data = await reader.read()
+		writer.close()
+		head, _, body = data.partition(b'\r\n\r\n')
+		return int(head.split()[1]), body
+
+	async def run():
+		calls = []
+		server = StatusServer({
+			('GET', '/status'): lambda: {'state': 'idle'},
+			('POST', '/run'): lambda: calls.append(1) or (202, 'application/json', '{"queued": true}'),
+		}, token='s3cret')
+		port = await server.start()
+		try:
+			status = await fetch(port, 'GET', '/status?x=1')
+			queued = await fetch(port, 'POST', '/run', token='s3cret')
+			wrong_method = await fetch(port, 'GET', '/run')
+			missing = await fetch(port, 'GET', '/nope')
+			# 无 token / 错误 token / DNS rebinding（Host 为外部域名）都被拒绝
+			denied = [
+				(await fetch(port, 'POST', '/run'))[0],
+				(await fetch(port, 'POST', '/run', token='guess'))[0],
+				(await fetch(port, 'POST', '/run', host='evil.example', token='s3cret'))[0],
+				(await fetch(port, 'GET', '/status', host='evil.example'))[0],
+			]
+		finally:
+			await server.close()
+		return status, queued, wrong_method, missing, denied, calls
+
+	status, queued, wrong_method, missing, denied, calls = asyncio.run(run())
+	assert status == (200, b'{"state": "idle"}')
+	assert json.loads(queued[1]) == {'queued': True} and queued[0] == 202 and calls == [1]
+	assert wrong_method[0] == 405
+	assert missing[0] == 404
+	assert denied == [401, 401, 403, 403]
+
+
+def test_status_server_rejects_post_without_configured_token():
+	server = StatusServer({('POST', '/run'): lambda: {'queued': True}})
+	assert server._dispatch('POST', '/run', {'host': '127.0.0.1:8765'})[0] == 401
+	assert server._dispatch('POST', '/run', {'host': '[::1]:8765', 'authorization': 'Bearer '})[0] == 401
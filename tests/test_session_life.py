@@ -0,0 +1,66 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.session_life import add_sample, estimate_lifetime, refresh_reason, session_age, sessions_due
+
+TODAY = date(2026, 3, 10)
+
+
+def test_session_age():
+	assert session_age({'session_updated': '2026-03-03'}, TODAY) == 7
+	assert session_age({'session_updated': '2026-03-11'}, TODAY) == 0
+	assert session_age({}, TODAY) is None
+	assert session_age({'session_updated': 'bogus'}, TODAY) is None
+
+
+def test_samples_are_capped_and_estimate_is_conservative():
+	samples = None
+	for age in range(30):
+		samples = add_sample(samples, age, max_samples=5)
+	assert samples == [25, 26, 27, 28, 29]
+	assert estimate_lifetime([7]) is None
+	assert estimate_lifetime([7, 8]) == 7
+	assert estimate_lifetime([30, 7, 8, 7, 9]) == 7
+
+
+def test_refresh_reason():
+	site = {'session_lifetimes': [7, 7, 8]}
+	assert refresh_reason(site, {'session': 's', 'session_updated': '2026-03-04'}, TODAY) is not None  # 6 天
+	assert refresh_reason(site, {'session': 's', 'session_updated': '2026-03-05'}, TODAY) is None  # 5 天
+	assert refresh_reason(site, {}, TODAY) == 'session 缺失'
+	# 没有寿命样本的站点不主动续期
+	assert refresh_reason({}, {'session': 's', 'session_updated': '2020-01-01'}, TODAY) is None
+
+
+def test_sessions_due_skips_unusable_sites():
+	acc = {'alice': {'session': 's', 'session_updated': '2026-03-01'}}
+	sites = [
+		('a', {'client_id': 'x', 'session_lifetimes': [5, 5], 'accounts': acc}),
+		('b', {'client_id': 'x', 'session_lifetimes': [30, 30], 'accounts': acc}),
+		('c', {'client_id': '', 'session_lifetimes': [5, 5], 'accounts': acc}),
+		('d', {'client_id': 'x', 'alive': False, 'accounts': {}}),
+		('e', {'client_id': 'x', 'accounts': {}}),
+	]
+	assert [k for k, _, _ in sessions_due(sites, 'alice', TODAY)] == ['a', 'e']
+
+
+def test_same_day_expiry_samples_do_not_force_daily_refresh():
+	samples = None
+	for _ in range(3):
+		samples = add_sample(samples, 0)
+	assert samples == []
+	# 旧数据里已存的 0 天样本也不采信
+	site = {'session_lifetimes': [0, 0, 0, 7]}
+	assert estimate_lifetime(site['session_lifetimes']) is None
+	for day in range(10, 20):
+		fresh = {'session': 's', 'session_updated': f'2026-03-{day - 1:02d}'}
+		assert refresh_reason(site, fresh, date(2026, 3, day)) is None
+	# 极短寿命估计至少为 margin + 1：前一天刚续期的 session 不会再被判定到期
+	assert estimate_lifetime([1, 1, 1]) == 2
+	short = {'session_lifetimes': [1, 1, 1]}
+	assert refresh_reason(short, {'session': 's', 'session_updated': '2026-03-10'}, TODAY) is None
+	assert refresh_reason(short, {'session': 's', 'session_updated': '2026-03-09'}, TODAY) is not None
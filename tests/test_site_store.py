@@ -0,0 +1,76 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.site_store import SiteInfoStore
+
+
+def make_store(tmp_path, debounce=0.05):
+	path = tmp_path / 'site_info.json'
+	path.write_text(
+		json.dumps(
+			{
+				'_meta': {'last_run': None, 'checkin_date': '2026-01-01'},
+				'a': {'domain': 'https://a', 'accounts': {'u1': {'checkin_status': 'pending'}, 'u2': {'checkin_status': 'success'}}},
+				'b': {'domain': 'https://b', 'skip': True},
+				'c': {'domain': 'https://c', 'accounts': {'u1': {'checkin_status': 'failed', '_excluded': True}}},
+			}
+		),
+		encoding='utf-8',
+	)
+	store = SiteInfoStore(str(path), accounts_count=2, debounce=debounce)
+	store.load()
+	return store, path
+
+
+def test_summary_on_load(tmp_path):
+	store, _ = make_store(tmp_path)
+	summary = store.info['_meta']['summary']
+	assert summary['active_sites'] == 2
+	assert summary['skipped_sites'] == 1
+	assert summary['total_tasks'] == 2
+	assert summary['success'] == 1
+	assert summary['pending'] == 1
+
+
+def test_incremental_transition_matches_rebuild(tmp_path):
+	store, _ = make_store(tmp_path)
+	store.info['a']['accounts']['u1']['checkin_status'] = 'failed'
+	store.transition('a', 'u1', 'pending', 'failed')
+	store.info['a']['accounts']['u3'] = {'checkin_status': 'already_checked'}
+	store.transition('a', 'u3', None, 'already_checked')
+	# 被排除账号不计数
+	store.transition('c', 'u1', 'failed', 'success')
+	incremental = dict(store.info['_meta']['summary'])
+
+	store.rebuild_summary()
+	assert store.info['_meta']['summary'] == incremental
+	assert incremental['done'] == 3
+
+
+def test_debounced_flush_coalesces_writes(tmp_path):
+	store, path = make_store(tmp_path)
+
+	async def run():
+		for _ in range(20):
+			store.info['a']['note'] = 'x'
+			store.mark_dirty('a')
+		assert store.flush_count == 0
+		await asyncio.sleep(0.15)
+
+	asyncio.run(run())
+	assert store.flush_count == 1
+	assert json.loads(path.read_text(encoding='utf-8'))['a']['note'] == 'x'
+	assert not list(tmp_path.glob('.site_info_*'))
+
+
+def test_flush_without_changes_is_noop(tmp_path):
+	store, _ = make_store(tmp_path)
+	store.flush()
+	assert store.flush_count == 0
+	store.flush(force=True)
+	assert store.flush_count == 1
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.tracing import Tracer, traced, tracer
+
+
+def test_attributes_inherit_into_child_tasks():
+	t = Tracer()
+
+	async def checkin(site):
+		with t.span('checkin', cat='httpx', site=site) as span:
+			await asyncio.sleep(0.001)
+			span.set(outcome='success')
+
+	async def run():
+		with t.span('account', phase='browser', account='alice', note='not inherited'):
+			await asyncio.gather(checkin('a'), checkin('b'))
+
+	asyncio.run(run())
+	children = [e for e in t.events if e['name'] == 'checkin']
+	assert {e['args']['site'] for e in children} == {'a', 'b'}
+	assert all(e['args']['account'] == 'alice' and e['args']['phase'] == 'browser' for e in children)
+	assert all('note' not in e['args'] and e['args']['outcome'] == 'success' for e in children)
+	# gather 子任务各占一条泳道
+	assert len({e['tid'] for e in children}) == 2
+	parent = next(e for e in t.events if e['name'] == 'account')
+	assert all(parent['ts'] <= e['ts'] and e['ts'] + e['dur'] <= parent['ts'] + parent['dur'] for e in children)
+
+
+def test_error_is_recorded_and_reraised():
+	t = Tracer()
+	with pytest.raises(ValueError):
+		with t.span('boom'):
+			raise ValueError('x')
+	assert t.events[0]['args'] == {'error': 'ValueError'}
+
+
+def test_traced_decorator_binds_arguments_and_outcome():
+	@traced('oauth', cat='browser', outcome=lambda r: 'ok' if r else 'fail',
+			bind=lambda label, site: {'account': label, 'site': site})
+	async def oauth(label, site):
+		return site == 'good'
+
+	tracer.reset()
+	asyncio.run(oauth('bob', 'good'))
+	asyncio.run(oauth('bob', 'bad'))
+	args = [e['args'] for e in tracer.events]
+	tracer.reset()
+	assert args == [{'account': 'bob', 'site': 'good', 'outcome': 'ok'},
+					{'account': 'bob', 'site': 'bad', 'outcome': 'fail'}]
+
+
+def test_export_chrome_trace(tmp_path):
+	t = Tracer()
+	assert t.export(str(tmp_path / 'empty.json')) == 0
+	assert not (tmp_path / 'empty.json').exists()
+
+	async def run():
+		with t.span('login', account='carol'):
+			t.instant('circuit_open', host='x.example')
+
+	asyncio.run(run())
+	path = tmp_path / 'trace.json'
+	assert t.export(str(path)) == 2
+	data = json.loads(path.read_text())
+	phases = [e['ph'] for e in data['traceEvents']]
+	assert phases.count('M') == 2 and 'X' in phases and 'i' in phases
+	lane_name = next(e for e in data['traceEvents'] if e['name'] == 'thread_name')
+	assert lane_name['args']['name'].startswith('carol')
+
+	disabled = Tracer(enabled=False)
+	with disabled.span('x'):
+		pass
+	assert disabled.events == []
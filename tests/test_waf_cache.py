@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.waf_cache import WafCookieCache, cookie_expiries
+from utils.waf_solver import extract_challenge
+
+
+def test_cookies_persist_and_expire(tmp_path):
+	path = tmp_path / 'waf_cookies.json'
+	cache = WafCookieCache(str(path))
+	cache.put('anyrouter.top', {'acw_tc': 'tc', 'acw_sc__v2': 'sc'}, expires={'acw_tc': 1100}, now=1000)
+
+	reloaded = WafCookieCache(str(path))
+	assert reloaded.get('anyrouter.top', now=1050) == {'acw_tc': 'tc', 'acw_sc__v2': 'sc'}
+	# acw_tc 过期后整组失效
+	assert reloaded.get('anyrouter.top', now=1200) is None
+	assert reloaded.get('other.example', now=1050) is None
+
+
+def test_invalidate_keeps_arg1_solutions(tmp_path):
+	cache = WafCookieCache(str(tmp_path / 'waf_cookies.json'))
+	cache.put('anyrouter.top', {'acw_sc__v2': 'sc'}, arg1='ABC', solved={'acw_sc__v2': 'sc'}, now=1000)
+	cache.invalidate('anyrouter.top')
+	assert cache.get('anyrouter.top', now=1000) is None
+	assert cache.solution('anyrouter.top', 'ABC') == {'acw_sc__v2': 'sc'}
+	assert cache.solution('anyrouter.top', 'DEF') is None
+
+
+def test_cookie_expiries_from_set_cookie():
+	resp = httpx.Response(200, headers=[('set-cookie', 'acw_tc=1; Max-Age=1800; Path=/'), ('set-cookie', 'cdn_sec_tc=2; Path=/')],
+						  request=httpx.Request('GET', 'https://anyrouter.top/'))
+	expires = cookie_expiries(resp)
+	assert set(expires) == {'acw_tc'}
+
+
+def test_extract_challenge():
+	html = "<html><script>var arg1='3E40CCD24BD01F5D0B3A2FA3D1E6CA6DD4F5F6A1';</script></html>"
+	script, arg1 = extract_challenge(html)
+	assert arg1 == '3E40CCD24BD01F5D0B3A2FA3D1E6CA6DD4F5F6A1'
+	assert script.startswith('var arg1')
+	assert extract_challenge('{"success": true}') is None
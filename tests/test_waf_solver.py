@@ -0,0 +1,125 @@
+import asyncio
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.waf_solver import WafSolverPool, solve_acw_sc_v2, solve_native
+
+SOLVE_WAF_JS = str(project_root / 'solve_waf.js')
+SIMPLE_CHALLENGE = "var arg1='ABCDEF'; document.cookie='acw_sc__v2=' + arg1.toLowerCase() + '; expires=x'; document.location.reload();"
+
+# 标准 acw_sc__v2 挑战的未混淆等价实现，用于对比 Node 与 Python 结果
+STANDARD_CHALLENGE = """
+var arg1='%s';
+var posList=[0xf,0x23,0x1d,0x18,0x21,0x10,0x1,0x26,0xa,0x9,0x13,0x1f,0x28,0x1b,0x16,0x17,0x19,0xd,0x6,0xb,
+	0x27,0x12,0x14,0x8,0xe,0x15,0x20,0x1a,0x2,0x1e,0x7,0x4,0x11,0x5,0x3,0x1c,0x22,0x25,0xc,0x24];
+var mask='3000176000856006061501533003690027800375';
+var out=[];
+for (var i=0;i<arg1.length;i++) { for (var j=0;j<posList.length;j++) { if (posList[j]==i+1) { out[j]=arg1[i]; } } }
+var s=out.join(''), r='';
+for (var k=0;k<s.length&&k<mask.length;k+=2) {
+	var x=(parseInt(s.slice(k,k+2),16)^parseInt(mask.slice(k,k+2),16)).toString(16);
+	if (x.length==1) { x='0'+x; }
+	r+=x;
+}
+document.cookie='acw_sc__v2='+r+'; expires=Thu, 01 Jan 2099 00:00:00 GMT; path=/';
+document.location.reload();
+"""
+ARG1_SAMPLES = ['3E40CCD24BD01F5D0B3A2FA3D1E6CA6DD4F5F6A1', '0123456789ABCDEF0123456789ABCDEF01234567', 'F' * 40]
+
+needs_node = pytest.mark.skipif(shutil.which('node') is None, reason='未安装 Node.js')
+
+
+@pytest.fixture
+def pool():
+	p = WafSolverPool(SOLVE_WAF_JS, size=2, job_timeout=3.0)
+	yield p
+	p.close()
+
+
+@needs_node
+def test_solve_reuses_worker(pool):
+	assert pool.solve(SIMPLE_CHALLENGE) == {'acw_sc__v2': 'abcdef'}
+	pid = pool._workers[0].proc.pid
+	assert pool.solve(SIMPLE_CHALLENGE) == {'acw_sc__v2': 'abcdef'}
+	assert pool._workers[0].proc.pid == pid
+
+
+@needs_node
+def test_anti_debug_loop_does_not_wedge_worker(pool):
+	assert pool.solve('while (true) {}') is None
+	assert pool.solve(SIMPLE_CHALLENGE) == {'acw_sc__v2': 'abcdef'}
+
+
+@needs_node
+def test_dead_worker_is_restarted(pool):
+	pool.solve(SIMPLE_CHALLENGE)
+	pool._workers[0].proc.kill()
+	pool._workers[0].proc.wait()
+	assert pool.solve(SIMPLE_CHALLENGE) == {'acw_sc__v2': 'abcdef'}
+
+
+@needs_node
+def test_solve_async(pool):
+	async def run():
+		return await asyncio.gather(*[pool.solve_async(SIMPLE_CHALLENGE) for _ in range(4)])
+
+	assert asyncio.run(run()) == [{'acw_sc__v2': 'abcdef'}] * 4
+	assert len(pool._workers) <= 2
+
+
+def test_missing_node_returns_none():
+	pool = WafSolverPool(SOLVE_WAF_JS, node=None)
+	pool.node = None
+	assert pool.solve(SIMPLE_CHALLENGE) is None
+
+
+def test_native_solver_recognizes_standard_challenge():
+	arg1 = ARG1_SAMPLES[0]
+	assert solve_native(STANDARD_CHALLENGE % arg1) == {'acw_sc__v2': solve_acw_sc_v2(arg1)}
+	assert len(solve_acw_sc_v2(arg1)) == 40
+	# 非标准 arg1 交给 Node
+	assert solve_native(SIMPLE_CHALLENGE) is None
+
+
+def test_native_path_works_without_node():
+	pool = WafSolverPool(SOLVE_WAF_JS)
+	pool.node = None
+	arg1 = ARG1_SAMPLES[1]
+	assert pool.solve(STANDARD_CHALLENGE % arg1) == {'acw_sc__v2': solve_acw_sc_v2(arg1)}
+	assert pool.native_hits == 1
+
+
+@needs_node
+@pytest.mark.parametrize('arg1', ARG1_SAMPLES)
+def test_native_matches_node(pool, arg1):
+	node_result = pool.solve(STANDARD_CHALLENGE % arg1, use_native=False)
+	assert node_result == {'acw_sc__v2': solve_acw_sc_v2(arg1)}
+
+
+def test_acquire_times_out_and_close_wakes_waiters():
+	pool = WafSolverPool(SOLVE_WAF_JS, size=1, job_timeout=0.2, node='node')
+	busy = pool._acquire()
+	start = time.monotonic()
+	assert pool._acquire() is None and time.monotonic() - start >= 0.2
+
+	pool.job_timeout = 10
+	result = []
+	waiter = threading.Thread(target=lambda: result.append(pool._acquire()))
+	waiter.start()
+	time.sleep(0.1)
+	start = time.monotonic()
+	pool.close()
+	waiter.join(2)
+	assert result == [None] and time.monotonic() - start < 1
+	# 关闭前借出的 worker 归还后被丢弃，池可继续使用
+	pool._release(busy)
+	assert pool._idle.empty() and pool._acquire() not in (None, busy)
+	pool.close()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+原子写文件：同目录临时文件 + fsync + os.replace，进程中断不会留下半截文件
+
+- mkstemp 创建的临时文件权限为 0600，替换前显式 chmod：
+  目标已存在时沿用其原权限（site_info.json 等保持 0644），否则使用 mode
+- keep_mode=False 时总是使用 mode（登录态等敏感文件强制 0600）
+"""
+
+import os
+import tempfile
+
+
+def atomic_write(path: str, data: str | bytes, mode: int = 0o644, fsync: bool = True, keep_mode: bool = True):
+	"""把 data 原子写入 path（str 按 UTF-8 编码），目录不存在时自动创建"""
+	directory = os.path.dirname(os.path.abspath(path))
+	os.makedirs(directory, exist_ok=True)
+	if keep_mode:
+		try:
+			mode = os.stat(path).st_mode & 0o7777
+		except FileNotFoundError:
+			pass
+	base = os.path.basename(path)
+	fd, tmp_path = tempfile.mkstemp(prefix=f'.{base}.', suffix='.tmp', dir=directory)
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			f.write(data.encode('utf-8') if isinstance(data, str) else data)
+			if fsync:
+				f.flush()
+				os.fsync(f.fileno())
+		os.chmod(tmp_path, mode)
+		os.replace(tmp_path, path)
+	except BaseException:
+		try:
+			os.unlink(tmp_path)
+		except OSError:
+			pass
+		raise
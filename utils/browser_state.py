@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+LinuxDO 登录态持久化（Playwright storage state）
+
+- 每个账号一个 browser_state/<label>.json，只保存 linux.do / connect.linux.do 的 cookie 和 localStorage
+- 启动时注入 context，再用 ctx.request 请求 /session/current.json 廉价校验
+- 校验失败才走完整登录（CF + CSRF + /session），登录成功后重新保存
+"""
+
+import json
+import os
+import time
+
+from utils.atomic import atomic_write
+from utils.tracing import tracer
+
+BROWSER_STATE_DIR = 'browser_state'
+LINUXDO_DOMAIN = 'linux.do'
+SESSION_CHECK_URL = 'https://linux.do/session/current.json'
+
+
+def state_path(label: str, directory: str = BROWSER_STATE_DIR) -> str:
+	return os.path.join(directory, f'{label}.json')
+
+
+def _is_linuxdo(host: str) -> bool:
+	host = host.lstrip('.')
+	return host == LINUXDO_DOMAIN or host.endswith(f'.{LINUXDO_DOMAIN}')
+
+
+def filter_state(state: dict, now: float | None = None) -> dict:
+	"""只保留 linux.do 相关且未过期的 cookie / localStorage"""
+	now = now or time.time()
+	cookies = [
+		c for c in state.get('cookies', [])
+		if _is_linuxdo(c.get('domain', '')) and (c.get('expires', -1) in (-1, None) or c['expires'] > now)
+	]
+	origins = [o for o in state.get('origins', []) if _is_linuxdo(o.get('origin', '').split('://')[-1])]
+	return {'cookies': cookies, 'origins': origins}
+
+
+def load_state(path: str) -> dict | None:
+	"""读取已保存的登录态，文件不存在/损坏/无有效 cookie 时返回 None"""
+	try:
+		with open(path, 'r', encoding='utf-8') as f:
+			state = filter_state(json.load(f))
+	except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+		return None
+	return state if state['cookies'] else None
+
+
+def write_state(path: str, state: dict):
+	"""原子写入登录态文件（仅本人可读）"""
+	with tracer.span('save browser_state', cat='io'):
+		atomic_write(path, json.dumps(state, indent=2, ensure_ascii=False), mode=0o600, keep_mode=False)
+
+
+async def restore_state(ctx, path: str) -> bool:
+	"""把已保存的登录态注入 context（cookie + localStorage），无可用状态返回 False。
+	用 add_cookies / add_init_script 而不是 new_context(storage_state=...)，进程模式的默认 context 也适用"""
+	state = load_state(path)
+	if not state:
+		return False
+	await ctx.add_cookies(state['cookies'])
+	for origin in state['origins']:
+		items = {item['name']: item['value'] for item in origin.get('localStorage', [])}
+		if items:
+			await ctx.add_init_script(script=_local_storage_script(origin['origin'], items))
+	return True
+
+
+def _local_storage_script(origin: str, items: dict) -> str:
+	return (
+		f'if (location.origin === {json.dumps(origin)}) {{'
+		f' const items = {json.dumps(items, ensure_ascii=False)};'
+		f' for (const [k, v] of Object.entries(items)) if (localStorage.getItem(k) === null) localStorage.setItem(k, v);'
+		f' }}'
+	)
+
+
+async def save_state(ctx, path: str):
+	"""导出 context 中 linux.do 相关的登录态并保存"""
+	write_state(path, filter_state(await ctx.storage_state()))
+
+
+async def session_valid(ctx, timeout: float = 10.0) -> bool:
+	"""用 context 的 cookie 请求 /session/current.json，已登录返回 True（不打开页面）"""
+	try:
+		resp = await ctx.request.get(SESSION_CHECK_URL, headers={'Accept': 'application/json'},
+									 timeout=timeout * 1000, fail_on_status_code=False)
+		if resp.status != 200:
+			return False
+		data = await resp.json()
+	except Exception:
+		return False
+	return bool(isinstance(data, dict) and data.get('current_user'))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+浏览器事件驱动等待（替代固定 asyncio.sleep 轮询）
+
+- CF/WAF 质询：page.wait_for_function 监听 document.title，通过即返回
+- 页面就绪：wait_for_load_state / wait_for_function，最长不超过原固定等待时长
+- OAuth：wait_for_url 等授权页，wait_for_response 等 /api/oauth/linuxdo 回调，
+  context.on('requestfinished') 监听 session cookie 下发
+- 每一步都有独立超时；相对旧固定等待节省的时间记入 contextvar 账本，由 timer() 输出
+"""
+
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+CF_TITLE_KEYWORDS = ('稍候', 'moment', 'Cloudflare', 'Just a', 'checking')
+
+_TITLE_CLEARED_JS = '(kws) => !kws.some(k => document.title.includes(k))'
+
+# 当前生效的所有账本（嵌套 timer 各有一个），asyncio 子任务继承同一组账本
+_ledgers: ContextVar[tuple] = ContextVar('browser_wait_ledgers', default=())
+
+
+@contextmanager
+def saved_time():
+	"""开启一个节省时间账本，yield [秒数]"""
+	cell = [0.0]
+	token = _ledgers.set(_ledgers.get() + (cell,))
+	try:
+		yield cell
+	finally:
+		_ledgers.reset(token)
+
+
+def record_saved(seconds: float):
+	"""记录一次等待相对旧实现节省的秒数"""
+	if seconds <= 0:
+		return
+	for cell in _ledgers.get():
+		cell[0] += seconds
+
+
+def polled_cost(elapsed: float, interval: float) -> float:
+	"""旧实现"先 sleep(interval) 再检查"的轮询，在 elapsed 时刻就绪时实际花费的时间"""
+	return max(interval, math.ceil(elapsed / interval) * interval)
+
+
+def _is_timeout(e: Exception) -> bool:
+	return type(e).__name__ == 'TimeoutError'
+
+
+async def wait_challenge_cleared(page, timeout: float = 30.0, keywords=CF_TITLE_KEYWORDS,
+								 poll_interval: float = 2.0) -> bool:
+	"""等待 CF/WAF 质询页标题消失，超时返回 False。poll_interval 为旧实现轮询间隔（用于统计节省时间）"""
+	start = time.monotonic()
+	deadline = start + timeout
+	ok = False
+	while not page.is_closed():
+		remaining = deadline - time.monotonic()
+		if remaining <= 0:
+			break
+		try:
+			await page.wait_for_function(_TITLE_CLEARED_JS, arg=list(keywords), timeout=remaining * 1000, polling=250)
+			ok = True
+			break
+		except Exception as e:
+			if _is_timeout(e):
+				break
+			# 质询通过时页面会跳转，执行上下文被销毁，稍后重试
+			await asyncio.sleep(0.2)
+	if ok:
+		elapsed = time.monotonic() - start
+		record_saved(polled_cost(elapsed, poll_interval) - elapsed)
+	return ok
+
+
+async def wait_page_settled(page, budget: float, state: str = 'networkidle'):
+	"""替代固定 sleep(budget)：等待页面加载状态，最多 budget 秒"""
+	start = time.monotonic()
+	try:
+		await page.wait_for_load_state(state, timeout=budget * 1000)
+	except Exception:
+		pass
+	record_saved(budget - (time.monotonic() - start))
+
+
+async def wait_for_condition(page, expression: str, budget: float, arg=None) -> bool:
+	"""替代固定 sleep(budget)：等待页面内 JS 条件成立，最多 budget 秒"""
+	start = time.monotonic()
+	try:
+		await page.wait_for_function(expression, arg=arg, timeout=budget * 1000, polling=200)
+		ok = True
+	except Exception:
+		ok = False
+	record_saved(budget - (time.monotonic() - start))
+	return ok
+
+
+async def wait_for_oauth_page(page, domain_host: str, timeout: float = 30.0) -> bool:
+	"""OAuth 导航后等待到达 connect.linux.do 授权页或已回到站点"""
+	def reached(url: str) -> bool:
+		return 'connect.linux.do' in url or domain_host in url
+
+	try:
+		await page.wait_for_url(reached, wait_until='commit', timeout=timeout * 1000)
+		return True
+	except Exception:
+		return False
+
+
+async def wait_for_oauth_callback(page, domain_host: str, timeout: float = 15.0, budget: float = 5.0) -> bool:
+	"""点击"允许"后等待 /api/oauth/linuxdo 回调响应；budget 为旧实现的固定等待时长"""
+	start = time.monotonic()
+	try:
+		await page.wait_for_response(
+			lambda r: '/api/oauth/linuxdo' in r.url and domain_host in r.url, timeout=timeout * 1000)
+		ok = True
+	except Exception:
+		ok = False
+	record_saved(budget - (time.monotonic() - start))
+	return ok
+
+
+class SessionCookieWatcher:
+	"""监听 context 的 requestfinished 事件：目标域名（或同根域名）下发 session cookie、
+	或页面主框架跳转时唤醒等待者，替代每 2 秒轮询 ctx.cookies()"""
+
+	def __init__(self, ctx, page, domain_host: str, root_domain: str):
+		self.ctx = ctx
+		self.page = page
+		self.domain_host = domain_host
+		self.root_domain = root_domain
+		self.event = asyncio.Event()
+
+	def _matches(self, url: str) -> bool:
+		host = urlsplit(url).hostname or ''
+		return self.domain_host in host or host.endswith(self.root_domain)
+
+	async def _on_request_finished(self, request):
+		if not self._matches(request.url):
+			return
+		try:
+			response = await request.response()
+			cookie = await response.header_value('set-cookie') if response else None
+		except Exception:
+			return
+		if cookie and 'session=' in cookie:
+			self.event.set()
+
+	def _on_frame_navigated(self, frame):
+		if frame == self.page.main_frame:
+			self.event.set()
+
+	def __enter__(self):
+		self.ctx.on('requestfinished', self._on_request_finished)
+		self.page.on('framenavigated', self._on_frame_navigated)
+		return self
+
+	def __exit__(self, *exc):
+		for target, event, handler in ((self.ctx, 'requestfinished', self._on_request_finished),
+									   (self.page, 'framenavigated', self._on_frame_navigated)):
+			try:
+				target.remove_listener(event, handler)
+			except Exception:
+				pass
+
+	async def wait(self, timeout: float) -> bool:
+		"""等待下一次相关事件，最多 timeout 秒。返回是否由事件唤醒"""
+		try:
+			await asyncio.wait_for(self.event.wait(), timeout)
+			return True
+		except asyncio.TimeoutError:
+			return False
+		finally:
+			self.event.clear()
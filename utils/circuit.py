@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+按域名的令牌桶限速 + 熔断器（closed / open / half-open），所有 httpx 请求路径与浏览器阶段共用
+
+- 新域名处于 half-open：先只放行一个探测请求，其余请求等待探测结果，
+  第一个连接失败即熔断，其他账号的请求立即失败而不是各自等满超时
+- 连接失败（ConnectError / ConnectTimeout）立即熔断；读超时、连接中断、52x 等源站故障连续 failure_threshold 次熔断
+- 熔断 reset_timeout 秒后转 half-open 再放行一个探测请求，探测失败则熔断时间翻倍（上限 max_reset_timeout）
+- 熔断期间的请求抛 CircuitOpenError（ConnectError 子类），调用方按"站点无法连接"处理
+"""
+
+import asyncio
+import time
+
+import httpx
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+# 源站故障：网关错误 + Cloudflare 52x（503 常见于 CF 质询/维护页，不计入）
+FAILURE_STATUSES = frozenset({502, 504, 520, 521, 522, 523, 524, 525, 526, 530})
+
+
+class CircuitOpenError(httpx.ConnectError):
+	"""域名处于熔断期，请求未发出"""
+
+	def __init__(self, key: str, retry_in: float, request: httpx.Request | None = None):
+		super().__init__(f'{key} 熔断中，{retry_in:.0f}s 后重试', request=request)
+		self.key = key
+		self.retry_in = retry_in
+
+
+class TokenBucket:
+	"""令牌桶：平均 rate 个/秒，最多突发 burst 个"""
+
+	def __init__(self, rate: float, burst: int, clock=time.monotonic):
+		self.rate = rate
+		self.burst = burst
+		self.tokens = float(burst)
+		self._clock = clock
+		self._last = clock()
+
+	def _refill(self):
+		now = self._clock()
+		self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+		self._last = now
+
+	def try_acquire(self) -> float:
+		"""取一个令牌，成功返回 0，否则返回还需等待的秒数"""
+		self._refill()
+		if self.tokens >= 1:
+			self.tokens -= 1
+			return 0.0
+		return (1 - self.tokens) / self.rate
+
+	async def acquire(self):
+		while True:
+			wait = self.try_acquire()
+			if not wait:
+				return
+			await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+	"""单个域名的熔断器"""
+
+	def __init__(self, key: str, failure_threshold: int = 3, reset_timeout: float = 60.0,
+				 max_reset_timeout: float = 900.0, clock=time.monotonic):
+		self.key = key
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.max_reset_timeout = max_reset_timeout
+		self.state = HALF_OPEN  # 新域名先放行一个探测请求
+		self.failures = 0
+		self.trips = 0  # 累计熔断次数
+		self.open_for = reset_timeout
+		self.retry_at = 0.0
+		self._clock = clock
+		self._probing = False
+		self._settled: asyncio.Event | None = None
+
+	def retry_in(self) -> float:
+		return max(self.retry_at - self._clock(), 0.0) if self.state == OPEN else 0.0
+
+	def is_open(self) -> bool:
+		return self.state == OPEN and self._clock() < self.retry_at
+
+	async def acquire(self) -> bool:
+		"""请求前调用。熔断中抛 CircuitOpenError；half-open 时只放行一个探测请求（返回 True），其余等待探测结果"""
+		while True:
+			if self.state == OPEN:
+				if self._clock() < self.retry_at:
+					raise CircuitOpenError(self.key, self.retry_in())
+				self.state = HALF_OPEN
+			if self.state == CLOSED:
+				return False
+			if not self._probing:
+				self._probing = True
+				self._settled = asyncio.Event()
+				return True
+			await self._settled.wait()
+
+	def _settle(self):
+		self._probing = False
+		if self._settled is not None:
+			self._settled.set()
+
+	def _open(self, backoff: bool):
+		if backoff:
+			self.open_for = min(self.open_for * 2, self.max_reset_timeout)
+		self.state = OPEN
+		self.retry_at = self._clock() + self.open_for
+		self.trips += 1
+
+	def success(self, probe: bool = False):
+		if probe or self.state == CLOSED:
+			self.state = CLOSED
+			self.failures = 0
+			self.open_for = self.reset_timeout
+		if probe:
+			self._settle()
+
+	def failure(self, probe: bool = False, immediate: bool = False):
+		if probe:
+			self._settle()
+			self.failures += 1
+			if immediate or self.trips:
+				# 熔断恢复后的探测失败：熔断时间翻倍
+				self._open(backoff=self.trips > 0)
+			else:
+				# 新域名首个请求遇到源站错误：不直接熔断，转入正常计数
+				self.state = CLOSED
+		elif self.state == CLOSED:
+			self.failures += 1
+			if immediate or self.failures >= self.failure_threshold:
+				self._open(backoff=False)
+
+	def release(self, probe: bool):
+		"""请求被取消等非站点原因结束：状态不变，由下一个等待者接着探测"""
+		if probe:
+			self._settle()
+
+	def trip(self):
+		"""外部确认不可达（如浏览器打不开站点）：立即熔断"""
+		if not self.is_open():
+			self._open(backoff=False)
+		self._settle()
+
+
+class DomainGuard:
+	"""按域名管理令牌桶和熔断器"""
+
+	def __init__(self, rate: float = 8.0, burst: int = 8, failure_threshold: int = 3,
+				 reset_timeout: float = 60.0, max_reset_timeout: float = 900.0, clock=time.monotonic):
+		self.rate = rate
+		self.burst = burst
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.max_reset_timeout = max_reset_timeout
+		self._clock = clock
+		self._breakers: dict[str, CircuitBreaker] = {}
+		self._buckets: dict[str, TokenBucket] = {}
+
+	def breaker(self, key: str) -> CircuitBreaker:
+		breaker = self._breakers.get(key)
+		if breaker is None:
+			breaker = self._breakers[key] = CircuitBreaker(
+				key, self.failure_threshold, self.reset_timeout, self.max_reset_timeout, self._clock)
+		return breaker
+
+	def bucket(self, key: str) -> TokenBucket:
+		bucket = self._buckets.get(key)
+		if bucket is None:
+			bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, self._clock)
+		return bucket
+
+	async def acquire(self, key: str, request: httpx.Request | None = None) -> bool:
+		"""过熔断器 + 取令牌，返回是否为探测请求（结果必须交给 record()）"""
+		breaker = self.breaker(key)
+		try:
+			probe = await breaker.acquire()
+		except CircuitOpenError as e:
+			e.request = request
+			raise
+		try:
+			await self.bucket(key).acquire()
+		except BaseException:
+			breaker.release(probe)
+			raise
+		return probe
+
+	def record(self, key: str, probe: bool, response: httpx.Response | None = None,
+			   exc: BaseException | None = None):
+		"""记录请求结果：连接失败立即熔断，读超时/连接中断/52x 计数，其余视为站点可达"""
+		breaker = self.breaker(key)
+		if exc is not None:
+			if isinstance(exc, CONNECT_ERRORS):
+				breaker.failure(probe, immediate=True)
+			elif isinstance(exc, httpx.TransportError) and not isinstance(exc, httpx.PoolTimeout):
+				breaker.failure(probe)
+			else:
+				breaker.release(probe)
+		elif response is not None and response.status_code in FAILURE_STATUSES:
+			breaker.failure(probe)
+		else:
+			breaker.success(probe)
+
+	def is_open(self, key: str) -> bool:
+		breaker = self._breakers.get(key)
+		return breaker is not None and breaker.is_open()
+
+	def trip(self, key: str):
+		self.breaker(key).trip()
+
+	def snapshot(self) -> dict:
+		"""非 closed 的域名状态（用于日志 / 状态接口）"""
+		return {
+			key: {'state': b.state, 'failures': b.failures, 'retry_in': round(b.retry_in(), 1)}
+			for key, b in self._breakers.items() if b.state != CLOSED
+		}
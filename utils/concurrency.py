@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+并发控制工具
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+
+def domain_key(url: str) -> str:
+	"""从 URL / 域名提取 host，用作按域名限流的 key"""
+	if '://' not in url:
+		url = f'https://{url}'
+	return urlsplit(url).hostname or url
+
+
+class KeyedSemaphore:
+	"""按 key（通常是域名）分组的信号量，每个 key 最多 limit 个并发"""
+
+	def __init__(self, limit: int):
+		self.limit = limit
+		self._sems: dict[str, asyncio.Semaphore] = {}
+
+	def get(self, key: str) -> asyncio.Semaphore:
+		sem = self._sems.get(key)
+		if sem is None:
+			sem = self._sems[key] = asyncio.Semaphore(self.limit)
+		return sem
+
+	@asynccontextmanager
+	async def hold(self, key: str):
+		async with self.get(key):
+			yield
+
+
+def root_domain(host: str) -> str:
+	"""取最后两段作为根域名（如 jp.duckcoding.com → duckcoding.com），用于跨子域 cookie 匹配"""
+	parts = host.split('.')
+	return '.'.join(parts[-2:]) if len(parts) >= 2 else host
+
+
+class ExclusiveKeyQueue:
+	"""任务队列：同一 key（如根域名）的任务不会同时出队执行，出队时跳过 key 正忙的任务"""
+
+	def __init__(self, items, key):
+		self._pending = list(items)
+		self._key = key
+		self._busy: set = set()
+		self._cond = asyncio.Condition()
+
+	def __len__(self) -> int:
+		return len(self._pending)
+
+	async def take(self):
+		"""取下一个可执行的任务；队列为空返回 None。用完必须调用 done()"""
+		async with self._cond:
+			while self._pending:
+				for i, item in enumerate(self._pending):
+					k = self._key(item)
+					if k not in self._busy:
+						self._busy.add(k)
+						return self._pending.pop(i)
+				await self._cond.wait()
+			return None
+
+	async def done(self, item):
+		async with self._cond:
+			self._busy.discard(self._key(item))
+			self._cond.notify_all()
+
+	def drain(self) -> list:
+		"""取出所有尚未开始的任务（用于整体放弃）"""
+		items, self._pending = self._pending, []
+		return items
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+进程级 httpx.AsyncClient 注册表
+
+- 同一进程内按名称复用 AsyncClient，保留 TLS 会话和 keep-alive 连接
+- 每个 host 的并发请求数受限（信号量在响应体读完/关闭时释放）
+- 可选 DomainGuard：每个 host 的令牌桶限速 + 熔断（见 utils/circuit.py）
+- 安装了 h2 时启用 HTTP/2
+- 客户端不持久化 cookie：多个账号共用连接池，cookie 必须按请求显式传入（见 cookie_header）
+- 需要跟随重定向时用 send_following：每次调用一个独立 cookie jar，中间跳下发的 Set-Cookie 带到下一跳
+"""
+
+from http.cookiejar import CookieJar
+
+import httpx
+
+from utils.circuit import DomainGuard
+from utils.concurrency import KeyedSemaphore
+
+try:
+	import h2  # noqa: F401
+
+	HTTP2_AVAILABLE = True
+except ImportError:
+	HTTP2_AVAILABLE = False
+
+MAX_REDIRECTS = 10
+
+
+class _NullCookieJar(CookieJar):
+	"""丢弃服务端 Set-Cookie，避免共享客户端把 A 账号的 cookie 带给 B 账号"""
+
+	def set_cookie(self, cookie):
+		pass
+
+	def extract_cookies(self, response, request):
+		pass
+
+
+def cookie_header(cookies: dict) -> str:
+	"""把 cookie 字典拼成 Cookie 请求头"""
+	return '; '.join(f'{k}={v}' for k, v in cookies.items() if v is not None)
+
+
+def chain_cookies(response: httpx.Response) -> dict:
+	"""重定向链（response.history + 最终响应）上服务端下发的全部 cookie，后一跳覆盖前一跳"""
+	return {c.name: c.value for r in (*response.history, response) for c in r.cookies.jar}
+
+
+async def send_following(client: httpx.AsyncClient, method: str, url: str, cookies: dict | None = None,
+						 max_redirects: int = MAX_REDIRECTS, **kwargs) -> httpx.Response:
+	"""代替 follow_redirects=True：逐跳手动跟随，本次调用独立的 cookie jar 贯穿整条重定向链。
+	共享客户端不保存 cookie，httpx 自动跟随时会丢掉 Cookie 请求头和中间跳的 Set-Cookie（WAF acw_tc、轮换的 session）。
+	cookies 只发给 url 所在 host；中间响应放在返回值的 history 中"""
+	jar = httpx.Cookies()
+	host = httpx.URL(url).host
+	for name, value in (cookies or {}).items():
+		if value is not None:
+			jar.set(name, value, domain=host)
+	request = client.build_request(method, url, **kwargs)
+	history = []
+	while True:
+		jar.set_cookie_header(request)
+		response = await client.send(request, follow_redirects=False)
+		jar.extract_cookies(response)
+		response.history = list(history)
+		if response.next_request is None:
+			return response
+		if len(history) >= max_redirects:
+			raise httpx.TooManyRedirects('Exceeded maximum allowed redirects.', request=request)
+		history.append(response)
+		request = response.next_request
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+	"""包装响应体流，关闭时释放 host 信号量"""
+
+	def __init__(self, stream, release):
+		self._stream = stream
+		self._release = release
+
+	async def __aiter__(self):
+		async for chunk in self._stream:
+			yield chunk
+
+	async def aclose(self):
+		try:
+			await self._stream.aclose()
+		finally:
+			release, self._release = self._release, None
+			if release:
+				release()
+
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+	"""在底层 transport 外加每 host 并发上限；guard 不为空时先过该 host 的熔断器和令牌桶"""
+
+	def __init__(self, transport: httpx.AsyncBaseTransport, per_host: int, guard: DomainGuard | None = None):
+		self._transport = transport
+		self._sems = KeyedSemaphore(per_host)
+		self._guard = guard
+
+	async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+		host = request.url.host
+		probe = await self._guard.acquire(host, request) if self._guard is not None else False
+		sem = self._sems.get(host)
+		try:
+			await sem.acquire()
+		except BaseException:
+			if self._guard is not None:
+				self._guard.breaker(host).release(probe)
+			raise
+		try:
+			response = await self._transport.handle_async_request(request)
+		except BaseException as e:
+			sem.release()
+			if self._guard is not None:
+				self._guard.record(host, probe, exc=e)
+			raise
+		if self._guard is not None:
+			self._guard.record(host, probe, response=response)
+		return httpx.Response(
+			status_code=response.status_code,
+			headers=response.headers,
+			stream=_ReleasingStream(response.stream, sem.release),
+			extensions=response.extensions,
+		)
+
+	async def aclose(self):
+		await self._transport.aclose()
+
+
+def build_client(transport: httpx.AsyncBaseTransport) -> httpx.AsyncClient:
+	"""共享客户端的统一配置：不保存 cookie、默认 15s 超时、不自动跟随重定向、忽略环境变量中的代理。
+	HttpClientPool.get() 和基准测试（benchmarks/fake_upstream.py）都用它创建客户端"""
+	return httpx.AsyncClient(
+		transport=transport,
+		cookies=_NullCookieJar(),
+		timeout=15,
+		follow_redirects=False,
+		trust_env=False,
+	)
+
+
+class HttpClientPool:
+	"""按名称复用的 AsyncClient 注册表，main() 结束时 aclose()"""
+
+	def __init__(
+		self,
+		proxy: str | None = None,
+		per_host: int = 6,
+		max_connections: int = 100,
+		max_keepalive: int = 40,
+		http2: bool = HTTP2_AVAILABLE,
+		guard: DomainGuard | None = None,
+	):
+		self.proxy = proxy
+		self.per_host = per_host
+		self.max_connections = max_connections
+		self.max_keepalive = max_keepalive
+		self.http2 = http2 and HTTP2_AVAILABLE
+		self.guard = guard
+		self._clients: dict[str, httpx.AsyncClient] = {}
+
+	def get(self, name: str = 'default', local: bool = False) -> httpx.AsyncClient:
+		"""获取（必要时创建）命名客户端。local=True 用于 127.0.0.1（不走代理、不限 host、HTTP/1.1）"""
+		client = self._clients.get(name)
+		if client is not None and not client.is_closed:
+			return client
+		limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive)
+		if local:
+			transport = httpx.AsyncHTTPTransport(limits=limits)
+		else:
+			transport = HostLimitedTransport(
+				httpx.AsyncHTTPTransport(verify=False, http2=self.http2, limits=limits, proxy=self.proxy),
+				self.per_host,
+				self.guard,
+			)
+		client = build_client(transport)
+		self._clients[name] = client
+		return client
+
+	async def aclose(self):
+		clients, self._clients = list(self._clients.values()), {}
+		for client in clients:
+			try:
+				await client.aclose()
+			except Exception:
+				pass
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+API Key / 额度库存（SQLite），供 get_all_keys.py 增量查询
+
+- 每个 (站点, 账号) 保存最近一次快照：/api/user/self 的用量指纹（used_quota / request_count）、
+  令牌列表首页的内容哈希、近期使用量
+- 用量指纹不变 → 使用量日志、令牌余额都没变；首页哈希（含 total）也不变 → 令牌列表没变，直接复用快照
+- 每次保存令牌时与上次状态比较，记录 新增 / 过期 / 耗尽 / 删除 事件，diff 报告只读本地库
+- 使用量日志按 (站点, 账号, 日期, 模型) 累计；每个账号记录已统计的最大日志 id（高水位），下次只取更新的日志
+- 模型目录：每站 /api/models 的 (分组, 模型) 按规范化名称建索引，与令牌表联查得到 模型 → (站点, 分组, Key, 剩余额度)；
+  目录内容哈希不变时不重写，查询只读本地库
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import time
+
+INVENTORY_DB = 'inventory.db'
+SCHEMA_VERSION = 3
+
+# new-api 令牌状态: 1 启用 / 2 禁用 / 3 已过期 / 4 已耗尽
+TOKEN_ENABLED, TOKEN_DISABLED, TOKEN_EXPIRED, TOKEN_EXHAUSTED = 1, 2, 3, 4
+EVENTS = ('new', 'expired', 'exhausted', 'removed')
+
+_MIGRATIONS = ("""
+CREATE TABLE IF NOT EXISTS runs (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	started_at REAL NOT NULL,
+	finished_at REAL,
+	accounts INTEGER DEFAULT 0,
+	reused INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS accounts (
+	site TEXT NOT NULL,
+	account TEXT NOT NULL,
+	site_name TEXT,
+	fingerprint TEXT,
+	tokens_hash TEXT,
+	quota INTEGER,
+	used_quota INTEGER,
+	request_count INTEGER,
+	user_json TEXT,
+	logs_json TEXT,
+	updated_at REAL,
+	PRIMARY KEY (site, account)
+);
+CREATE TABLE IF NOT EXISTS tokens (
+	site TEXT NOT NULL,
+	account TEXT NOT NULL,
+	key TEXT NOT NULL,
+	pos INTEGER,
+	name TEXT,
+	grp TEXT,
+	state TEXT,
+	remain_quota INTEGER,
+	unlimited INTEGER,
+	expired_time INTEGER,
+	item_json TEXT,
+	first_seen REAL,
+	last_seen REAL,
+	PRIMARY KEY (site, account, key)
+);
+CREATE TABLE IF NOT EXISTS token_events (
+	run_id INTEGER NOT NULL,
+	site TEXT NOT NULL,
+	account TEXT NOT NULL,
+	key TEXT NOT NULL,
+	name TEXT,
+	event TEXT NOT NULL,
+	ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS token_events_run ON token_events (run_id);
+""", """
+ALTER TABLE accounts ADD COLUMN log_high_water INTEGER;
+CREATE TABLE IF NOT EXISTS usage (
+	site TEXT NOT NULL,
+	account TEXT NOT NULL,
+	day TEXT NOT NULL,
+	model TEXT NOT NULL,
+	requests INTEGER DEFAULT 0,
+	prompt_tokens INTEGER DEFAULT 0,
+	completion_tokens INTEGER DEFAULT 0,
+	quota INTEGER DEFAULT 0,
+	PRIMARY KEY (site, account, day, model)
+);
+""", """
+CREATE TABLE IF NOT EXISTS catalogs (
+	site TEXT PRIMARY KEY,
+	site_name TEXT,
+	models_hash TEXT,
+	updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS site_models (
+	site TEXT NOT NULL,
+	grp TEXT NOT NULL,
+	model TEXT NOT NULL,
+	norm TEXT NOT NULL,
+	PRIMARY KEY (site, grp, model)
+);
+CREATE INDEX IF NOT EXISTS site_models_norm ON site_models (norm);
+CREATE INDEX IF NOT EXISTS tokens_site ON tokens (site, state);
+""")
+
+# 规范化后仍对不上的常见别名（规范化形式 → 规范化形式）
+MODEL_ALIASES = {
+	'gpt4o': 'gpt-4o',
+	'gpt4o-mini': 'gpt-4o-mini',
+	'chatgpt-4o': 'gpt-4o',
+	'claude-3-5-sonnet-v2': 'claude-3-5-sonnet',
+	'claude-sonnet-3-5': 'claude-3-5-sonnet',
+	'claude-sonnet-3-7': 'claude-3-7-sonnet',
+	'claude-sonnet-4-0': 'claude-sonnet-4',
+	'claude-opus-4-0': 'claude-opus-4',
+	'deepseek-reasoner': 'deepseek-r1',
+	'deepseek-chat': 'deepseek-v3',
+}
+_DATE_SUFFIX = re.compile(r'-(\d{8}|\d{4}-\d{2}-\d{2}|\d{4}|latest)$')
+_VERSION_DOT = re.compile(r'(?<=\d)\.(?=\d)')
+
+
+def content_hash(obj) -> str:
+	"""JSON 内容哈希（键排序），用作 ETag"""
+	return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+def usage_fingerprint(user: dict) -> str | None:
+	"""/api/user/self 的用量指纹：没有新请求时 used_quota / request_count 都不变"""
+	if not user or user.get('used_quota') is None:
+		return None
+	return f'{user.get("used_quota")}/{user.get("request_count")}'
+
+
+def normalize_model(name: str) -> str:
+	"""模型名规范化：小写、去掉厂商前缀（openai/、[xx]）、日期 / latest 后缀，版本号 3.5 → 3-5，再查别名表。
+	例: anthropic/claude-3.5-sonnet-20241022 → claude-3-5-sonnet"""
+	norm = re.sub(r'^\[[^\]]*\]', '', name.strip().lower()).rsplit('/', 1)[-1]
+	norm = _VERSION_DOT.sub('-', norm.replace('_', '-').replace(' ', '-'))
+	while True:
+		stripped = _DATE_SUFFIX.sub('', norm)
+		if stripped == norm or not stripped:
+			break
+		norm = stripped
+	return MODEL_ALIASES.get(norm, norm)
+
+
+def _like_escape(text: str) -> str:
+	return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def token_state(item: dict, now: float | None = None) -> str:
+	"""令牌状态: active / disabled / expired / exhausted（按截止时间、余额推断，不只看 status）"""
+	now = now or time.time()
+	status = item.get('status')
+	expired_time = item.get('expired_time', -1)
+	if status == TOKEN_EXPIRED or (expired_time not in (-1, 0, None) and expired_time < now):
+		return 'expired'
+	if status == TOKEN_EXHAUSTED or (not item.get('unlimited_quota') and (item.get('remain_quota') or 0) <= 0):
+		return 'exhausted'
+	if status != TOKEN_ENABLED:
+		return 'disabled'
+	return 'active'
+
+
+class Inventory:
+	"""库存库。单线程使用（asyncio 主线程），finish_run() / close() 时提交"""
+
+	def __init__(self, path: str = INVENTORY_DB):
+		self.path = path
+		self.conn = sqlite3.connect(path)
+		self.conn.row_factory = sqlite3.Row
+		self.conn.execute('PRAGMA journal_mode=WAL')
+		self.conn.execute('PRAGMA synchronous=NORMAL')
+		version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+		for script in _MIGRATIONS[version:]:
+			self.conn.executescript(script)
+		if version < SCHEMA_VERSION:
+			self.conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+			self.conn.commit()
+
+	def close(self):
+		self.conn.commit()
+		self.conn.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	# ---------- 运行 ----------
+
+	def begin_run(self) -> int:
+		cur = self.conn.execute('INSERT INTO runs (started_at) VALUES (?)', (time.time(),))
+		return cur.lastrowid
+
+	def finish_run(self, run_id: int, accounts: int, reused: int):
+		self.conn.execute('UPDATE runs SET finished_at = ?, accounts = ?, reused = ? WHERE id = ?',
+						  (time.time(), accounts, reused, run_id))
+		self.conn.commit()
+
+	def last_run(self) -> dict | None:
+		row = self.conn.execute('SELECT * FROM runs WHERE finished_at IS NOT NULL ORDER BY id DESC LIMIT 1').fetchone()
+		return dict(row) if row else None
+
+	# ---------- 快照 ----------
+
+	def snapshot(self, site: str, account: str) -> dict | None:
+		"""上次快照: {'fingerprint', 'tokens_hash', 'user', 'logs', 'log_high_water', 'updated_at'}，没有返回 None"""
+		row = self.conn.execute('SELECT * FROM accounts WHERE site = ? AND account = ?', (site, account)).fetchone()
+		if row is None:
+			return None
+		return {
+			'fingerprint': row['fingerprint'], 'tokens_hash': row['tokens_hash'],
+			'user': json.loads(row['user_json'] or '{}'), 'logs': json.loads(row['logs_json'] or '[]'),
+			'log_high_water': row['log_high_water'], 'updated_at': row['updated_at'],
+		}
+
+	def tokens(self, site: str, account: str) -> list[dict]:
+		"""上次保存的令牌（接口原始字段，保持接口返回顺序）"""
+		rows = self.conn.execute('SELECT item_json FROM tokens WHERE site = ? AND account = ? ORDER BY pos',
+								 (site, account)).fetchall()
+		return [json.loads(r['item_json']) for r in rows]
+
+	def save(self, run_id: int, site: str, account: str, user: dict, tokens: list[dict], tokens_hash: str | None,
+			 logs: list, site_name: str = '', now: float | None = None) -> list[dict]:
+		"""保存快照并替换令牌列表，返回本次产生的令牌事件（首次快照不产生事件）"""
+		now = now or time.time()
+		had_snapshot = self.conn.execute('SELECT 1 FROM accounts WHERE site = ? AND account = ?',
+										 (site, account)).fetchone() is not None
+		self.conn.execute(
+			'INSERT INTO accounts (site, account, site_name, fingerprint, tokens_hash, quota, used_quota, '
+			'request_count, user_json, logs_json, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+			'ON CONFLICT (site, account) DO UPDATE SET site_name = excluded.site_name, fingerprint = excluded.fingerprint, '
+			'tokens_hash = excluded.tokens_hash, quota = excluded.quota, used_quota = excluded.used_quota, '
+			'request_count = excluded.request_count, user_json = excluded.user_json, logs_json = excluded.logs_json, '
+			'updated_at = excluded.updated_at',
+			(site, account, site_name, usage_fingerprint(user), tokens_hash, user.get('quota'), user.get('used_quota'),
+			 user.get('request_count'), json.dumps(user, ensure_ascii=False), json.dumps(logs, ensure_ascii=False), now))
+
+		previous = {r['key']: (r['state'], r['name'], r['first_seen']) for r in self.conn.execute(
+			'SELECT key, state, name, first_seen FROM tokens WHERE site = ? AND account = ?', (site, account))}
+		events = []
+		rows = []
+		seen = set()
+		for pos, item in enumerate(tokens):
+			key = item.get('key')
+			if not key or key in seen:
+				continue
+			seen.add(key)
+			state = token_state(item, now)
+			prev_state, _, first_seen = previous.get(key, (None, None, now))
+			if had_snapshot:
+				if prev_state is None and state == 'active':
+					events.append(('new', key, item.get('name', '')))
+				elif prev_state == 'active' and state in ('expired', 'exhausted'):
+					events.append((state, key, item.get('name', '')))
+			rows.append((site, account, key, pos, item.get('name', ''), item.get('group', 'default'), state,
+						 item.get('remain_quota'), 1 if item.get('unlimited_quota') else 0, item.get('expired_time'),
+						 json.dumps(item, ensure_ascii=False), first_seen, now))
+		for key, (prev_state, name, _) in previous.items():
+			if key not in seen and prev_state == 'active':
+				events.append(('removed', key, name))
+
+		self.conn.execute('DELETE FROM tokens WHERE site = ? AND account = ?', (site, account))
+		self.conn.executemany('INSERT INTO tokens VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+		self.conn.executemany(
+			'INSERT INTO token_events (run_id, site, account, key, name, event, ts) VALUES (?, ?, ?, ?, ?, ?, ?)',
+			[(run_id, site, account, key, name, event, now) for event, key, name in events])
+		return [{'site': site, 'account': account, 'key': key, 'name': name, 'event': event} for event, key, name in events]
+
+	# ---------- 使用量 ----------
+
+	def add_usage(self, site: str, account: str, usage: dict, high_water: int | None, replace: bool = False):
+		"""累加一次日志遍历的聚合结果 {(day, model): [requests, prompt, completion, quota]} 并推进高水位。
+		replace=True（首次 / 全量遍历）时先清掉该账号的旧统计。需在 save() 之后调用"""
+		if replace:
+			self.conn.execute('DELETE FROM usage WHERE site = ? AND account = ?', (site, account))
+			self.conn.execute('UPDATE accounts SET log_high_water = NULL WHERE site = ? AND account = ?', (site, account))
+		self.conn.executemany(
+			'INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (site, account, day, model) DO UPDATE SET '
+			'requests = requests + excluded.requests, prompt_tokens = prompt_tokens + excluded.prompt_tokens, '
+			'completion_tokens = completion_tokens + excluded.completion_tokens, quota = quota + excluded.quota',
+			[(site, account, day, model, *row) for (day, model), row in usage.items()])
+		self.conn.execute('UPDATE accounts SET log_high_water = MAX(COALESCE(log_high_water, 0), COALESCE(?, 0)) '
+						  'WHERE site = ? AND account = ?', (high_water, site, account))
+
+	def usage_summary(self, days: int = 7) -> dict:
+		"""累计使用量: {'models': [...], 'sites': [...], 'days': [...]}，
+		每行 (名称, requests, prompt_tokens, completion_tokens, quota)，按花费降序（days 按日期降序，最近 N 天）"""
+		cols = 'SUM(u.requests), SUM(u.prompt_tokens), SUM(u.completion_tokens), SUM(u.quota)'
+		q = self.conn.execute
+		return {
+			'models': [tuple(r) for r in q(f'SELECT u.model, {cols} FROM usage u GROUP BY u.model ORDER BY 5 DESC')],
+			'sites': [tuple(r) for r in q(
+				f'SELECT COALESCE(a.site_name, u.site), {cols} FROM usage u LEFT JOIN accounts a '
+				f'ON a.site = u.site AND a.account = u.account GROUP BY u.site ORDER BY 5 DESC')],
+			'days': [tuple(r) for r in q(
+				f'SELECT u.day, {cols} FROM usage u GROUP BY u.day ORDER BY u.day DESC LIMIT ?', (days,))],
+		}
+
+	# ---------- 模型目录 ----------
+
+	def save_catalog(self, site: str, models: dict | list, site_name: str = '', now: float | None = None) -> bool:
+		"""保存站点 /api/models 的 data（{分组: [模型]} 或模型列表，列表记为分组 *）。内容哈希不变时不重写，返回是否更新"""
+		models_hash = content_hash(models)
+		row = self.conn.execute('SELECT models_hash FROM catalogs WHERE site = ?', (site,)).fetchone()
+		self.conn.execute('INSERT OR REPLACE INTO catalogs VALUES (?, ?, ?, ?)', (site, site_name, models_hash, now or time.time()))
+		if row is not None and row['models_hash'] == models_hash:
+			return False
+		if isinstance(models, dict):
+			pairs = {(str(grp), m) for grp, names in models.items() if isinstance(names, list) for m in names}
+		else:
+			pairs = {('*', m.get('id', '') if isinstance(m, dict) else str(m)) for m in models}
+		self.conn.execute('DELETE FROM site_models WHERE site = ?', (site,))
+		self.conn.executemany('INSERT INTO site_models VALUES (?, ?, ?, ?)',
+							  [(site, grp, m, normalize_model(m)) for grp, m in sorted(pairs) if m])
+		return True
+
+	def catalog(self, site: str, max_age: float | None = None) -> dict | None:
+		"""站点模型目录 {分组: [模型]}（与 /api/models 的 data 同格式）；没有或超过 max_age 秒返回 None"""
+		row = self.conn.execute('SELECT updated_at FROM catalogs WHERE site = ?', (site,)).fetchone()
+		if row is None or (max_age is not None and time.time() - row['updated_at'] > max_age):
+			return None
+		models = {}
+		for r in self.conn.execute('SELECT grp, model FROM site_models WHERE site = ? ORDER BY grp, model', (site,)):
+			models.setdefault(r['grp'], []).append(r['model'])
+		return models
+
+	def find_model(self, name: str) -> list[dict]:
+		"""按规范化名称查可用的 Key（没有精确匹配时按子串匹配），无限额度优先、剩余额度降序。
+		令牌分组在站点目录里 → 该分组的模型；不在（空分组 / 目录按渠道分组）→ 站点全部模型"""
+		norm = normalize_model(name)
+		sql = (
+			'SELECT DISTINCT m.model, m.norm, t.site, c.site_name, t.account, t.grp, t.key, t.name, t.remain_quota, '
+			't.unlimited FROM site_models m JOIN tokens t ON t.site = m.site AND t.state = \'active\' '
+			'LEFT JOIN catalogs c ON c.site = m.site WHERE m.norm {} AND (t.grp = m.grp OR NOT EXISTS '
+			'(SELECT 1 FROM site_models g WHERE g.site = t.site AND g.grp = t.grp)) '
+			'ORDER BY t.unlimited DESC, t.remain_quota DESC, t.site, t.account')
+		rows = self.conn.execute(sql.format('= ?'), (norm,)).fetchall()
+		if not rows:
+			rows = self.conn.execute(sql.format("LIKE ? ESCAPE '\\'"), (f'%{_like_escape(norm)}%',)).fetchall()
+		return [dict(r) for r in rows]
+
+	def events(self, run_id: int | None = None) -> list[dict]:
+		"""某次运行的令牌事件（默认最近一次完成的运行），附带站点名"""
+		if run_id is None:
+			run = self.last_run()
+			if run is None:
+				return []
+			run_id = run['id']
+		rows = self.conn.execute(
+			'SELECT e.site, e.account, e.key, e.name, e.event, e.ts, a.site_name FROM token_events e '
+			'LEFT JOIN accounts a ON a.site = e.site AND a.account = e.account '
+			'WHERE e.run_id = ? ORDER BY e.site, e.account, e.rowid', (run_id,)).fetchall()
+		return [dict(r) for r in rows]
+
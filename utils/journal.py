@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+签到结果日志（JSON Lines，追加写入）
+
+每条结果追加一行到 .jsonl，运行过程中不再重写整个结果文件；
+阶段结束时 flush + fsync，运行结束后 compact() 生成旧版 checkin_results.json 格式（JSON 数组）。
+"""
+
+import json
+import os
+from typing import IO
+
+from utils.atomic import atomic_write
+from utils.tracing import tracer
+
+
+class ResultJournal:
+	"""追加式结果日志：缓冲写入，阶段边界 fsync，结束时压缩为 JSON 数组"""
+
+	def __init__(self, path: str, buffer_size: int = 64 * 1024):
+		self.path = path
+		self.buffer_size = buffer_size
+		self._fp: IO[str] | None = None
+		self.count = 0
+
+	def open(self, truncate: bool = True):
+		"""打开日志文件。truncate=True 时清空上一轮运行的残留"""
+		if self._fp is not None:
+			return
+		self._fp = open(self.path, 'w' if truncate else 'a', encoding='utf-8', buffering=self.buffer_size)
+		self.count = 0
+
+	def append(self, entry: dict):
+		"""追加一条记录（仅写入缓冲区，不保证落盘）"""
+		if self._fp is None:
+			self.open(truncate=False)
+		self._fp.write(json.dumps(entry, ensure_ascii=False))
+		self._fp.write('\n')
+		self.count += 1
+
+	def flush(self, sync: bool = True):
+		"""刷新缓冲区；sync=True 时 fsync 落盘（阶段边界调用）"""
+		if self._fp is None:
+			return
+		self._fp.flush()
+		if sync:
+			os.fsync(self._fp.fileno())
+
+	def close(self):
+		if self._fp is None:
+			return
+		self.flush(sync=True)
+		self._fp.close()
+		self._fp = None
+
+	def read(self) -> list[dict]:
+		"""读取日志中的全部记录，忽略末尾未写完的半行（进程被杀时可能出现）"""
+		entries = []
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				for line in f:
+					line = line.strip()
+					if not line:
+						continue
+					try:
+						entries.append(json.loads(line))
+					except json.JSONDecodeError:
+						continue
+		except FileNotFoundError:
+			pass
+		return entries
+
+	def compact(self, target: str) -> int:
+		"""把日志压缩为 JSON 数组写入 target（原子替换），返回记录数"""
+		self.flush(sync=True)
+		entries = self.read()
+		with tracer.span('compact results', cat='io', entries=len(entries)):
+			atomic_write(target, json.dumps(entries, indent=2, ensure_ascii=False))
+		return len(entries)
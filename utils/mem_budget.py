@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+按内存预算动态调整浏览器并发数（替代"内存 < 3GB 就串行"的二元开关）
+
+- 从 /proc/meminfo 读取 MemAvailable，从 /proc/<pid>/status 读取 Chrome 进程 RSS
+- 每个浏览器 worker 的开销按已观测到的 Chrome RSS / 活跃 worker 数估算，无观测值时用默认值
+- 容量 = 活跃 worker + (MemAvailable - 预留) / 单 worker 开销，限制在 [1, max_workers]
+- 每次获取/释放槽位时重新采样，运行中随内存变化增减并发，其余任务排队
+- 非 Linux（无 /proc）时不限制，容量 = max_workers
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+CHROME_NAMES = ('chrome', 'chromium', 'headless_shell')
+
+
+def read_meminfo(path: str = '/proc/meminfo') -> dict:
+	"""读取 /proc/meminfo，返回 {字段: kB}"""
+	result = {}
+	with open(path) as f:
+		for line in f:
+			name, _, rest = line.partition(':')
+			parts = rest.split()
+			if parts and parts[0].isdigit():
+				result[name] = int(parts[0])
+	return result
+
+
+def chrome_rss_mb(proc_root: str = '/proc') -> float:
+	"""所有 Chrome/Chromium 进程的 RSS 之和（MB）。多进程共享页面会被重复计算，结果偏保守"""
+	total_kb = 0
+	try:
+		pids = [p for p in os.listdir(proc_root) if p.isdigit()]
+	except OSError:
+		return 0.0
+	for pid in pids:
+		try:
+			with open(os.path.join(proc_root, pid, 'comm')) as f:
+				comm = f.read().strip().lower()
+			if not any(name in comm for name in CHROME_NAMES):
+				continue
+			with open(os.path.join(proc_root, pid, 'status')) as f:
+				for line in f:
+					if line.startswith('VmRSS:'):
+						total_kb += int(line.split()[1])
+						break
+		except (OSError, ValueError, IndexError):
+			continue
+	return total_kb / 1024
+
+
+def sample_memory() -> tuple[float, float] | None:
+	"""返回 (MemAvailable MB, Chrome RSS MB)；无 /proc 时返回 None"""
+	try:
+		available_kb = read_meminfo().get('MemAvailable')
+	except OSError:
+		return None
+	if available_kb is None:
+		return None
+	return available_kb / 1024, chrome_rss_mb()
+
+
+class MemoryBudget:
+	"""浏览器 worker 的内存预算调度器。fixed 不为空时容量固定（如 --serial → 1）"""
+
+	def __init__(self, max_workers: int, per_worker_mb: float = 350, reserve_mb: float = 400,
+				 fixed: int | None = None, sampler=sample_memory):
+		self.max_workers = max(1, max_workers)
+		self.per_worker_mb = per_worker_mb
+		self.reserve_mb = reserve_mb
+		self.fixed = fixed
+		self.sampler = sampler
+		self.active = 0
+		self.peak = 0
+		self.last_capacity = None
+		self._cond = asyncio.Condition()
+
+	def worker_cost_mb(self, chrome_mb: float) -> float:
+		"""单 worker 开销：有活跃 worker 时用实测均值，且不低于默认值的一半"""
+		if self.active and chrome_mb:
+			return max(chrome_mb / self.active, self.per_worker_mb / 2)
+		return self.per_worker_mb
+
+	def capacity(self) -> int:
+		if self.fixed is not None:
+			return max(1, self.fixed)
+		sample = self.sampler()
+		if sample is None:
+			return self.max_workers
+		available_mb, chrome_mb = sample
+		extra = int(max(0.0, available_mb - self.reserve_mb) // self.worker_cost_mb(chrome_mb))
+		capacity = min(self.max_workers, max(1, self.active + extra))
+		self.last_capacity = capacity
+		return capacity
+
+	@asynccontextmanager
+	async def slot(self, poll_interval: float = 2.0):
+		"""占用一个 worker 槽位。容量不足时排队，定期重新采样内存"""
+		async with self._cond:
+			while self.active and self.active >= self.capacity():
+				try:
+					await asyncio.wait_for(self._cond.wait(), poll_interval)
+				except asyncio.TimeoutError:
+					pass
+			self.active += 1
+			self.peak = max(self.peak, self.active)
+		try:
+			yield
+		finally:
+			async with self._cond:
+				self.active -= 1
+				self._cond.notify_all()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Prometheus 指标（不依赖 prometheus_client）
+
+- Counter / Gauge / Histogram，按标签分组，render() 输出 Prometheus 文本格式（0.0.4，OpenMetrics 兼容子集）
+- 一次性运行：write_textfile() 原子写入 node_exporter textfile collector 目录（*.prom）
+- 常驻模式：状态接口的 GET /metrics 直接返回 render()
+"""
+
+import math
+import time
+from contextlib import contextmanager
+
+from utils.atomic import atomic_write
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value) -> str:
+	return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+	if value == math.inf:
+		return '+Inf'
+	if float(value).is_integer():
+		return str(int(value))
+	return repr(float(value))
+
+
+def _label_str(names: tuple, values: tuple, extra: tuple = ()) -> str:
+	pairs = [*zip(names, values), *extra]
+	if not pairs:
+		return ''
+	return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class _Metric:
+	"""指标基类；子类定义 type 和 samples() → [(指标名后缀, 标签值, 额外标签, 数值), ...]"""
+
+	type = ''
+
+	def __init__(self, name: str, help: str, labels: tuple = ()):
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labels)
+		self._values: dict[tuple, object] = {}
+
+	def _key(self, labels: dict) -> tuple:
+		if set(labels) != set(self.labelnames):
+			raise ValueError(f'{self.name}: 标签应为 {self.labelnames}，实际 {tuple(labels)}')
+		return tuple(str(labels[n]) for n in self.labelnames)
+
+	def clear(self):
+		self._values.clear()
+
+	def render(self) -> list[str]:
+		lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+		for suffix, values, extra, value in self.samples():
+			lines.append(f'{self.name}{suffix}{_label_str(self.labelnames, values, extra)} {_format_value(value)}')
+		return lines
+
+
+class Counter(_Metric):
+	type = 'counter'
+
+	def inc(self, amount: float = 1, **labels):
+		key = self._key(labels)
+		self._values[key] = self._values.get(key, 0) + amount
+
+	def get(self, **labels) -> float:
+		return self._values.get(self._key(labels), 0)
+
+	def samples(self):
+		# Prometheus 文本格式中 counter 名应以 _total 结尾，由调用方命名
+		return [('', key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+	type = 'gauge'
+
+	def set(self, value: float, **labels):
+		self._values[self._key(labels)] = value
+
+	def get(self, **labels) -> float | None:
+		return self._values.get(self._key(labels))
+
+	def samples(self):
+		return [('', key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+	type = 'histogram'
+
+	def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+		super().__init__(name, help, labels)
+		self.buckets = tuple(sorted(buckets))
+
+	def observe(self, value: float, **labels):
+		key = self._key(labels)
+		state = self._values.get(key)
+		if state is None:
+			state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+		for i, bound in enumerate(self.buckets):
+			if value <= bound:
+				state['counts'][i] += 1
+		state['sum'] += value
+		state['count'] += 1
+
+	@contextmanager
+	def time(self, **labels):
+		"""计时上下文，退出时 observe 耗时（秒）。yield 标签字典，块内可改写（如填入结果）"""
+		start = time.monotonic()
+		try:
+			yield labels
+		finally:
+			self.observe(time.monotonic() - start, **labels)
+
+	def count(self, **labels) -> int:
+		state = self._values.get(self._key(labels))
+		return state['count'] if state else 0
+
+	def samples(self):
+		out = []
+		for key, state in sorted(self._values.items()):
+			for bound, n in zip(self.buckets, state['counts']):
+				out.append(('_bucket', key, (('le', _format_value(bound)),), n))
+			out.append(('_bucket', key, (('le', '+Inf'),), state['count']))
+			out.append(('_sum', key, (), state['sum']))
+			out.append(('_count', key, (), state['count']))
+		return out
+
+
+class Registry:
+	"""指标注册表"""
+
+	def __init__(self, prefix: str = ''):
+		self.prefix = prefix
+		self._metrics: dict[str, _Metric] = {}
+
+	def _register(self, metric: _Metric) -> _Metric:
+		if metric.name in self._metrics:
+			raise ValueError(f'指标重复注册: {metric.name}')
+		self._metrics[metric.name] = metric
+		return metric
+
+	def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+		return self._register(Counter(self.prefix + name, help, labels))
+
+	def gauge(self, name: str, help: str, labels: tuple = ()) -> Gauge:
+		return self._register(Gauge(self.prefix + name, help, labels))
+
+	def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+		return self._register(Histogram(self.prefix + name, help, labels, buckets))
+
+	def render(self) -> str:
+		lines = []
+		for metric in self._metrics.values():
+			lines.extend(metric.render())
+		return '\n'.join(lines) + '\n'
+
+	def write_textfile(self, path: str):
+		"""原子写入 textfile collector 文件（node_exporter 只读取完整的 .prom 文件）"""
+		atomic_write(path, self.render(), mode=0o644, keep_mode=False)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+无浏览器 LinuxDO OAuth：持有有效 linux.do / connect.linux.do cookie 时，用 httpx 复现授权重定向链
+
+  站点 /api/oauth/state → connect.linux.do/oauth2/authorize → (linux.do SSO) → 站点 /api/oauth/linuxdo?code=...
+
+- 每一跳手动跟随重定向，用独立 cookie jar 携带各域名 cookie（共享连接池本身不保存 cookie）
+- 遇到 Cloudflare 质询、授权确认页（需点"允许"）或被要求重新登录时返回 fallback，由调用方改走浏览器：
+  site_cf / linuxdo_cf（CF 质询）、consent（授权确认页）、login_required（linux.do cookie 失效）
+- 回调响应的 data 为字符串时是 access_token，为含 id 的对象时是用户信息
+"""
+
+from http.cookiejar import Cookie, CookieJar, DefaultCookiePolicy
+from urllib.parse import quote, urljoin, urlsplit
+
+import httpx
+
+OAUTH_AUTHORIZE_URL = 'https://connect.linux.do/oauth2/authorize'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+MAX_REDIRECTS = 10
+CF_MARKERS = ('Just a moment', 'challenge-platform', 'cf-chl', '请稍候')
+
+
+def build_jar(browser_cookies: list) -> httpx.Cookies:
+	"""Playwright 格式的 cookie 列表（ctx.cookies() / storage state）→ httpx cookie jar。
+	Playwright 中无前导点的 domain 是 host-only cookie，不能发给子域名"""
+	jar = httpx.Cookies(CookieJar(DefaultCookiePolicy(strict_ns_domain=DefaultCookiePolicy.DomainStrictNonDomain)))
+	for c in browser_cookies:
+		domain = c.get('domain', '')
+		expires = c.get('expires')
+		jar.jar.set_cookie(Cookie(
+			version=0, name=c['name'], value=c['value'], port=None, port_specified=False,
+			domain=domain, domain_specified=domain.startswith('.'), domain_initial_dot=domain.startswith('.'),
+			path=c.get('path', '/'), path_specified=True, secure=bool(c.get('secure')),
+			expires=int(expires) if expires and expires > 0 else None, discard=False,
+			comment=None, comment_url=None, rest={},
+		))
+	return jar
+
+
+def _is_cf_challenge(resp: httpx.Response) -> bool:
+	if resp.headers.get('cf-mitigated') == 'challenge':
+		return True
+	if resp.status_code in (403, 503) and 'text/html' in resp.headers.get('content-type', ''):
+		return any(m in resp.text for m in CF_MARKERS)
+	return False
+
+
+def _session_from_jar(jar: httpx.Cookies, domain_host: str, root_host: str) -> str | None:
+	for cookie in jar.jar:
+		if cookie.name != 'session':
+			continue
+		c_domain = cookie.domain.lstrip('.')
+		if domain_host in c_domain or c_domain.endswith(root_host):
+			return cookie.value
+	return None
+
+
+def parse_callback_data(data) -> tuple[str | None, str | None]:
+	"""回调 data → (access_token, user_id)"""
+	if isinstance(data, str) and len(data) > 10:
+		return data, None
+	if isinstance(data, dict) and data.get('id') is not None:
+		return None, str(data['id'])
+	return None, None
+
+
+async def oauth_login_http(client: httpx.AsyncClient, domain: str, client_id: str, browser_cookies: list,
+						   root_host: str | None = None, timeout: float = 15.0) -> dict:
+	"""走完 OAuth 重定向链。成功返回 {'session', 'access_token', 'user_id'}，
+	需要浏览器时返回 {'fallback': 原因}，其他失败返回 {'error': 原因}"""
+	domain_host = urlsplit(domain).hostname or domain
+	root_host = root_host or domain_host
+	jar = build_jar(browser_cookies)
+	headers = {'User-Agent': USER_AGENT, 'Accept': 'application/json, text/html;q=0.9, */*;q=0.8'}
+
+	async def send(url):
+		request = client.build_request('GET', url, headers=headers, timeout=timeout)
+		jar.set_cookie_header(request)
+		resp = await client.send(request, follow_redirects=False)
+		jar.extract_cookies(resp)
+		return resp
+
+	try:
+		# 1. 获取 state（state 存在站点 session 中，需带着站点 cookie 走到回调）
+		resp = await send(f'{domain}/api/oauth/state')
+		if _is_cf_challenge(resp):
+			return {'fallback': 'site_cf'}
+		try:
+			state = resp.json().get('data')
+		except Exception:
+			return {'fallback': f'state_http_{resp.status_code}'}
+		if not state:
+			return {'error': 'state 为空'}
+		# state 接口下发的 session 只保存 state，回调后必须换成新的 session
+		state_session = _session_from_jar(jar, domain_host, root_host)
+
+		# 2. authorize → 跟随重定向直到回调
+		redirect_uri = quote(f'{domain}/api/oauth/linuxdo', safe='')
+		url = (f'{OAUTH_AUTHORIZE_URL}?response_type=code&client_id={client_id}'
+			   f'&redirect_uri={redirect_uri}&scope=read+write&state={state}')
+		for _ in range(MAX_REDIRECTS):
+			resp = await send(url)
+			if _is_cf_challenge(resp):
+				host = urlsplit(url).hostname or ''
+				return {'fallback': 'linuxdo_cf' if host.endswith('linux.do') else 'site_cf'}
+			if resp.status_code in (301, 302, 303, 307, 308):
+				url = urljoin(url, resp.headers.get('location', ''))
+				parts = urlsplit(url)
+				if parts.hostname and parts.hostname.endswith('linux.do') and parts.path.startswith('/login'):
+					return {'fallback': 'login_required'}
+				continue
+			break
+		else:
+			return {'error': '重定向次数过多'}
+
+		# 3. 回调：/api/oauth/linuxdo 返回 JSON 并下发 session
+		parts = urlsplit(str(resp.request.url))
+		if parts.hostname and parts.hostname.endswith('linux.do'):
+			# 停在 connect.linux.do / linux.do 的 HTML 页面：授权确认页
+			return {'fallback': 'consent'}
+		if '/api/oauth/' not in parts.path:
+			return {'error': f'意外落点: {parts.hostname}{parts.path}'[:80]}
+		try:
+			body = resp.json()
+		except Exception:
+			return {'error': f'回调非 JSON (HTTP {resp.status_code})'}
+		if not body.get('success'):
+			return {'error': (body.get('message') or '回调失败')[:80]}
+		session = _session_from_jar(jar, domain_host, root_host)
+		if not session or session == state_session:
+			return {'error': '回调未下发 session'}
+		access_token, user_id = parse_callback_data(body.get('data'))
+		return {'session': session, 'access_token': access_token, 'user_id': user_id}
+	except (httpx.ConnectError, httpx.ConnectTimeout):
+		return {'error': '站点无法连接'}
+	except Exception as e:
+		return {'error': str(e)[:80]}
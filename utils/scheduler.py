@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+常驻模式的每日计划（类 cron）+ 站点错峰
+
+- 每天若干固定时刻（如 08:00,20:00）为一个时段，每个站点在时段开始后延后 [0, jitter) 秒触发
+- 延后量由 (站点, 时段) 哈希得到：同一时段内各站点错开，进程重启后触发时间不变
+- 调度方只需维护一个游标：fire_times(keys, 游标, now) 即为到期站点，执行后把游标推进到 now
+"""
+
+import hashlib
+from datetime import date, datetime, time, timedelta
+
+
+def parse_times(spec: str) -> list[tuple[int, int]]:
+	"""'08:00,20:30' → [(8, 0), (20, 30)]，格式错误抛 ValueError"""
+	times = set()
+	for part in spec.split(','):
+		part = part.strip()
+		if not part:
+			continue
+		hour, _, minute = part.partition(':')
+		h, m = int(hour), int(minute or 0)
+		if not (0 <= h < 24 and 0 <= m < 60):
+			raise ValueError(f'无效时间: {part}')
+		times.add((h, m))
+	if not times:
+		raise ValueError('计划时间为空')
+	return sorted(times)
+
+
+def site_offset(site_key: str, slot: datetime, jitter: float) -> float:
+	"""站点在该时段内的延后秒数，范围 [0, jitter)"""
+	if jitter <= 0:
+		return 0.0
+	digest = hashlib.sha256(f'{site_key}@{slot:%Y-%m-%d %H:%M}'.encode()).digest()
+	return int.from_bytes(digest[:8], 'big') / 2 ** 64 * jitter
+
+
+class DailySchedule:
+	"""每日固定时刻 + 每站点确定性错峰"""
+
+	def __init__(self, times: list[tuple[int, int]], jitter: float = 0.0):
+		self.times = sorted(set(times))
+		self.jitter = max(jitter, 0.0)
+
+	def slots(self, day: date) -> list[datetime]:
+		return [datetime.combine(day, time(h, m)) for h, m in self.times]
+
+	def fire_times(self, keys, start: datetime, end: datetime) -> list[tuple[datetime, str]]:
+		"""start < 触发时间 <= end 的 [(触发时间, 站点), ...]，按时间排序"""
+		fires = []
+		# 前一天的时段加上 jitter 可能跨到 start 当天
+		day = (start - timedelta(seconds=self.jitter)).date()
+		while day <= end.date():
+			for slot in self.slots(day):
+				for key in keys:
+					fire_at = slot + timedelta(seconds=site_offset(key, slot, self.jitter))
+					if start < fire_at <= end:
+						fires.append((fire_at, key))
+			day += timedelta(days=1)
+		fires.sort()
+		return fires
+
+	def next_fire(self, keys, after: datetime) -> datetime | None:
+		"""after 之后最近的一次触发时间，没有站点时返回 None"""
+		fires = self.fire_times(keys, after, after + timedelta(days=1, seconds=self.jitter + 1))
+		return fires[0][0] if fires else None
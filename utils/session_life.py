@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+站点 session 寿命学习与主动续期
+
+- Phase 1 发现 session 失效时，把失效时的 session 年龄（距 session_updated 的天数）记为该站点的一个样本
+- 取样本的下四分位数作为保守的寿命估计（样本不足时不估计，不主动续期）
+- 不足 MIN_SAMPLE_DAYS 天的样本不采信（当天刚刷新就“失效”多半是挑战页 / 偶发错误），
+  估计值至少为 margin + 1 天，避免每次续期都判定到期
+- 续期模式（--refresh）在低峰时段对年龄接近寿命、或已失效被清空的 session 重新 OAuth，
+  白天签到基本只走 httpx 快速通道
+"""
+
+from datetime import date, datetime
+
+MAX_SAMPLES = 20  # 每个站点保留最近的样本数
+MIN_SAMPLES = 2  # 少于该样本数不估计寿命
+REFRESH_MARGIN_DAYS = 1  # 年龄达到 寿命 - margin 即续期
+MIN_SAMPLE_DAYS = 1  # 样本年龄下限（天）
+
+
+def _parse_date(value) -> date | None:
+	try:
+		return datetime.strptime(value, '%Y-%m-%d').date()
+	except (TypeError, ValueError):
+		return None
+
+
+def session_age(acc_info: dict, today: date) -> int | None:
+	"""session 年龄（天），没有 session_updated 时返回 None"""
+	updated = _parse_date(acc_info.get('session_updated'))
+	if updated is None:
+		return None
+	return max((today - updated).days, 0)
+
+
+def add_sample(samples: list | None, age: int, max_samples: int = MAX_SAMPLES) -> list:
+	"""追加一个失效样本，只保留最近 max_samples 个；不足 MIN_SAMPLE_DAYS 天的样本忽略"""
+	if age < MIN_SAMPLE_DAYS:
+		return list(samples or [])
+	return ([*(samples or []), age])[-max_samples:]
+
+
+def estimate_lifetime(samples: list | None, min_samples: int = MIN_SAMPLES,
+					  margin: int = REFRESH_MARGIN_DAYS) -> int | None:
+	"""寿命估计（天）：样本下四分位数，至少 margin + 1。每天只运行一次，失效样本是上界，取偏小值更稳妥。
+	旧数据中不足 MIN_SAMPLE_DAYS 天的样本同样忽略"""
+	ordered = sorted(age for age in samples or [] if age >= MIN_SAMPLE_DAYS)
+	if len(ordered) < min_samples:
+		return None
+	return max(ordered[(len(ordered) - 1) // 4], margin + 1)
+
+
+def refresh_reason(site_data: dict, acc_info: dict, today: date, margin: int = REFRESH_MARGIN_DAYS) -> str | None:
+	"""该账号在该站点是否需要续期，需要时返回原因"""
+	if not acc_info.get('session'):
+		return 'session 缺失'
+	age = session_age(acc_info, today)
+	lifetime = estimate_lifetime(site_data.get('session_lifetimes'), margin=margin)
+	if age is None or lifetime is None:
+		return None
+	if age >= lifetime - margin:
+		return f'已用 {age} 天 / 寿命约 {lifetime} 天'
+	return None
+
+
+def sessions_due(sites: list, label: str, today: date, margin: int = REFRESH_MARGIN_DAYS) -> list:
+	"""从 [(site_key, site_data), ...] 中挑出需要续期的站点: [(site_key, site_data, reason), ...]。
+	只考虑可 OAuth 的站点（已知 client_id 且未确认不可达）"""
+	due = []
+	for site_key, site_data in sites:
+		if not site_data.get('client_id') or site_data.get('alive') is False:
+			continue
+		acc_info = site_data.get('accounts', {}).get(label, {})
+		reason = refresh_reason(site_data, acc_info, today, margin)
+		if reason:
+			due.append((site_key, site_data, reason))
+	return due
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+site_info.json 持久化层
+
+- 写合并：字段变更只标记 dirty，由防抖定时器或阶段结束时统一落盘
+- 摘要计数增量维护：每次 checkin_status 迁移时调整计数，不再每次全量扫描
+- 原子写入：utils.atomic.atomic_write，进程中断不会留下半截 JSON，保留原文件权限
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+from utils.atomic import atomic_write
+from utils.tracing import tracer
+
+STATUS_BUCKETS = {
+	'success': 'success',
+	'already_checked': 'already_checked',
+	'failed': 'failed',
+}
+
+
+def _empty_info() -> dict:
+	return {'_meta': {'last_run': None, 'checkin_date': None}}
+
+
+class SiteInfoStore:
+	"""site_info.json 的内存副本 + 合并写入"""
+
+	def __init__(self, path: str, accounts_count: int = 0, debounce: float = 2.0):
+		self.path = path
+		self.accounts_count = accounts_count
+		self.debounce = debounce
+		self.info: dict = _empty_info()
+		self.dirty_sites: set[str] = set()
+		self.flush_count = 0
+		self._dirty = False
+		self._timer: asyncio.TimerHandle | None = None
+		self._counts = {'total_tasks': 0, 'success': 0, 'already_checked': 0, 'failed': 0, 'pending': 0}
+		self._sites = {'active_sites': 0, 'skipped_sites': 0}
+
+	# ===================== 加载 =====================
+	def load(self) -> dict:
+		"""从磁盘加载，不存在或损坏则返回空结构"""
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				self.info = json.load(f)
+		except (FileNotFoundError, json.JSONDecodeError):
+			self.info = _empty_info()
+		self.info.setdefault('_meta', {'last_run': None, 'checkin_date': None})
+		self.rebuild_summary()
+		return self.info
+
+	# ===================== 摘要计数 =====================
+	@staticmethod
+	def _site_counted(site_data) -> bool:
+		return isinstance(site_data, dict) and not site_data.get('_removed') and not site_data.get('skip')
+
+	def rebuild_summary(self):
+		"""全量重算摘要（加载或站点结构变化后调用）"""
+		counts = dict.fromkeys(self._counts, 0)
+		active = skipped = 0
+		for key, val in self.info.items():
+			if key == '_meta' or not isinstance(val, dict):
+				continue
+			if val.get('_removed'):
+				continue
+			if val.get('skip'):
+				skipped += 1
+				continue
+			active += 1
+			for acc_val in val.get('accounts', {}).values():
+				if acc_val.get('_excluded'):
+					continue
+				counts['total_tasks'] += 1
+				counts[STATUS_BUCKETS.get(acc_val.get('checkin_status', 'pending'), 'pending')] += 1
+		self._counts = counts
+		self._sites = {'active_sites': active, 'skipped_sites': skipped}
+		self._write_summary()
+
+	def transition(self, site_key: str, label: str, old: str | None, new: str | None):
+		"""账号状态迁移时增量调整计数。old=None 表示此前不存在该账号条目"""
+		site_data = self.info.get(site_key)
+		if not self._site_counted(site_data):
+			return
+		acc = site_data.get('accounts', {}).get(label, {})
+		if acc.get('_excluded'):
+			return
+		if old is None:
+			self._counts['total_tasks'] += 1
+		else:
+			self._counts[STATUS_BUCKETS.get(old, 'pending')] -= 1
+		if new is None:
+			self._counts['total_tasks'] -= 1
+		else:
+			self._counts[STATUS_BUCKETS.get(new, 'pending')] += 1
+		self._write_summary()
+
+	def _write_summary(self):
+		c = self._counts
+		self.info['_meta']['summary'] = {
+			'total_sites': self._sites['active_sites'] + self._sites['skipped_sites'],
+			'active_sites': self._sites['active_sites'],
+			'skipped_sites': self._sites['skipped_sites'],
+			'accounts': self.accounts_count,
+			'total_tasks': c['total_tasks'],
+			'done': c['success'] + c['already_checked'] + c['failed'],
+			'success': c['success'],
+			'already_checked': c['already_checked'],
+			'failed': c['failed'],
+			'pending': c['pending'],
+		}
+
+	# ===================== 写入 =====================
+	def mark_dirty(self, site_key: str | None = None):
+		"""标记待写入。事件循环内由防抖定时器合并落盘，无事件循环时立即写入"""
+		self._dirty = True
+		if site_key:
+			self.dirty_sites.add(site_key)
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			self.flush()
+			return
+		if self._timer is None:
+			self._timer = loop.call_later(self.debounce, self._on_timer)
+
+	def _on_timer(self):
+		self._timer = None
+		self.flush()
+
+	def flush(self, force: bool = False):
+		"""立即落盘（阶段结束时调用）。无变更且未 force 时跳过"""
+		if self._timer is not None:
+			self._timer.cancel()
+			self._timer = None
+		if not self._dirty and not force:
+			return
+		self.info['_meta']['last_run'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+		with tracer.span('save site_info', cat='io', dirty_sites=len(self.dirty_sites)):
+			atomic_write(self.path, json.dumps(self.info, indent=2, ensure_ascii=False))
+		self._dirty = False
+		self.dirty_sites.clear()
+		self.flush_count += 1
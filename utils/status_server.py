@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+常驻模式的本地状态接口（asyncio.start_server 实现的极简 HTTP/1.1，跑在主事件循环上，无需线程）
+
+- 路由表 {(method, path): handler}，handler() 返回 dict（JSON）或 (状态码, content-type, body)
+- 每个连接只处理一个请求（Connection: close），默认只监听 127.0.0.1
+- Host 头必须是本机地址（防 DNS rebinding）；GET 以外的请求需 Authorization: Bearer <token>，
+  浏览器页面的跨域简单请求带不上该头，未配置 token 时一律拒绝
+"""
+
+import asyncio
+import hmac
+import json
+
+REASONS = {
+	200: 'OK', 202: 'Accepted', 401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found',
+	405: 'Method Not Allowed', 500: 'Internal Server Error',
+}
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '[::1]')
+
+
+class StatusServer:
+	"""本地 HTTP 状态接口"""
+
+	def __init__(self, routes: dict, host: str = '127.0.0.1', port: int = 0, timeout: float = 5.0,
+				 token: str | None = None, allowed_hosts: tuple = LOCAL_HOSTS):
+		self.routes = routes
+		self.host = host
+		self.port = port
+		self.timeout = timeout
+		self.token = token
+		self.allowed_hosts = allowed_hosts
+		self._server = None
+
+	async def start(self) -> int:
+		"""开始监听，返回实际端口（port=0 时由系统分配）"""
+		self._server = await asyncio.start_server(self._handle, self.host, self.port)
+		self.port = self._server.sockets[0].getsockname()[1]
+		return self.port
+
+	async def close(self):
+		if self._server is not None:
+			self._server.close()
+			await self._server.wait_closed()
+			self._server = None
+
+	def _authorize(self, method: str, headers: dict) -> int | None:
+		"""校验 Host 与 token，拒绝时返回状态码"""
+		host = headers.get('host', '').lower()
+		# 去掉端口；IPv6 形如 [::1]:8765
+		host = host[:host.find(']') + 1] if host.startswith('[') else host.split(':', 1)[0]
+		if host not in self.allowed_hosts:
+			return 403
+		if method != 'GET':
+			scheme, _, token = headers.get('authorization', '').partition(' ')
+			if not self.token or scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip(), self.token):
+				return 401
+		return None
+
+	def _dispatch(self, method: str, path: str, headers: dict | None = None) -> tuple[int, str, bytes]:
+		status = self._authorize(method, headers or {})
+		if status is not None:
+			return status, 'application/json', json.dumps({'error': REASONS[status]}).encode()
+		handler = self.routes.get((method, path))
+		if handler is None:
+			status = 405 if any(p == path for _, p in self.routes) else 404
+			return status, 'application/json', json.dumps({'error': REASONS[status]}).encode()
+		try:
+			result = handler()
+		except Exception as e:
+			return 500, 'application/json', json.dumps({'error': str(e)[:200]}).encode()
+		if isinstance(result, dict):
+			return 200, 'application/json', json.dumps(result, ensure_ascii=False, default=str).encode()
+		status, content_type, body = result
+		return status, content_type, body.encode() if isinstance(body, str) else body
+
+	async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+		try:
+			request_line = await asyncio.wait_for(reader.readline(), self.timeout)
+			# 读取请求头（不需要请求体）
+			headers = {}
+			while True:
+				line = await asyncio.wait_for(reader.readline(), self.timeout)
+				if line in (b'\r\n', b'\n', b''):
+					break
+				name, _, value = line.decode('latin-1').partition(':')
+				headers[name.strip().lower()] = value.strip()
+			parts = request_line.decode('latin-1').split()
+			if len(parts) < 2:
+				return
+			method, path = parts[0].upper(), parts[1].split('?', 1)[0]
+			status, content_type, body = self._dispatch(method, path, headers)
+			writer.write(
+				f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+				f'Content-Type: {content_type}; charset=utf-8\r\n'
+				f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+			)
+			await writer.drain()
+		except (asyncio.TimeoutError, ConnectionError):
+			pass
+		finally:
+			writer.close()
+			try:
+				await writer.wait_closed()
+			except Exception:
+				pass
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+轻量 span 追踪，导出 Chrome trace / Perfetto JSON（chrome://tracing 或 ui.perfetto.dev 打开）
+
+- tracer.span(name, cat, **attrs) 记录一段耗时（complete event，ph=X），attrs 写入 args
+- account / site / phase / method 随 contextvar 向内层 span 及 asyncio 子任务继承，
+  do_checkin_via_httpx 等底层函数的 span 无需显式传账号也能带上这些属性
+- 每个 asyncio task 一条泳道（tid），泳道名取首个带 account 的 span
+- @traced(name, cat, outcome=fn, bind=fn) 装饰异步函数，outcome(返回值) 作为结果标签
+"""
+
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils.atomic import atomic_write
+
+INHERITED_ATTRS = ('account', 'site', 'phase', 'method')
+
+_context: ContextVar[dict] = ContextVar('trace_context', default={})
+
+
+class Span:
+	"""进行中的 span，set() 追加属性（如 outcome）"""
+
+	__slots__ = ('name', 'cat', 'attrs', 'start')
+
+	def __init__(self, name: str, cat: str, attrs: dict, start: float):
+		self.name = name
+		self.cat = cat
+		self.attrs = attrs
+		self.start = start
+
+	def set(self, **attrs):
+		self.attrs.update(attrs)
+
+
+class Tracer:
+	"""收集 span，export() 写出 Chrome trace JSON"""
+
+	def __init__(self, enabled: bool = True, max_events: int = 200_000):
+		self.enabled = enabled
+		self.max_events = max_events
+		self.events: list[dict] = []
+		self.dropped = 0
+		self._t0 = time.perf_counter()
+		self._lanes: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+		self._lane_names: dict[int, str] = {}
+		self._next_lane = 1
+
+	def reset(self):
+		"""清空已记录的 span（常驻模式每轮导出后调用）"""
+		self.events = []
+		self.dropped = 0
+		self._t0 = time.perf_counter()
+		self._lanes = weakref.WeakKeyDictionary()
+		self._lane_names = {}
+		self._next_lane = 1
+
+	def _lane(self, attrs: dict) -> int:
+		try:
+			task = asyncio.current_task()
+		except RuntimeError:
+			task = None
+		if task is None:
+			return 0 if threading.current_thread() is threading.main_thread() else threading.get_ident()
+		lane = self._lanes.get(task)
+		if lane is None:
+			lane = self._lanes[task] = self._next_lane
+			self._next_lane += 1
+		if lane not in self._lane_names and attrs.get('account'):
+			self._lane_names[lane] = f'{attrs["account"]} ({task.get_name()})'
+		return lane
+
+	def _us(self, t: float) -> float:
+		return round((t - self._t0) * 1e6, 1)
+
+	@contextmanager
+	def span(self, name: str, cat: str = '', **attrs):
+		"""记录一段耗时。异常时写入 error 属性后继续抛出"""
+		if not self.enabled:
+			yield Span(name, cat, attrs, 0.0)
+			return
+		parent = _context.get()
+		merged = {**parent, **attrs}
+		inherited = {k: merged[k] for k in INHERITED_ATTRS if k in merged}
+		token = _context.set(inherited) if inherited != parent else None
+		span = Span(name, cat, merged, time.perf_counter())
+		try:
+			yield span
+		except BaseException as e:
+			span.attrs.setdefault('error', type(e).__name__)
+			raise
+		finally:
+			end = time.perf_counter()
+			if token is not None:
+				_context.reset(token)
+			self._emit(span, end)
+
+	def _emit(self, span: Span, end: float):
+		if len(self.events) >= self.max_events:
+			self.dropped += 1
+			return
+		self.events.append({
+			'name': span.name, 'cat': span.cat or 'default', 'ph': 'X',
+			'ts': self._us(span.start), 'dur': round((end - span.start) * 1e6, 1),
+			'pid': os.getpid(), 'tid': self._lane(span.attrs),
+			'args': {k: v if isinstance(v, (str, int, float, bool)) or v is None else str(v)
+					 for k, v in span.attrs.items()},
+		})
+
+	def instant(self, name: str, cat: str = '', **attrs):
+		"""瞬时事件（如熔断、跨天重置）"""
+		if not self.enabled or len(self.events) >= self.max_events:
+			return
+		self.events.append({
+			'name': name, 'cat': cat or 'default', 'ph': 'i', 's': 't',
+			'ts': self._us(time.perf_counter()), 'pid': os.getpid(), 'tid': self._lane(attrs),
+			'args': {**_context.get(), **attrs},
+		})
+
+	def to_dict(self) -> dict:
+		pid = os.getpid()
+		meta = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'checkin'}}]
+		meta += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': lane, 'args': {'name': name}}
+				 for lane, name in sorted(self._lane_names.items())]
+		return {
+			'traceEvents': meta + sorted(self.events, key=lambda e: e['ts']),
+			'displayTimeUnit': 'ms',
+			'otherData': {'dropped_events': self.dropped},
+		}
+
+	def export(self, path: str) -> int:
+		"""原子写出 Chrome trace JSON，返回 span 数（没有 span 时不写文件）"""
+		if not self.events:
+			return 0
+		atomic_write(path, json.dumps(self.to_dict(), ensure_ascii=False))
+		return len(self.events)
+
+
+tracer = Tracer()
+
+
+def traced(name: str, cat: str = '', outcome=None, bind=None, **attrs):
+	"""异步函数装饰器：整个调用包一个 span。
+	outcome(返回值) 写入 outcome 属性；bind(*args, **kwargs) 从调用参数取属性（如 account / site）"""
+
+	def decorator(fn):
+		@functools.wraps(fn)
+		async def wrapper(*args, **kwargs):
+			span_attrs = {**attrs, **bind(*args, **kwargs)} if bind is not None else attrs
+			with tracer.span(name, cat, **span_attrs) as span:
+				result = await fn(*args, **kwargs)
+				if outcome is not None:
+					try:
+						span.set(outcome=outcome(result))
+					except Exception:
+						pass
+				return result
+
+		return wrapper
+
+	return decorator
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+阿里云 WAF cookie 缓存（acw_tc / cdn_sec_tc / acw_sc__v2）
+
+- 按域名保存最近一次通过挑战得到的 cookie 及各自过期时间，跨账号、跨运行复用
+- acw_sc__v2 只由挑战参数 arg1 决定，按 arg1 记忆求解结果，同一挑战无需再次求解
+- 只有响应中出现新挑战时才失效（invalidate）
+"""
+
+import json
+import time
+
+from utils.atomic import atomic_write
+from utils.tracing import tracer
+
+# Set-Cookie 未给出过期时间时的默认寿命（秒）
+DEFAULT_LIFETIMES = {'acw_tc': 1800, 'cdn_sec_tc': 1800, 'acw_sc__v2': 3600}
+FALLBACK_LIFETIME = 1800
+MAX_SOLUTIONS = 32  # 每个域名保留的 arg1 → acw_sc__v2 记忆条数
+
+
+class WafCookieCache:
+	"""WAF cookie 持久化缓存，文件与 site_info.json 放在同一目录"""
+
+	def __init__(self, path: str):
+		self.path = path
+		self._data: dict | None = None
+
+	@property
+	def data(self) -> dict:
+		if self._data is None:
+			try:
+				with open(self.path, 'r', encoding='utf-8') as f:
+					self._data = json.load(f)
+			except (FileNotFoundError, json.JSONDecodeError):
+				self._data = {}
+		return self._data
+
+	def save(self):
+		with tracer.span('save waf_cookies', cat='io'):
+			atomic_write(self.path, json.dumps(self.data, indent=2, ensure_ascii=False))
+
+	def get(self, domain: str, now: float | None = None) -> dict | None:
+		"""返回该域名仍全部有效的 cookie，任一过期则返回 None"""
+		now = now or time.time()
+		entry = self.data.get(domain)
+		if not entry or not entry.get('cookies'):
+			return None
+		cookies = {}
+		for name, c in entry['cookies'].items():
+			if c.get('expires') and c['expires'] <= now:
+				return None
+			cookies[name] = c['value']
+		return cookies
+
+	def solution(self, domain: str, arg1: str | None) -> dict | None:
+		"""查找同一 arg1 已求解的 cookie（acw_sc__v2 由 arg1 唯一确定）"""
+		if not arg1:
+			return None
+		return self.data.get(domain, {}).get('solutions', {}).get(arg1)
+
+	def put(self, domain: str, cookies: dict, expires: dict | None = None, arg1: str | None = None,
+			solved: dict | None = None, now: float | None = None):
+		"""写入一组 WAF cookie。expires: {name: 过期时间戳}，缺省按 DEFAULT_LIFETIMES 计算"""
+		now = now or time.time()
+		expires = expires or {}
+		entry = self.data.setdefault(domain, {})
+		entry['cookies'] = {
+			name: {
+				'value': value,
+				'expires': expires.get(name) or now + DEFAULT_LIFETIMES.get(name, FALLBACK_LIFETIME),
+			}
+			for name, value in cookies.items()
+		}
+		entry['updated'] = int(now)
+		if arg1:
+			entry['arg1'] = arg1
+			if solved:
+				solutions = entry.setdefault('solutions', {})
+				solutions[arg1] = solved
+				while len(solutions) > MAX_SOLUTIONS:
+					solutions.pop(next(iter(solutions)))
+		self.save()
+
+	def invalidate(self, domain: str):
+		"""响应中出现新挑战：丢弃该域名的 cookie（保留 arg1 求解记忆）"""
+		entry = self.data.get(domain)
+		if entry and entry.get('cookies'):
+			entry['cookies'] = {}
+			self.save()
+
+
+def cookie_expiries(response) -> dict:
+	"""从 httpx 响应（含重定向链 history）的 Set-Cookie 中提取 {name: 过期时间戳}（无过期时间的不返回）"""
+	result = {}
+	for resp in (*response.history, response):
+		for cookie in resp.cookies.jar:
+			if cookie.expires:
+				result[cookie.name] = cookie.expires
+	return result
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+WAF 挑战求解：纯 Python 快速路径 + 常驻 Node.js 进程池
+
+- 标准阿里云 acw_sc__v2 挑战（40 位十六进制 arg1 → 按 posList 重排 → 与固定 mask 异或）直接用 Python 计算
+- 无法识别的变种回退到 Node.js
+- 每个 worker 是一个 `node solve_waf.js --server` 进程，通过 stdin/stdout JSON 行通信
+- 每个任务有超时；超时或进程退出（反调试死循环卡死）时自动重启 worker
+- solve() 为同步接口，solve_async() 为协程接口（在线程中执行，不阻塞事件循环）
+"""
+
+import asyncio
+import itertools
+import json
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+_SCRIPT_RE = re.compile(r'<script[^>]*>([\s\S]*?)</script>', re.IGNORECASE)
+_ARG1_RE = re.compile(r'arg1\s*=\s*[\'"]([0-9A-Za-z]+)[\'"]')
+_STANDARD_ARG1_RE = re.compile(r'[0-9A-Fa-f]{40}')
+
+# 标准 acw_sc__v2 挑战的重排表（1 起始下标）与异或掩码
+ACW_POS_LIST = [
+	0xf, 0x23, 0x1d, 0x18, 0x21, 0x10, 0x1, 0x26, 0xa, 0x9, 0x13, 0x1f, 0x28, 0x1b, 0x16, 0x17, 0x19, 0xd, 0x6, 0xb,
+	0x27, 0x12, 0x14, 0x8, 0xe, 0x15, 0x20, 0x1a, 0x2, 0x1e, 0x7, 0x4, 0x11, 0x5, 0x3, 0x1c, 0x22, 0x25, 0xc, 0x24,
+]
+ACW_MASK = '3000176000856006061501533003690027800375'
+
+
+def extract_challenge(html: str) -> tuple[str, str | None] | None:
+	"""识别 WAF 挑战页，返回 (挑战脚本, arg1)；不是挑战页返回 None"""
+	if '<script' not in html or 'arg1' not in html:
+		return None
+	scripts = _SCRIPT_RE.findall(html)
+	if not scripts:
+		return None
+	script = next((s for s in scripts if 'arg1' in s), scripts[0])
+	m = _ARG1_RE.search(script)
+	return script, (m.group(1) if m else None)
+
+
+def solve_acw_sc_v2(arg1: str) -> str:
+	"""标准挑战的 acw_sc__v2 计算：arg1 按 ACW_POS_LIST 重排后与 ACW_MASK 逐字节异或"""
+	permuted = ''.join(arg1[pos - 1] for pos in ACW_POS_LIST)
+	return ''.join(
+		f'{int(permuted[i:i + 2], 16) ^ int(ACW_MASK[i:i + 2], 16):02x}'
+		for i in range(0, min(len(permuted), len(ACW_MASK)), 2)
+	)
+
+
+def solve_native(script: str) -> dict | None:
+	"""识别标准挑战并直接计算 cookie；不是标准形态（arg1 非 40 位十六进制）返回 None"""
+	m = _ARG1_RE.search(script)
+	if not m or not _STANDARD_ARG1_RE.fullmatch(m.group(1)):
+		return None
+	return {'acw_sc__v2': solve_acw_sc_v2(m.group(1))}
+
+
+class _NodeWorker:
+	"""单个常驻 node 进程"""
+
+	def __init__(self, node: str, script_path: str):
+		self.node = node
+		self.script_path = script_path
+		self.proc: subprocess.Popen | None = None
+		self._lines: queue.Queue = queue.Queue()
+		self._ids = itertools.count(1)
+		self.restarts = 0
+
+	def _start(self):
+		self.proc = subprocess.Popen(
+			[self.node, self.script_path, '--server'],
+			stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE,
+			stderr=subprocess.DEVNULL,
+			text=True,
+			encoding='utf-8',
+			bufsize=1,
+		)
+		self._lines = queue.Queue()
+		threading.Thread(target=self._read_stdout, args=(self.proc, self._lines), daemon=True).start()
+
+	@staticmethod
+	def _read_stdout(proc: subprocess.Popen, lines: queue.Queue):
+		for line in proc.stdout:
+			lines.put(line)
+		lines.put(None)  # EOF：进程已退出
+
+	def _alive(self) -> bool:
+		return self.proc is not None and self.proc.poll() is None
+
+	def stop(self):
+		if self.proc is None:
+			return
+		try:
+			self.proc.stdin.close()
+		except Exception:
+			pass
+		try:
+			self.proc.kill()
+			self.proc.wait(timeout=2)
+		except Exception:
+			pass
+		self.proc = None
+
+	def _restart(self):
+		self.stop()
+		self.restarts += 1
+
+	def solve(self, script: str, host: str, timeout: float) -> dict | None:
+		if not self._alive():
+			self._start()
+		job_id = next(self._ids)
+		job = {'id': job_id, 'script': script, 'host': host, 'timeout_ms': int(timeout * 1000 * 0.8)}
+		try:
+			self.proc.stdin.write(json.dumps(job) + '\n')
+			self.proc.stdin.flush()
+		except (BrokenPipeError, OSError):
+			self._restart()
+			return None
+
+		while True:
+			try:
+				line = self._lines.get(timeout=timeout)
+			except queue.Empty:
+				# 任务卡死（vm timeout 未能打断），重启 worker
+				self._restart()
+				return None
+			if line is None:
+				self._restart()
+				return None
+			try:
+				reply = json.loads(line)
+			except json.JSONDecodeError:
+				continue
+			if reply.get('id') != job_id:
+				continue
+			return reply.get('cookies') or None
+
+
+class WafSolverPool:
+	"""WAF 求解器：先走纯 Python 快速路径，无法识别时交给常驻 node worker 池。
+	Node 未安装时只有 Python 路径可用"""
+
+	def __init__(self, script_path: str, size: int = 2, job_timeout: float = 8.0, node: str | None = None):
+		self.script_path = script_path
+		self.size = size
+		self.job_timeout = job_timeout
+		self.node = node or shutil.which('node')
+		self._idle: queue.Queue = queue.Queue()  # 空闲 worker；None 为 close() 的唤醒标记
+		self._workers: list[_NodeWorker] = []
+		self._lock = threading.Lock()
+		self._waiters = 0
+		self._generation = 0  # close() 时递增，等待者据此判断唤醒标记是否针对自己
+		self.native_hits = 0
+
+	def available(self) -> bool:
+		"""Node.js 是否可用（Python 快速路径始终可用）"""
+		return self.node is not None
+
+	@property
+	def restarts(self) -> int:
+		return sum(w.restarts for w in self._workers)
+
+	def _acquire(self) -> _NodeWorker | None:
+		"""取一个空闲 worker；job_timeout 内等不到或等待期间池被 close() 返回 None"""
+		with self._lock:
+			if self._idle.empty() and len(self._workers) < self.size:
+				worker = _NodeWorker(self.node, self.script_path)
+				self._workers.append(worker)
+				return worker
+			generation = self._generation
+			self._waiters += 1
+		deadline = time.monotonic() + self.job_timeout
+		try:
+			while True:
+				try:
+					worker = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+				except queue.Empty:
+					return None
+				if worker is None:
+					if self._generation != generation:
+						return None
+					continue  # 更早一次 close() 剩下的唤醒标记
+				if worker in self._workers:
+					return worker
+				# close() 前借出、之后才归还的旧 worker，丢弃
+		finally:
+			with self._lock:
+				self._waiters -= 1
+
+	def _release(self, worker: _NodeWorker):
+		with self._lock:
+			if worker in self._workers:
+				self._idle.put(worker)
+				return
+		worker.stop()
+
+	def solve(self, script: str, host: str = 'anyrouter.top', use_native: bool = True) -> dict | None:
+		"""同步求解，返回 cookie 字典（如 {'acw_sc__v2': ...}），失败返回 None。
+		use_native=False 时跳过 Python 快速路径（Python 结果被服务端拒绝后用 Node 重试）"""
+		if use_native:
+			solved = solve_native(script)
+			if solved:
+				self.native_hits += 1
+				return solved
+		if not self.available():
+			return None
+		worker = self._acquire()
+		if worker is None:
+			return None
+		try:
+			return worker.solve(script, host, self.job_timeout)
+		except Exception:
+			worker._restart()
+			return None
+		finally:
+			self._release(worker)
+
+	async def solve_async(self, script: str, host: str = 'anyrouter.top', use_native: bool = True) -> dict | None:
+		"""协程接口。Python 快速路径直接计算，Node 路径在线程池中执行"""
+		if use_native:
+			solved = solve_native(script)
+			if solved:
+				self.native_hits += 1
+				return solved
+		return await asyncio.to_thread(self.solve, script, host, False)
+
+	def close(self):
+		"""停止全部 worker，唤醒正在等待 worker 的 solve()（返回 None）。之后仍可继续使用"""
+		with self._lock:
+			workers, self._workers = self._workers, []
+			self._generation += 1
+			while True:
+				try:
+					self._idle.get_nowait()
+				except queue.Empty:
+					break
+			for _ in range(self._waiters):
+				self._idle.put(None)
+		for worker in workers:
+			worker.stop()